@@ -0,0 +1,129 @@
+import logging
+from typing import Dict, List, Optional
+from config import load_config, save_config
+from autopost import SendResult, send_message_result
+from utils import check_token, invalidate_token
+from metrics import ACCOUNT_DISABLES
+from control import control_bus, ControlEvent, SETUP_STARTED, SETUP_STOPPED, ACCOUNT_REMOVED, TOKEN_CHANGED
+
+logger = logging.getLogger(__name__)
+
+# Status token akun
+TOKEN_UNKNOWN = "unknown"
+TOKEN_VALID = "valid"
+TOKEN_INVALID = "invalid"
+
+# Status SendResult yang berarti token akun tidak berlaku lagi
+TOKEN_FAILURE_STATUSES = ("401", "invalid_token")
+# Status SendResult jika token akun diganti selama cek token; kirim diulang dengan token baru
+TOKEN_CHANGED_STATUS = "token_changed"
+
+
+class AccountSupervisor:
+    """
+    State bersama semua setup milik satu akun (satu token).
+
+    Kirim milik satu akun diserialkan oleh SetupScheduler (satu job per akun
+    sekaligus), jadi di sini tidak ada lock yang menahan worker. Begitu
+    token gagal (401 / validasi gagal) semua setup akun dinonaktifkan
+    sekaligus. Error jaringan saat cek token tidak dianggap token gagal, dan
+    hasil cek untuk token yang sudah diganti selama cek diabaikan.
+    """
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.token: Optional[str] = None
+        self.token_state = TOKEN_UNKNOWN
+
+    def _sync_token(self, token: str) -> None:
+        # Token diganti tanpa event (mis. config di-reload): mulai dari unknown lagi
+        if token != self.token:
+            self.token = token
+            self.token_state = TOKEN_UNKNOWN
+
+    def reset(self) -> None:
+        self.token = None
+        self.token_state = TOKEN_UNKNOWN
+
+    async def send(self, token: str, channel_id: str, message: str) -> Optional[SendResult]:
+        """
+        Cek token lalu kirim pesan dengan token akun saat ini.
+
+        Returns:
+            SendResult (status TOKEN_CHANGED_STATUS jika token diganti selama
+            cek), atau None jika tidak dikirim karena token akun sudah gagal
+        """
+        self._sync_token(token)
+        if self.token_state == TOKEN_INVALID:
+            return None
+        valid = await check_token(token)
+        if token != self.token:
+            # TOKEN_CHANGED selama cek: hasil untuk token lama tidak berlaku
+            result = SendResult()
+            result.status = TOKEN_CHANGED_STATUS
+            return result
+        if valid is not True:
+            result = SendResult()
+            result.status = "invalid_token" if valid is False else "token_check_error"
+            if valid is False:
+                self.token_state = TOKEN_INVALID
+            return result
+        result = await send_message_result(token, channel_id, message)
+        if token != self.token:
+            return result  # Pesan terkirim dengan token lama; state token baru tidak diubah
+        if result.status in TOKEN_FAILURE_STATUSES:
+            self.token_state = TOKEN_INVALID
+        elif result.ok:
+            self.token_state = TOKEN_VALID
+        return result
+
+    def disable_all(self) -> List[str]:
+        """Nonaktifkan semua setup akun yang masih running; return nama setup yang dihentikan"""
+        current_config = load_config()
+        user_data = current_config["accounts"].get(self.user_id, {})
+        stopped = [
+            setup_name for setup_name, setup_data in user_data.get("setups", {}).items()
+            if setup_data.get("running", False)
+        ]
+        if not stopped:
+            return stopped
+
+        for setup_name in stopped:
+            user_data["setups"][setup_name]["running"] = False
+        save_config(current_config, self.user_id)
+        invalidate_token(user_data.get("token"))
+        ACCOUNT_DISABLES.inc()
+        logger.error("Token tidak valid untuk user %s. Menonaktifkan %s setup: %s",
+                     self.user_id, len(stopped), ", ".join(stopped))
+        for setup_name in stopped:
+            control_bus.publish(SETUP_STOPPED, self.user_id, setup_name)
+        return stopped
+
+
+class AccountSupervisors:
+    """Registry AccountSupervisor per user_id (dibuat saat pertama dipakai)"""
+
+    def __init__(self):
+        self._accounts: Dict[str, AccountSupervisor] = {}
+
+    def get(self, user_id: str) -> AccountSupervisor:
+        supervisor = self._accounts.get(user_id)
+        if supervisor is None:
+            supervisor = self._accounts[user_id] = AccountSupervisor(user_id)
+        return supervisor
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def on_control_event(self, event: ControlEvent) -> None:
+        if event.kind == ACCOUNT_REMOVED:
+            self._accounts.pop(event.user_id, None)
+        elif event.kind in (TOKEN_CHANGED, SETUP_STARTED):
+            # Start manual / token baru: token dicek ulang pada kirim berikutnya
+            supervisor = self._accounts.get(event.user_id)
+            if supervisor is not None:
+                supervisor.reset()
+
+
+account_supervisors = AccountSupervisors()
+control_bus.subscribe(account_supervisors.on_control_event)
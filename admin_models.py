@@ -1,8 +1,16 @@
 import discord
 from discord.ui import View, Button, Select
-from config import load_config, save_config
-from subscription import create_subscription, PACKAGES, get_subscription_info, load_subscriptions
+from config import load_config, save_config, reload_config
+from subscription import create_subscription, PACKAGES, get_subscription_info, subscription_repo
 from typing import Dict, Any
+from utils import invalidate_token
+from control import control_bus, ACCOUNT_REMOVED, TOKEN_CHANGED
+from metrics import summary as metrics_summary
+from broadcast import broadcast_engine
+from user_cache import user_resolver
+from user_directory import user_directory, SORT_ACTIVE, SORT_EXPIRY, SORT_ACTIVITY
+from history import post_history, format_rate, format_latency
+from engine_client import engine_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,12 +24,11 @@ class AdminPanelView(View):
         await interaction.response.defer()
         
         config = load_config()
-        subscriptions = load_subscriptions()
         
         embed = discord.Embed(title="📊 Admin Dashboard", color=discord.Color.blue())
         
         # Stats
-        active_subs = sum(1 for sub in subscriptions.values() if sub.get("active", False))
+        active_subs = subscription_repo.active_count()
         total_users = len(config.get("accounts", {}))
         total_admins = len(config.get("admins", {}))
         
@@ -32,11 +39,19 @@ class AdminPanelView(View):
         • Available Packages: **{len(PACKAGES)}**
         """, inline=False)
         
+        # Riwayat kirim semua setup
+        history = post_history.global_summary()
+        embed.add_field(name="📨 Posts", value=f"""
+        • 1 Jam: **{format_rate(history['last_hour'])}**
+        • 24 Jam: **{format_rate(history['last_day'])}**
+        • Rata-rata Latency: **{format_latency(history['last_day'])}**
+        """, inline=False)
+        
         # Recent activity
-        recent_subs = list(subscriptions.values())[-5:] if subscriptions else []
+        recent_subs = subscription_repo.recent(5)
         if recent_subs:
             sub_info = ""
-            for sub in recent_subs[-5:]:
+            for sub in reversed(recent_subs):
                 sub_info += f"• {sub.get('package_type', 'N/A')} - <@{sub.get('discord_user_id', 'N/A')}>\n"
             embed.add_field(name="🆕 Recent Subscriptions", value=sub_info, inline=False)
         
@@ -89,20 +104,19 @@ class BroadcastModal(discord.ui.Modal):
 
     async def callback(self, interaction: discord.Interaction):
         message = self.children[0].value.strip()
-        config = load_config()
-        users = config.get("accounts", {})
+        if broadcast_engine.running:
+            await interaction.response.send_message("❌ Masih ada broadcast yang berjalan.", ephemeral=True)
+            return
 
-        success = 0
-        fail = 0
-        for user_id in users:
-            try:
-                user = await interaction.client.fetch_user(int(user_id))
-                await user.send(message)
-                success += 1
-            except Exception:
-                fail += 1
+        config = load_config()
+        users = list(config.get("accounts", {}))
 
-        await interaction.response.send_message(f"✅ Broadcast selesai. Berhasil: {success}, Gagal: {fail}", ephemeral=True)
+        # Defer dulu supaya token interaction tidak kadaluarsa selama broadcast
+        await interaction.response.defer(ephemeral=True)
+        progress = await interaction.followup.send(
+            f"📣 Broadcast dimulai ke {len(users)} user...", ephemeral=True, wait=True
+        )
+        broadcast_engine.start(interaction.client, message, users, str(interaction.user.id), progress)
 
 class DeleteSubscriptionModal(discord.ui.Modal):
     def __init__(self):
@@ -111,14 +125,11 @@ class DeleteSubscriptionModal(discord.ui.Modal):
 
     async def callback(self, interaction: discord.Interaction):
         sub_id = self.children[0].value.strip()
-        subscriptions = load_subscriptions()
 
-        if sub_id not in subscriptions:
+        if not subscription_repo.delete(sub_id):
             await interaction.response.send_message(f"❌ Subscription `{sub_id}` tidak ditemukan.", ephemeral=True)
             return
-        
-        subscriptions.pop(sub_id)
-        save_config(subscriptions)
+
         await interaction.response.send_message(f"✅ Subscription `{sub_id}` berhasil dihapus.", ephemeral=True)
 
 class ResetUserModal(discord.ui.Modal):
@@ -135,9 +146,10 @@ class ResetUserModal(discord.ui.Modal):
             return
         
         if "token" in config["accounts"][user_id]:
-            config["accounts"][user_id].pop("token")
+            invalidate_token(config["accounts"][user_id].pop("token"))
         
-        save_config(config)
+        save_config(config, user_id)
+        control_bus.publish(TOKEN_CHANGED, user_id)
         await interaction.response.send_message(f"✅ Token user `{user_id}` berhasil direset.", ephemeral=True)
 
 class BanUserModal(discord.ui.Modal):
@@ -153,8 +165,9 @@ class BanUserModal(discord.ui.Modal):
             await interaction.response.send_message(f"❌ User `{user_id}` tidak ditemukan.", ephemeral=True)
             return
         
-        config["accounts"].pop(user_id)
-        save_config(config)
+        invalidate_token(config["accounts"].pop(user_id).get("token"))
+        save_config(config, user_id)
+        control_bus.publish(ACCOUNT_REMOVED, user_id)
         await interaction.response.send_message(f"✅ User `{user_id}` berhasil diban.", ephemeral=True)
 
 class UpdateSubscriptionModal(discord.ui.Modal):
@@ -167,8 +180,7 @@ class UpdateSubscriptionModal(discord.ui.Modal):
         sub_id = self.children[0].value.strip()
         new_package = self.children[1].value.strip()
 
-        subscriptions = load_subscriptions()
-        if sub_id not in subscriptions:
+        if sub_id not in subscription_repo:
             await interaction.response.send_message(f"❌ Subscription `{sub_id}` tidak ditemukan.", ephemeral=True)
             return
         
@@ -176,9 +188,7 @@ class UpdateSubscriptionModal(discord.ui.Modal):
             await interaction.response.send_message(f"❌ Package `{new_package}` tidak valid.", ephemeral=True)
             return
         
-        subscriptions[sub_id]["package_type"] = new_package
-        subscriptions[sub_id]["days"] = PACKAGES[new_package]["days"]
-        save_config(subscriptions)  # pastiin fungsi save_subscriptions ada
+        subscription_repo.update(sub_id, package_type=new_package, days=PACKAGES[new_package]["days"])
         await interaction.response.send_message(f"✅ Subscription `{sub_id}` diupdate ke package `{new_package}`.", ephemeral=True)
 
 
@@ -239,8 +249,7 @@ class CreateSubscriptionModal(discord.ui.Modal):
 
             # Coba kirim DM ke user
             try:
-                user = await interaction.client.fetch_user(int(user_id))
-                await user.send(embed=embed_user)
+                await user_resolver.send_dm(interaction.client, user_id, embed=embed_user)
             except discord.Forbidden:
                 await interaction.followup.send(f"⚠️ Tidak bisa kirim DM ke <@{user_id}> (DM terkunci).", ephemeral=True)
             except Exception as e:
@@ -255,31 +264,99 @@ class UserManagementView(View):
     
     @discord.ui.button(label="📋 List Users", style=discord.ButtonStyle.primary)
     async def list_users(self, button: discord.ui.Button, interaction: discord.Interaction):
-        config = load_config()
-        users = config.get("accounts", {})
-        
-        if not users:
+        if not len(user_directory):
             await interaction.response.send_message("❌ Tidak ada users terdaftar.", ephemeral=True)
             return
         
-        embed = discord.Embed(title="👥 Registered Users", color=discord.Color.blue())
-        
-        for user_id, user_data in list(users.items())[:10]:  # Limit to 10 users
-            setups_count = len(user_data.get("setups", {}))
-            active_setups = sum(1 for s in user_data.get("setups", {}).values() if s.get("running", False))
-            
-            embed.add_field(
-                name=f"User <@{user_id}>",
-                value=f"Setups: {setups_count} | Active: {active_setups}",
-                inline=False
-            )
-        
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        view = UserBrowserView()
+        await interaction.response.send_message(embed=view.build_embed(), view=view, ephemeral=True)
 
     @discord.ui.button(label="🔍 Find User", style=discord.ButtonStyle.secondary)
     async def find_user(self, button: discord.ui.Button, interaction: discord.Interaction):
         await interaction.response.send_modal(FindUserModal())
 
+class UserBrowserView(View):
+    """Daftar user dengan paging cursor dan pilihan urutan"""
+
+    PAGE_SIZE = 10
+    SORT_LABELS = {
+        SORT_ACTIVE: "Setup aktif terbanyak",
+        SORT_EXPIRY: "Subscription segera habis",
+        SORT_ACTIVITY: "Aktivitas terakhir",
+    }
+
+    def __init__(self, sort: str = SORT_ACTIVE):
+        super().__init__(timeout=300)
+        self.sort = sort
+        self.page_number = 1
+        self._load_page()
+
+        self.sort_select = Select(
+            placeholder="Urutkan berdasarkan...",
+            options=[
+                discord.SelectOption(label=label, value=value, default=value == sort)
+                for value, label in self.SORT_LABELS.items()
+            ],
+        )
+        self.sort_select.callback = self.sort_selected
+        self.add_item(self.sort_select)
+        self._update_buttons()
+
+    def _load_page(self, after=None, before=None) -> None:
+        self.users, self.has_prev, self.has_next = user_directory.page(
+            self.sort, after=after, before=before, limit=self.PAGE_SIZE
+        )
+
+    def _update_buttons(self) -> None:
+        self.prev_page.disabled = not self.has_prev
+        self.next_page.disabled = not self.has_next
+
+    def build_embed(self) -> discord.Embed:
+        embed = discord.Embed(
+            title="👥 Registered Users",
+            description=f"Urutan: {self.SORT_LABELS[self.sort]}",
+            color=discord.Color.blue()
+        )
+        for stats in self.users:
+            expiry = f"<t:{int(stats.expiry)}:R>" if stats.expiry else "-"
+            activity = f"<t:{int(stats.last_activity)}:R>" if stats.last_activity else "-"
+            embed.add_field(
+                name=f"User {stats.user_id}",
+                value=(
+                    f"<@{stats.user_id}> | Setups: {stats.setups} | Active: {stats.active}\n"
+                    f"Subscription habis: {expiry} | Aktivitas: {activity}"
+                ),
+                inline=False
+            )
+        embed.set_footer(text=f"Halaman {self.page_number} • Total user: {len(user_directory)}")
+        return embed
+
+    async def _show(self, interaction: discord.Interaction) -> None:
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    async def sort_selected(self, interaction: discord.Interaction):
+        self.sort = self.sort_select.values[0]
+        for option in self.sort_select.options:
+            option.default = option.value == self.sort
+        self.page_number = 1
+        self._load_page()
+        await self._show(interaction)
+
+    @discord.ui.button(label="◀️ Prev", style=discord.ButtonStyle.secondary)
+    async def prev_page(self, button: discord.ui.Button, interaction: discord.Interaction):
+        if self.users:
+            self._load_page(before=self.users[0].sort_entry(self.sort))
+            self.page_number = max(1, self.page_number - 1)
+        await self._show(interaction)
+
+    @discord.ui.button(label="Next ▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, button: discord.ui.Button, interaction: discord.Interaction):
+        if self.users:
+            self._load_page(after=self.users[-1].sort_entry(self.sort))
+            self.page_number += 1
+        await self._show(interaction)
+
 class FindUserModal(discord.ui.Modal):
     def __init__(self):
         super().__init__(title="Cari User")
@@ -293,7 +370,6 @@ class FindUserModal(discord.ui.Modal):
     async def callback(self, interaction: discord.Interaction):
         user_id = self.children[0].value.strip()
         config = load_config()
-        subscriptions = load_subscriptions()
         
         user_data = config.get("accounts", {}).get(user_id)
         
@@ -312,10 +388,10 @@ class FindUserModal(discord.ui.Modal):
         embed.add_field(name="Token", value="✅ Set" if has_token else "❌ Not Set", inline=True)
         
         # Subscription info
-        user_subs = []
-        for sub_id, sub_data in subscriptions.items():
-            if sub_data.get("discord_user_id") == user_id:
-                user_subs.append(f"`{sub_id}` - {sub_data.get('package_type')}")
+        user_subs = [
+            f"`{sub_id}` - {sub_data.get('package_type')}"
+            for sub_id, sub_data in subscription_repo.by_user(user_id)
+        ]
         
         if user_subs:
             embed.add_field(name="Subscriptions", value="\n".join(user_subs), inline=False)
@@ -328,7 +404,8 @@ class SystemToolsView(View):
     
     @discord.ui.button(label="🔄 Reload Config", style=discord.ButtonStyle.primary)
     async def reload_config(self, button: discord.ui.Button, interaction: discord.Interaction):
-        config = load_config()
+        config = reload_config()
+        user_directory.invalidate()
         await interaction.response.send_message(
             f"✅ Config reloaded!\nAccounts: {len(config.get('accounts', {}))}\nAdmins: {len(config.get('admins', {}))}",
             ephemeral=True
@@ -337,10 +414,9 @@ class SystemToolsView(View):
     @discord.ui.button(label="📊 Stats", style=discord.ButtonStyle.secondary)
     async def show_stats(self, button: discord.ui.Button, interaction: discord.Interaction):
         config = load_config()
-        subscriptions = load_subscriptions()
         
-        active_subs = sum(1 for sub in subscriptions.values() if sub.get("active", False))
-        total_messages = sum(len(user_data.get("setups", {})) for user_data in config.get("accounts", {}).values())
+        active_subs = subscription_repo.active_count()
+        total_messages, _ = user_directory.setup_totals()
         
         embed = discord.Embed(title="📈 System Statistics", color=discord.Color.green())
         embed.add_field(name="Users", value=str(len(config.get("accounts", {}))), inline=True)
@@ -348,5 +424,17 @@ class SystemToolsView(View):
         embed.add_field(name="Total Setups", value=str(total_messages), inline=True)
         embed.add_field(name="Packages", value=str(len(PACKAGES)), inline=True)
         embed.add_field(name="Admins", value=str(len(config.get("admins", {}))), inline=True)
+        for name, value in metrics_summary().items():
+            embed.add_field(name=name, value=value, inline=True)
+        if engine_client.enabled:
+            status = await engine_client.status()
+            if status is None:
+                engine_text = "❌ Tidak terhubung"
+            else:
+                hours, remainder = divmod(status["uptime"], 3600)
+                engine_text = f"✅ Uptime {hours}j {remainder // 60}m, {status['scheduled']} setup"
+                if status["shards"]:
+                    engine_text += f", {status['shards']} shard"
+            embed.add_field(name="Engine Posting", value=engine_text, inline=True)
         
         await interaction.response.send_message(embed=embed, ephemeral=True)
\ No newline at end of file
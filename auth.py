@@ -6,6 +6,7 @@ from typing import Optional, Dict, Any
 from config import load_config, save_config
 from utils import validate_token
 from subscription import validate_subscription, get_user_subscription, PACKAGES
+from control import control_bus, TOKEN_CHANGED
 
 async def login_with_subscription(ctx: commands.Context, token: str, subscription_id: str):
     """Login dengan token dan subscription ID"""
@@ -35,7 +36,8 @@ async def login_with_subscription(ctx: commands.Context, token: str, subscriptio
             config["accounts"][user_id]["token"] = token
             config["accounts"][user_id]["subscription_id"] = subscription_id
             
-        save_config(config)
+        save_config(config, user_id)
+        control_bus.publish(TOKEN_CHANGED, user_id)
         
         await ctx.send("✅ Login berhasil! Subscription aktif.", ephemeral=True)
         return True
@@ -61,7 +63,8 @@ async def logout_user(ctx: commands.Context):
             if not config["accounts"][user_id].get("setups"):
                 del config["accounts"][user_id]
                 
-            save_config(config)
+            save_config(config, user_id)
+            control_bus.publish(TOKEN_CHANGED, user_id)
             
         await ctx.send("✅ Logout berhasil!", ephemeral=True)
         return True
@@ -1,17 +1,41 @@
 import aiohttp
 import asyncio
 import random
+import time
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from datetime import datetime
 from config import load_config, save_config
-from utils import validate_token
+from utils import validate_token, invalidate_token
+from http_client import http_sessions, DISCORD_API_BASE
+from ratelimit import rate_limiter, RATE_LIMIT_MAX_429
+from metrics import SEND_REQUESTS, SEND_RESULTS, SEND_RETRIES, SEND_LATENCY
 
 logger = logging.getLogger(__name__)
 
-API_BASE = "https://discord.com/api/v9"
+API_BASE = DISCORD_API_BASE
+SEND_ROUTE = "POST /channels/{channel_id}/messages"
 
-async def send_message(token: str, channel_id: str, content: str, max_retries: int = 3) -> bool:
+class SendResult:
+    """Hasil send_message_result: status terakhir dan latency request terakhir"""
+
+    __slots__ = ("ok", "status", "latency", "attempts")
+
+    def __init__(self):
+        self.ok = False
+        # Status HTTP terakhir ("200", "429", ...) atau "timeout"/"connection_error"/"invalid_token"/"token_check_error"/"error"
+        self.status: Optional[str] = None
+        # Detik dari request dikirim sampai response terakhir diterima
+        self.latency: Optional[float] = None
+        self.attempts = 0
+
+async def send_message(
+    token: str,
+    channel_id: str,
+    content: str,
+    max_retries: int = 3,
+    session: Optional[aiohttp.ClientSession] = None
+) -> bool:
     """
     Send a message to a Discord channel with retry logic
     
@@ -20,13 +44,39 @@ async def send_message(token: str, channel_id: str, content: str, max_retries: i
         channel_id: ID of the channel to send message to
         content: Message content
         max_retries: Number of retry attempts on failure
+        session: HTTP session to use (default: shared session pool)
         
     Returns:
         bool: True if successful, False otherwise
     """
+    result = await send_message_result(token, channel_id, content, max_retries, session)
+    return result.ok
+
+async def send_message_result(
+    token: str,
+    channel_id: str,
+    content: str,
+    max_retries: int = 3,
+    session: Optional[aiohttp.ClientSession] = None
+) -> SendResult:
+    """Sama seperti send_message, tapi mengembalikan SendResult (status & latency)"""
+    result = SendResult()
+    result.ok = await _send_message(token, channel_id, content, max_retries, session, result)
+    SEND_RESULTS.inc(result="success" if result.ok else "failure")
+    return result
+
+async def _send_message(
+    token: str,
+    channel_id: str,
+    content: str,
+    max_retries: int,
+    session: Optional[aiohttp.ClientSession],
+    result: SendResult
+) -> bool:
     # First validate the token
-    if not await validate_token(token):
+    if not await validate_token(token, session=session):
         logger.error("Token tidak valid untuk channel %s", channel_id)
+        result.status = "invalid_token"
         return False
     
     headers = {
@@ -34,49 +84,83 @@ async def send_message(token: str, channel_id: str, content: str, max_retries: i
         "Content-Type": "application/json"
     }
     payload = {"content": content}
+    session = session or http_sessions.get()
     
-    for attempt in range(max_retries):
+    # 429 tidak menghabiskan jatah retry; rate limiter yang menahan request berikutnya
+    attempt = 0
+    rate_limited = 0
+    while attempt < max_retries:
+        await rate_limiter.acquire(token, SEND_ROUTE, channel_id)
+        started = time.perf_counter()
+        result.attempts += 1
+        # Slot rate limit dikembalikan jika request gagal sebelum ada response
+        responded = False
+        backoff = None
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{API_BASE}/channels/{channel_id}/messages", 
-                    headers=headers, 
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as resp:
-                    if resp.status == 200:
-                        logger.info("Pesan terkirim ke %s", channel_id)
-                        return True
-                    elif resp.status == 401:  # Unauthorized
-                        logger.error("Token tidak valid untuk channel %s", channel_id)
+            async with session.post(
+                f"{API_BASE}/channels/{channel_id}/messages", 
+                headers=headers, 
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=10)
+            ) as resp:
+                responded = True
+                result.latency = time.perf_counter() - started
+                result.status = str(resp.status)
+                SEND_LATENCY.observe(result.latency)
+                SEND_REQUESTS.inc(status=result.status)
+                retry_after = rate_limiter.update(token, SEND_ROUTE, channel_id, resp.status, resp.headers)
+                if resp.status == 200:
+                    logger.info("Pesan terkirim ke %s", channel_id)
+                    return True
+                elif resp.status == 401:  # Unauthorized
+                    logger.error("Token tidak valid untuk channel %s", channel_id)
+                    invalidate_token(token)
+                    return False
+                elif resp.status == 429:  # Rate limited
+                    rate_limited += 1
+                    if rate_limited > RATE_LIMIT_MAX_429:
+                        logger.error("Terlalu banyak rate limit untuk channel %s", channel_id)
+                        return False
+                    logger.warning("Rate limited, retrying after %s", retry_after)
+                    SEND_RETRIES.inc(reason="rate_limited")
+                    continue
+                else:
+                    err = await resp.text()
+                    logger.error("Gagal kirim ke %s: %s %s", channel_id, resp.status, err)
+                    if attempt == max_retries - 1:  # Last attempt
                         return False
-                    elif resp.status == 429:  # Rate limited
-                        retry_after = float(resp.headers.get('Retry-After', 5))
-                        logger.warning("Rate limited, retrying after %s", retry_after)
-                        await asyncio.sleep(retry_after)
-                        continue
-                    else:
-                        err = await resp.text()
-                        logger.error("Gagal kirim ke %s: %s %s", channel_id, resp.status, err)
-                        if attempt == max_retries - 1:  # Last attempt
-                            return False
-                        await asyncio.sleep(2 ** attempt)  # Exponential backoff
+                    SEND_RETRIES.inc(reason="status")
+                    backoff = 2 ** attempt  # Exponential backoff
         except asyncio.TimeoutError:
+            SEND_REQUESTS.inc(status="timeout")
+            result.status = "timeout"
             logger.warning("Timeout ketika mengirim ke %s, percobaan %s/%s", 
                           channel_id, attempt + 1, max_retries)
             if attempt == max_retries - 1:
                 return False
-            await asyncio.sleep(2 ** attempt)
+            SEND_RETRIES.inc(reason="timeout")
+            backoff = 2 ** attempt
         except aiohttp.ClientError as e:
+            SEND_REQUESTS.inc(status="connection_error")
+            result.status = "connection_error"
             logger.error("Error koneksi ke %s: %s", channel_id, str(e))
             if attempt == max_retries - 1:
                 return False
-            await asyncio.sleep(2 ** attempt)
+            SEND_RETRIES.inc(reason="connection_error")
+            backoff = 2 ** attempt
         except Exception as e:
             logger.error("Error tidak terduga: %s", str(e))
+            result.status = "error"
             if attempt == max_retries - 1:
                 return False
-            await asyncio.sleep(2 ** attempt)
+            SEND_RETRIES.inc(reason="error")
+            backoff = 2 ** attempt
+        finally:
+            if not responded:
+                rate_limiter.release(token, SEND_ROUTE, channel_id)
+        if backoff is not None:
+            await asyncio.sleep(backoff)
+        attempt += 1
     
     return False
 
@@ -0,0 +1,270 @@
+"""
+Benchmark end-to-end jalur autopost (scheduler -> validate_token -> send_message)
+terhadap server Discord API palsu di localhost.
+
+Contoh:
+    python benchmark.py --accounts 50 --setups 10 --interval 1 --duration 30
+    python benchmark.py --latency 80 --jitter 40 --json --output bench_output.txt
+
+Config/subscription dibuat di direktori sementara; config.json asli tidak disentuh.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import resource
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional
+from aiohttp import web
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Persentil (nearest-rank) dari list nilai"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def current_rss_mb() -> float:
+    """RSS proses saat ini (MB); fallback ke max RSS jika /proc tidak ada"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class FakeDiscordAPI:
+    """Stand-in aiohttp untuk /users/@me dan /channels/{id}/messages"""
+
+    def __init__(self, latency: float, jitter: float, error_rate: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.posts = 0
+        self.validations = 0
+        self._runner: Optional[web.AppRunner] = None
+        self.port = 0
+
+    async def _delay(self) -> None:
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def users_me(self, request: web.Request) -> web.Response:
+        self.validations += 1
+        await self._delay()
+        return web.json_response({"id": "0", "username": "bench"})
+
+    async def create_message(self, request: web.Request) -> web.Response:
+        await request.read()
+        await self._delay()
+        if self.error_rate and random.random() < self.error_rate:
+            return web.json_response({"message": "Internal Server Error"}, status=500)
+        self.posts += 1
+        return web.json_response({"id": str(self.posts), "channel_id": request.match_info["channel_id"]})
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/api/v9/users/@me", self.users_me)
+        app.router.add_post("/api/v9/channels/{channel_id}/messages", self.create_message)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{self.port}/api/v9"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+async def measure_loop_lag(samples: List[float], interval: float = 0.05) -> None:
+    """Catat keterlambatan event loop (detik) setiap ``interval``"""
+    while True:
+        start = time.monotonic()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.monotonic() - start - interval))
+
+
+def build_config(accounts: int, setups: int, interval: float) -> Dict[str, Any]:
+    """Config dengan accounts x setups yang semuanya running"""
+    cfg: Dict[str, Any] = {"accounts": {}, "admins": {}}
+    channel = 100000
+    for i in range(accounts):
+        user_setups = {}
+        for j in range(setups):
+            channel += 1
+            user_setups[f"setup{j}"] = {
+                "channel": str(channel),
+                "message": f"benchmark message {i}-{j}",
+                "interval": interval / 60,  # detik -> menit
+                "random_interval": 0,
+                "running": True,
+            }
+        cfg["accounts"][f"bench{i}"] = {"token": f"bench-token-{i}", "setups": user_setups}
+    return cfg
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    fake = FakeDiscordAPI(args.latency / 1000, args.jitter / 1000, args.error_rate)
+    api_base = await fake.start()
+
+    # Modul bot membaca env saat import, jadi env diset sebelum import
+    os.environ["DISCORD_API_BASE"] = api_base
+    os.environ["RATE_LIMIT_HOST_PER_SEC"] = str(args.host_rate)
+    os.environ["SCHEDULER_WORKERS"] = str(args.workers)
+    os.environ["STARTUP_ADMIT_RATE"] = str(args.startup_rate)
+    os.environ["STORAGE_BACKEND"] = "json"
+    from config import config_store
+    from http_client import http_sessions
+    from runner import setup_scheduler, startup_ramp, schedule_running_setups
+
+    config_store.replace(build_config(args.accounts, args.setups, args.interval))
+
+    # Bungkus handler untuk mencatat keterlambatan dispatch (waktu mulai - due)
+    lateness: List[float] = []
+    handler = setup_scheduler.handler
+
+    async def timed_handler(job):
+        if measuring:
+            lateness.append(max(0.0, time.monotonic() - job.due))
+        return await handler(job)
+
+    setup_scheduler.handler = timed_handler
+    measuring = False
+
+    loop_lag: List[float] = []
+    lag_task = asyncio.create_task(measure_loop_lag(loop_lag))
+    rss_before = current_rss_mb()
+
+    setup_scheduler.start()
+    scheduled = schedule_running_setups()
+
+    await asyncio.sleep(args.warmup)
+    measuring = True
+    loop_lag.clear()
+    posts_start = fake.posts
+    cpu_start = time.process_time()
+    wall_start = time.monotonic()
+
+    await asyncio.sleep(args.duration)
+
+    elapsed = time.monotonic() - wall_start
+    cpu = time.process_time() - cpu_start
+    posts = fake.posts - posts_start
+    measuring = False
+    rss_after = current_rss_mb()
+
+    lag_task.cancel()
+    await asyncio.gather(lag_task, return_exceptions=True)
+    await startup_ramp.stop()
+    await setup_scheduler.stop()
+    await http_sessions.close()
+    await fake.stop()
+    config_store.flush()
+
+    expected = scheduled * elapsed / args.interval if args.interval > 0 else 0
+    return {
+        "accounts": args.accounts,
+        "setups_per_account": args.setups,
+        "setups": scheduled,
+        "interval_s": args.interval,
+        "latency_ms": args.latency,
+        "jitter_ms": args.jitter,
+        "workers": args.workers,
+        "host_rate": args.host_rate,
+        "startup_rate": args.startup_rate,
+        "duration_s": round(elapsed, 3),
+        "posts": posts,
+        "posts_per_sec": round(posts / elapsed, 2) if elapsed else 0.0,
+        "expected_posts_per_sec": round(expected / elapsed, 2) if elapsed else 0.0,
+        "validations": fake.validations,
+        "lateness_p50_ms": round(percentile(lateness, 50) * 1000, 2),
+        "lateness_p99_ms": round(percentile(lateness, 99) * 1000, 2),
+        "lateness_max_ms": round(max(lateness, default=0.0) * 1000, 2),
+        "loop_lag_p50_ms": round(percentile(loop_lag, 50) * 1000, 2),
+        "loop_lag_p99_ms": round(percentile(loop_lag, 99) * 1000, 2),
+        "loop_lag_max_ms": round(max(loop_lag, default=0.0) * 1000, 2),
+        "cpu_s": round(cpu, 3),
+        "cpu_ms_per_post": round(cpu / posts * 1000, 3) if posts else 0.0,
+        "rss_mb": round(rss_after, 1),
+        "rss_kb_per_setup": round((rss_after - rss_before) * 1024 / scheduled, 2) if scheduled else 0.0,
+    }
+
+
+def format_report(result: Dict[str, Any]) -> str:
+    return "\n".join([
+        "=== Autopost benchmark ===",
+        "Setup        : %(accounts)s akun x %(setups_per_account)s setup = %(setups)s, interval %(interval_s)ss" % result,
+        "API palsu    : latency %(latency_ms)sms + jitter %(jitter_ms)sms" % result,
+        "Worker       : %(workers)s, host rate %(host_rate)s/s" % result,
+        "Durasi       : %(duration_s)ss" % result,
+        "Throughput   : %(posts_per_sec)s post/s (target %(expected_posts_per_sec)s), %(posts)s post" % result,
+        "Lateness     : p50 %(lateness_p50_ms)sms, p99 %(lateness_p99_ms)sms, max %(lateness_max_ms)sms" % result,
+        "Loop lag     : p50 %(loop_lag_p50_ms)sms, p99 %(loop_lag_p99_ms)sms, max %(loop_lag_max_ms)sms" % result,
+        "CPU          : %(cpu_s)ss (%(cpu_ms_per_post)sms/post)" % result,
+        "Memori       : RSS %(rss_mb)sMB (%(rss_kb_per_setup)sKB/setup)" % result,
+    ])
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark throughput autopost terhadap Discord API palsu")
+    parser.add_argument("--accounts", type=int, default=20, help="Jumlah akun")
+    parser.add_argument("--setups", type=int, default=5, help="Jumlah setup per akun")
+    parser.add_argument("--interval", type=float, default=1.0, help="Interval tiap setup (detik, minimal 1)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Lama pengukuran (detik)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Pemanasan sebelum pengukuran (detik)")
+    parser.add_argument("--latency", type=float, default=50.0, help="Latency API palsu (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Jitter acak tambahan (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraksi post yang dibalas 500")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SCHEDULER_WORKERS", "50")), help="Worker scheduler")
+    parser.add_argument("--host-rate", type=float, default=0.0, help="RATE_LIMIT_HOST_PER_SEC (0 = tanpa batas)")
+    parser.add_argument("--startup-rate", type=float, default=0.0, help="STARTUP_ADMIT_RATE (0 = tanpa batas)")
+    parser.add_argument("--log-level", default="WARNING", help="Level logging bot selama benchmark")
+    parser.add_argument("--json", action="store_true", help="Cetak hasil sebagai JSON")
+    parser.add_argument("--output", help="Tambahkan hasil (JSON per baris) ke file ini")
+    args = parser.parse_args(argv)
+    if args.interval < 1:
+        # cycle_delay membulatkan interval ke detik penuh
+        parser.error("--interval minimal 1 detik")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    # Jalankan di direktori sementara supaya config.json/subscriptions.json asli aman
+    sys.path.insert(0, REPO_DIR)
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="autopost-bench-")
+    os.chdir(workdir)
+    try:
+        result = asyncio.run(run_benchmark(args))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    result["timestamp"] = int(time.time())
+
+    print(json.dumps(result, indent=2) if args.json else format_report(result))
+    if output:
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import discord
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+from dotenv import load_dotenv
+from persistence import atomic_write_json, read_json, generation_path
+from user_cache import user_resolver
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_STATE_FILE = os.getenv("BROADCAST_STATE_FILE", "broadcast_state.json")
+# Jumlah DM yang dikirim bersamaan (rate limit per route tetap ditangani py-cord)
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "5"))
+# Detik antar update pesan progress & penyimpanan cursor
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "3"))
+# Backup generasi file state (cukup 1; state hanya penting selama broadcast berjalan)
+BROADCAST_STATE_GENERATIONS = 1
+
+
+class BroadcastEngine:
+    """
+    Broadcast DM ke banyak user dengan konkurensi terbatas.
+
+    Progress (cursor + user yang sudah selesai di depan cursor) disimpan ke
+    ``BROADCAST_STATE_FILE`` secara berkala, sehingga broadcast yang
+    terputus karena restart dilanjutkan dari posisi terakhir dan tidak
+    mengirim ulang ke semua user. Hanya satu broadcast berjalan sekaligus.
+    """
+
+    def __init__(
+        self,
+        state_path: str = BROADCAST_STATE_FILE,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        progress_interval: float = BROADCAST_PROGRESS_INTERVAL,
+    ):
+        self.state_path = state_path
+        self.concurrency = max(1, concurrency)
+        self.progress_interval = progress_interval
+        self._state: Optional[Dict[str, Any]] = None
+        # Index recipient >= cursor yang sudah selesai
+        self._completed: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._last_report = 0.0
+        # Satu thread writer supaya urutan penulisan state selalu terjaga
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="broadcast-writer")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def progress(self) -> Optional[Dict[str, Any]]:
+        """Ringkasan broadcast yang sedang berjalan"""
+        if self._state is None:
+            return None
+        return {
+            "id": self._state["id"],
+            "total": len(self._state["recipients"]),
+            "sent": self._state["sent"],
+            "failed": self._state["failed"],
+        }
+
+    def start(
+        self,
+        client: discord.Client,
+        message: str,
+        recipients: List[str],
+        requested_by: str,
+        progress_message: Optional[discord.Message] = None,
+    ) -> bool:
+        """
+        Mulai broadcast baru di background.
+
+        Returns:
+            False jika masih ada broadcast lain yang berjalan
+        """
+        if self.running:
+            return False
+        self._state = {
+            "id": uuid.uuid4().hex[:8],
+            "message": message,
+            "requested_by": str(requested_by),
+            "recipients": [str(user_id) for user_id in recipients],
+            "cursor": 0,
+            "completed": [],
+            "sent": 0,
+            "failed": 0,
+            "started_at": int(time.time()),
+        }
+        self._completed = set()
+        logger.info("Broadcast %s dimulai ke %s user", self._state["id"], len(recipients))
+        self._task = asyncio.create_task(self._run(client, progress_message))
+        return True
+
+    def resume(self, client: discord.Client) -> bool:
+        """Lanjutkan broadcast yang terputus (dipanggil saat bot start)"""
+        if self.running:
+            return False
+        try:
+            state = read_json(self.state_path, lambda: None, BROADCAST_STATE_GENERATIONS)
+        except ValueError as e:
+            logger.error("State broadcast rusak, broadcast tidak dilanjutkan: %s", e)
+            return False
+        if not state:
+            return False
+
+        self._state = state
+        self._completed = {int(i) for i in state.get("completed", [])}
+        remaining = len(state["recipients"]) - state["cursor"] - len(self._completed)
+        logger.info("Melanjutkan broadcast %s: %s user tersisa", state["id"], remaining)
+        self._task = asyncio.create_task(self._run(client, None))
+        return True
+
+    async def _run(self, client: discord.Client, progress_message: Optional[discord.Message]) -> None:
+        state = self._state
+        pending = iter([
+            i for i in range(state["cursor"], len(state["recipients"]))
+            if i not in self._completed
+        ])
+
+        async def worker() -> None:
+            for index in pending:
+                ok = await self._send_one(client, state["recipients"][index], state["message"])
+                state["sent" if ok else "failed"] += 1
+                self._mark_done(index)
+                if time.monotonic() - self._last_report >= self.progress_interval:
+                    self._last_report = time.monotonic()
+                    await self._save()
+                    await self._report(progress_message)
+
+        workers: List[asyncio.Task] = []
+        try:
+            await self._save()
+            workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+            await asyncio.gather(*workers)
+        except asyncio.CancelledError:
+            # Shutdown: simpan posisi terakhir supaya bisa dilanjutkan
+            await self._stop_workers(workers)
+            await self._save()
+            raise
+        except Exception as e:
+            # Worker lain dihentikan dulu supaya tidak menyentuh state broadcast berikutnya
+            await self._stop_workers(workers)
+            logger.error("Broadcast %s berhenti karena error: %s", state["id"], e)
+            await self._save()
+            return
+
+        logger.info("Broadcast %s selesai. Berhasil: %s, Gagal: %s", state["id"], state["sent"], state["failed"])
+        self._remove_state()
+        await self._report(progress_message, final=True)
+        if progress_message is None:
+            await self._notify_requester(client)
+
+    async def _send_one(self, client: discord.Client, user_id: str, message: str) -> bool:
+        try:
+            await user_resolver.send_dm(client, user_id, message)
+            return True
+        except discord.Forbidden:
+            # DM ditutup / tidak berbagi server
+            return False
+        except discord.NotFound:
+            user_resolver.invalidate(user_id)
+            return False
+        except Exception as e:
+            # HTTPException, ID tidak valid, error jaringan dsb. hanya menggagalkan penerima ini
+            logger.warning("Broadcast gagal ke %s: %s", user_id, e)
+            return False
+
+    @staticmethod
+    async def _stop_workers(workers: List[asyncio.Task]) -> None:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def _mark_done(self, index: int) -> None:
+        state = self._state
+        self._completed.add(index)
+        # Majukan cursor melewati index yang sudah selesai berurutan
+        cursor = state["cursor"]
+        while cursor in self._completed:
+            self._completed.discard(cursor)
+            cursor += 1
+        state["cursor"] = cursor
+
+    async def _save(self) -> None:
+        state = dict(self._state)
+        state["completed"] = sorted(self._completed)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                self._executor, atomic_write_json, self.state_path, state, BROADCAST_STATE_GENERATIONS, None
+            )
+        except OSError as e:
+            logger.error("Gagal menyimpan state broadcast: %s", e)
+
+    def _remove_state(self) -> None:
+        # Dipanggil setelah semua save selesai (tidak ada write yang tertunda)
+        for path in (self.state_path, generation_path(self.state_path, 1)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error("Gagal menghapus %s: %s", path, e)
+
+    def _progress_text(self, final: bool = False) -> str:
+        state = self._state
+        total = len(state["recipients"])
+        done = state["sent"] + state["failed"]
+        if final:
+            return f"✅ Broadcast selesai. Berhasil: {state['sent']}, Gagal: {state['failed']}"
+        return f"📣 Broadcast berjalan: {done}/{total} (Berhasil: {state['sent']}, Gagal: {state['failed']})"
+
+    async def _report(self, progress_message: Optional[discord.Message], final: bool = False) -> None:
+        if progress_message is None:
+            return
+        try:
+            await progress_message.edit(content=self._progress_text(final))
+        except discord.HTTPException as e:
+            # Token interaction kadaluarsa setelah 15 menit; progress tetap tersimpan
+            logger.warning("Gagal update progress broadcast: %s", e)
+
+    async def _notify_requester(self, client: discord.Client) -> None:
+        try:
+            await user_resolver.send_dm(client, self._state["requested_by"], self._progress_text(final=True))
+        except (discord.HTTPException, ValueError) as e:
+            logger.warning("Gagal mengirim hasil broadcast ke admin: %s", e)
+
+    async def stop(self) -> None:
+        """Hentikan broadcast; state disimpan untuk dilanjutkan nanti"""
+        if self.running:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+broadcast_engine = BroadcastEngine()
@@ -0,0 +1,118 @@
+import os
+import time
+import logging
+from typing import Any, Dict, Iterable, Optional
+from dotenv import load_dotenv
+from store import DocumentStore
+from persistence import atomic_write_json, read_json
+from scheduler import SetupJob, setup_key
+from control import control_bus, ControlEvent, SETUP_STOPPED, SETUP_DELETED, ACCOUNT_REMOVED
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_CHECKPOINT_FILE = os.getenv("SCHEDULE_CHECKPOINT_FILE", "schedule.json")
+# Debounce penulisan checkpoint (detik)
+SCHEDULE_CHECKPOINT_DELAY = float(os.getenv("SCHEDULE_CHECKPOINT_DELAY", "10"))
+SCHEDULE_CHECKPOINT_MAX_DELAY = float(os.getenv("SCHEDULE_CHECKPOINT_MAX_DELAY", "30"))
+SCHEDULE_CHECKPOINT_GENERATIONS = 1
+
+
+def _load_checkpoint() -> Dict[str, Dict[str, Any]]:
+    try:
+        return read_json(SCHEDULE_CHECKPOINT_FILE, dict, SCHEDULE_CHECKPOINT_GENERATIONS)
+    except ValueError as e:
+        logger.error("Checkpoint jadwal rusak, semua setup dijadwalkan ulang: %s", e)
+        return {}
+
+
+def _snapshot_checkpoint(data: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    return {key: dict(entry) for key, entry in data.items()}
+
+
+def _write_checkpoint(snapshot: Dict[str, Dict[str, Any]]) -> None:
+    atomic_write_json(SCHEDULE_CHECKPOINT_FILE, snapshot, SCHEDULE_CHECKPOINT_GENERATIONS, indent=None)
+
+
+class ScheduleCheckpoint:
+    """
+    Checkpoint waktu kirim terakhir & jadwal berikutnya per setup.
+
+    Waktu disimpan sebagai wall clock (``time.time()``) karena monotonic
+    clock tidak berlanjut antar proses. Saat start, ``next_due`` dipakai
+    untuk melanjutkan timer; setup yang sudah lewat jadwal dikirim sekali
+    lewat startup ramp (lihat startup.py).
+    """
+
+    def __init__(self):
+        self.store = DocumentStore(
+            "schedule",
+            load_func=_load_checkpoint,
+            snapshot_func=_snapshot_checkpoint,
+            write_func=_write_checkpoint,
+            flush_delay=SCHEDULE_CHECKPOINT_DELAY,
+            max_delay=SCHEDULE_CHECKPOINT_MAX_DELAY,
+        )
+
+    def get(self, user_id: str, setup_name: str) -> Optional[Dict[str, Any]]:
+        return self.store.data.get(setup_key(user_id, setup_name))
+
+    def record(self, user_id: str, setup_name: str, next_due: float, last_sent: Optional[float] = None) -> None:
+        """Simpan jadwal berikutnya (dan waktu kirim terakhir jika ada)"""
+        key = setup_key(user_id, setup_name)
+        entry = self.store.data.get(key)
+        if entry is None:
+            entry = self.store.data[key] = {}
+        entry["next_due"] = next_due
+        if last_sent is not None:
+            entry["last_sent"] = last_sent
+        self.store.mark_dirty()
+
+    def record_jobs(self, jobs: Iterable[SetupJob]) -> None:
+        """Checkpoint semua job terjadwal (dipanggil saat shutdown)"""
+        offset = time.time() - time.monotonic()
+        for job in jobs:
+            self.record(job.user_id, job.setup_name, job.due + offset)
+
+    def forget(self, user_id: str, setup_name: Optional[str] = None) -> None:
+        data = self.store.data
+        if setup_name is not None:
+            removed = data.pop(setup_key(user_id, setup_name), None) is not None
+        else:
+            prefix = f"{user_id}_"
+            keys = [key for key in data if key.startswith(prefix)]
+            for key in keys:
+                del data[key]
+            removed = bool(keys)
+        if removed:
+            self.store.mark_dirty()
+
+    def prune(self, keep: Iterable[str]) -> None:
+        """Buang checkpoint setup yang tidak lagi running"""
+        keep = set(keep)
+        data = self.store.data
+        stale = [key for key in data if key not in keep]
+        for key in stale:
+            del data[key]
+        if stale:
+            self.store.mark_dirty()
+
+    def next_due(self, user_id: str, setup_name: str) -> Optional[float]:
+        """Jadwal kirim berikutnya (wall clock) atau None jika belum ada checkpoint"""
+        entry = self.get(user_id, setup_name)
+        return entry.get("next_due") if entry else None
+
+    def on_control_event(self, event: ControlEvent) -> None:
+        if event.kind in (SETUP_STOPPED, SETUP_DELETED):
+            self.forget(event.user_id, event.setup_name)
+        elif event.kind == ACCOUNT_REMOVED:
+            self.forget(event.user_id)
+
+    def flush(self) -> None:
+        self.store.flush()
+
+
+schedule_checkpoint = ScheduleCheckpoint()
+control_bus.subscribe(schedule_checkpoint.on_control_event)
@@ -1,34 +1,97 @@
-import json
 import os
 import datetime
-from typing import Dict, Any
-from exceptions import ConfigError
+from typing import Dict, Any, Optional
+from dotenv import load_dotenv
+from store import DocumentStore
+from storage import get_backend
+from control import (
+    control_bus, SETUP_CREATED, SETUP_STARTED, SETUP_STOPPED, SETUP_UPDATED, SETUP_DELETED,
+    ACCOUNT_REMOVED, TOKEN_CHANGED
+)
+
+# Load environment variables
+load_dotenv()
 
-CONFIG_PATH = "config.json"
 ADMIN_IDS = []  # Ini akan diisi dari environment variable
 
+# Debounce penulisan config (detik)
+CONFIG_FLUSH_DELAY = float(os.getenv("CONFIG_FLUSH_DELAY", "1.0"))
+CONFIG_FLUSH_MAX_DELAY = float(os.getenv("CONFIG_FLUSH_MAX_DELAY", "5.0"))
+
+# Store config process-wide: semua read dilayani dari memori
+_backend = get_backend()
+config_store = DocumentStore(
+    "config",
+    load_func=_backend.load_config,
+    snapshot_func=_backend.snapshot_config,
+    write_func=_backend.write_config,
+    flush_delay=CONFIG_FLUSH_DELAY,
+    max_delay=CONFIG_FLUSH_MAX_DELAY,
+)
+
 def load_config() -> Dict[str, Any]:
-    """Load configuration from file with error handling"""
-    try:
-        if os.path.exists(CONFIG_PATH):
-            with open(CONFIG_PATH, "r", encoding='utf-8') as f:
-                data = json.load(f)
-                if not isinstance(data.get("accounts", {}), dict):
-                    data["accounts"] = {}
-                if not isinstance(data.get("admins", {}), dict):
-                    data["admins"] = {}
-                return data
-        return {"accounts": {}, "admins": {}}
-    except (json.JSONDecodeError, IOError) as e:
-        raise ConfigError(f"Failed to load configuration: {str(e)}")
-
-def save_config(cfg: Dict[str, Any]) -> None:
-    """Save configuration to file with error handling"""
-    try:
-        with open(CONFIG_PATH, "w", encoding='utf-8') as f:
-            json.dump(cfg, f, indent=4, ensure_ascii=False)
-    except (IOError, TypeError) as e:
-        raise ConfigError(f"Failed to save configuration: {str(e)}")
+    """
+    Return configuration dari memori.
+
+    Dict yang dikembalikan adalah state live milik ``config_store``;
+    panggil ``save_config`` setelah mengubahnya supaya ikut di-flush.
+    """
+    return config_store.data
+
+def save_config(cfg: Dict[str, Any], user_id: Optional[str] = None) -> None:
+    """
+    Tandai configuration berubah; penulisan ke storage dilakukan oleh flush yang di-debounce.
+
+    ``user_id`` diisi jika perubahan hanya menyentuh akun tersebut, supaya
+    backend tidak perlu membandingkan semua akun saat flush.
+    """
+    _backend.mark_changed(user_id)
+    if cfg is not config_store.data:
+        config_store.replace(cfg)
+    else:
+        config_store.mark_dirty()
+
+def flush_config() -> None:
+    """Paksa tulis configuration ke file sekarang"""
+    config_store.flush()
+
+def reload_config() -> Dict[str, Any]:
+    """
+    Baca ulang configuration dari file.
+
+    Perubahan yang belum di-flush ditulis dulu. Setelah dict diganti, setiap
+    perbedaan dipublish ke control bus supaya scheduler mengikat ulang job
+    ke dict setup yang baru dan mengikuti start/stop dari file.
+    """
+    old_accounts = config_store.data["accounts"]
+    cfg = config_store.reload()
+    _publish_changes(old_accounts, cfg["accounts"])
+    return cfg
+
+def _publish_changes(old_accounts: Dict[str, Any], new_accounts: Dict[str, Any]) -> None:
+    for user_id in old_accounts.keys() - new_accounts.keys():
+        control_bus.publish(ACCOUNT_REMOVED, user_id)
+    for user_id, user_data in new_accounts.items():
+        old_data = old_accounts.get(user_id, {})
+        old_setups = old_data.get("setups", {})
+        setups = user_data.get("setups", {})
+        for setup_name in old_setups.keys() - setups.keys():
+            control_bus.publish(SETUP_DELETED, user_id, setup_name)
+        if user_data.get("token") != old_data.get("token"):
+            control_bus.publish(TOKEN_CHANGED, user_id)
+        for setup_name, setup_data in setups.items():
+            old_setup = old_setups.get(setup_name)
+            if old_setup is None:
+                control_bus.publish(SETUP_CREATED, user_id, setup_name)
+            running = setup_data.get("running", False)
+            was_running = old_setup is not None and old_setup.get("running", False)
+            if running and not was_running:
+                control_bus.publish(SETUP_STARTED, user_id, setup_name)
+            elif was_running and not running:
+                control_bus.publish(SETUP_STOPPED, user_id, setup_name)
+            elif old_setup is not None and (running or setup_data != old_setup):
+                # Job yang berjalan masih memegang dict lama: ikat ulang
+                control_bus.publish(SETUP_UPDATED, user_id, setup_name)
 
 def is_admin(user_id: str) -> bool:
     """Check if user is admin"""
@@ -65,17 +128,8 @@ def verify_admin(user_id: str, password: str) -> bool:
     """Verify admin credentials"""
     config = load_config()
     user_id = str(user_id)
-    
+
     if user_id not in config["admins"]:
         return False
-        
-    return config["admins"][user_id].get("password") == password
-CONFIG_PATH = "config.json"
 
-def save_config(cfg: Dict[str, Any]) -> None:
-    """Save configuration to file with error handling"""
-    try:
-        with open(CONFIG_PATH, "w", encoding='utf-8') as f:
-            json.dump(cfg, f, indent=4, ensure_ascii=False)
-    except (IOError, TypeError) as e:
-        raise ConfigError(f"Failed to save configuration: {str(e)}")
\ No newline at end of file
+    return config["admins"][user_id].get("password") == password
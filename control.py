@@ -0,0 +1,58 @@
+import logging
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Jenis event kontrol
+SETUP_CREATED = "setup_created"
+SETUP_STARTED = "setup_started"
+SETUP_STOPPED = "setup_stopped"
+SETUP_UPDATED = "setup_updated"
+SETUP_DELETED = "setup_deleted"
+ACCOUNT_REMOVED = "account_removed"
+TOKEN_CHANGED = "token_changed"
+
+
+class ControlEvent:
+    """Event perubahan setup/akun yang dikirim lewat control bus"""
+
+    __slots__ = ("kind", "user_id", "setup_name")
+
+    def __init__(self, kind: str, user_id: str, setup_name: Optional[str] = None):
+        self.kind = kind
+        self.user_id = user_id
+        self.setup_name = setup_name
+
+    def __repr__(self) -> str:
+        return f"ControlEvent({self.kind}, {self.user_id}, {self.setup_name})"
+
+
+class ControlBus:
+    """
+    Pub/sub in-process untuk perubahan setup.
+
+    UI (view, modal, command) publish setelah config diubah; runner
+    subscribe dan langsung menambah/menghapus/menjadwalkan ulang job,
+    tanpa polling config.
+    """
+
+    def __init__(self):
+        self._subscribers: List[Callable[[ControlEvent], None]] = []
+
+    def subscribe(self, callback: Callable[[ControlEvent], None]) -> None:
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[ControlEvent], None]) -> None:
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def publish(self, kind: str, user_id: str, setup_name: Optional[str] = None) -> None:
+        event = ControlEvent(kind, str(user_id), setup_name)
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error("Error saat memproses %r: %s", event, e)
+
+
+control_bus = ControlBus()
@@ -0,0 +1,278 @@
+"""
+Engine posting standalone (scheduler + sender) terpisah dari bot Discord.
+
+    ENGINE_SOCKET=engine.sock python engine.py
+
+Bot yang dijalankan dengan ENGINE_SOCKET yang sama menjadi thin client
+(lihat engine_client.py): restart bot atau beban UI tidak mengganggu
+posting. Protokol lewat Unix socket, satu pesan JSON per baris:
+
+    bot -> engine   sync   {"accounts": {...}}             (saat connect)
+                    event  {"kind", "user_id", "setup_name", "account"}
+                    status {"id", "user_id"}
+    engine -> bot   result {"user_id", "setup_name", "ok", "status", "latency", "ts"}
+                    stopped {"user_id", "setup_name"}
+                    stats  {"scheduled", "running"}
+                    reply  {"id", "status"}
+
+Event memakai jenis event control bus (setup_started/stopped/updated/...),
+jadi start/stop/edit dari bot diterapkan engine persis seperti di proses
+bot. Config hanya dibaca engine; penulisnya tetap bot. Hasil kirim dan
+setup yang dinonaktifkan ditahan di buffer selama tidak ada bot terhubung.
+"""
+import os
+import sys
+import time
+import signal
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Dict, Optional, Set
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Engine punya log & endpoint metrics sendiri (env dibaca modul bot saat import)
+os.environ["LOG_FILE"] = os.getenv("ENGINE_LOG_FILE", "engine.log")
+os.environ["METRICS_PORT"] = os.getenv("ENGINE_METRICS_PORT", "9109")
+# Checkpoint jadwal engine terpisah dari milik bot (schedule.json)
+os.environ["SCHEDULE_CHECKPOINT_FILE"] = os.getenv("ENGINE_SCHEDULE_CHECKPOINT_FILE", "engine.schedule.json")
+
+from utils import setup_logger
+from config import config_store, load_config
+from history import post_history
+from http_client import http_sessions
+from metrics import metrics_server, SCHEDULED_SETUPS, RUNNING_SETUPS
+from autopost import SendResult
+from runner import (
+    setup_scheduler, startup_ramp, schedule_running_setups, checkpoint_schedule, add_send_listener
+)
+from sharding import (
+    shard_coordinator, apply_account, encode_message, decode_message, write_message, IPC_LINE_LIMIT,
+    IPC_WRITE_BUFFER_LIMIT, IPC_DROPPABLE
+)
+from engine_client import ENGINE_SOCKET
+from control import (
+    control_bus, ControlEvent, SETUP_STARTED, SETUP_STOPPED, SETUP_UPDATED,
+    SETUP_DELETED, ACCOUNT_REMOVED, TOKEN_CHANGED
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENGINE_SOCKET = "engine.sock"
+# Maksimal pesan result/stopped yang ditahan selama bot tidak terhubung
+ENGINE_BUFFER_SIZE = int(os.getenv("ENGINE_BUFFER_SIZE", "10000"))
+ENGINE_STATS_INTERVAL = float(os.getenv("ENGINE_STATS_INTERVAL", "5"))
+
+
+class EngineServer:
+    """Engine posting yang melayani bot lewat Unix socket"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started_at = time.time()
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self._buffer: deque = deque(maxlen=ENGINE_BUFFER_SIZE)
+        # True selama event dari bot dipublish ulang (supaya tidak dikirim balik)
+        self._applying = False
+        self._stop = asyncio.Event()
+
+    def _broadcast(self, message: Dict[str, Any], buffer: bool = True) -> None:
+        if not self._clients:
+            if buffer:
+                self._buffer.append(message)
+            return
+        for writer in list(self._clients):
+            if writer.is_closing():
+                self._clients.discard(writer)
+            elif message["op"] not in IPC_DROPPABLE and writer.transport.get_write_buffer_size() > IPC_WRITE_BUFFER_LIMIT:
+                # Bot tidak membaca socket: putus, pesan ditahan sampai bot reconnect
+                logger.error("Bot tidak membaca socket engine, koneksi diputus")
+                self._clients.discard(writer)
+                writer.close()
+                if not self._clients and buffer:
+                    self._buffer.append(message)
+            else:
+                write_message(writer, message)
+
+    def on_control_event(self, event: ControlEvent) -> None:
+        # Setup yang dinonaktifkan engine sendiri (token gagal / worker shard)
+        if self._applying or event.kind != SETUP_STOPPED:
+            return
+        self._broadcast({"op": "stopped", "user_id": event.user_id, "setup_name": event.setup_name})
+
+    def on_send_result(self, user_id: str, setup_name: str, result: SendResult) -> None:
+        self._broadcast({
+            "op": "result",
+            "user_id": user_id,
+            "setup_name": setup_name,
+            "ok": result.ok,
+            "status": result.status,
+            "latency": result.latency,
+            "ts": time.time(),
+        })
+
+    def _publish(self, kind: str, user_id: str, setup_name: Optional[str] = None) -> None:
+        self._applying = True
+        try:
+            control_bus.publish(kind, user_id, setup_name)
+        finally:
+            self._applying = False
+
+    def apply_event(self, message: Dict[str, Any]) -> None:
+        apply_account(message["user_id"], message["account"])
+        self._publish(message["kind"], message["user_id"], message["setup_name"])
+
+    def sync(self, accounts: Dict[str, Any]) -> None:
+        """Samakan config engine dengan config bot dan terapkan selisihnya sebagai event"""
+        local = load_config()["accounts"]
+        events = []
+        for user_id in list(local):
+            if user_id not in accounts:
+                apply_account(user_id, None)
+                events.append((ACCOUNT_REMOVED, user_id, None))
+
+        for user_id, account in accounts.items():
+            old = local.get(user_id) or {}
+            old_token = old.get("token")
+            # Dict setup yang berubah diganti (bukan diubah) oleh apply_account
+            old_setups = dict(old.get("setups", {}))
+            apply_account(user_id, account)
+
+            if old and old_token != account.get("token"):
+                events.append((TOKEN_CHANGED, user_id, None))
+            new_setups = account.get("setups", {})
+            for setup_name in old_setups:
+                if setup_name not in new_setups:
+                    events.append((SETUP_DELETED, user_id, setup_name))
+            for setup_name, setup_data in new_setups.items():
+                before = old_setups.get(setup_name)
+                if before == setup_data:
+                    continue
+                was_running = bool(before and before.get("running", False))
+                if setup_data.get("running", False) and not was_running:
+                    events.append((SETUP_STARTED, user_id, setup_name))
+                elif was_running and not setup_data.get("running", False):
+                    events.append((SETUP_STOPPED, user_id, setup_name))
+                elif before is not None:
+                    events.append((SETUP_UPDATED, user_id, setup_name))
+
+        for kind, user_id, setup_name in events:
+            self._publish(kind, user_id, setup_name)
+        if events:
+            logger.info("Sync dari bot: %s perubahan diterapkan", len(events))
+
+    def status(self, user_id: Optional[str] = None) -> Dict[str, Any]:
+        status: Dict[str, Any] = {
+            "uptime": int(time.time() - self.started_at),
+            "scheduled": int(SCHEDULED_SETUPS.value()),
+            "running": int(RUNNING_SETUPS.value()),
+            "shards": shard_coordinator.shards,
+            "clients": len(self._clients),
+            "buffered": len(self._buffer),
+        }
+        if user_id is not None:
+            # Jadwal per setup hanya tersedia tanpa sharding (job ada di proses ini)
+            offset = time.time() - time.monotonic()
+            status["next_due"] = {
+                job.setup_name: job.due + offset for job in setup_scheduler.user_jobs(str(user_id))
+            }
+        return status
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = decode_message(line)
+                op = message["op"]
+                if op == "sync":
+                    self.sync(message["accounts"])
+                    self._clients.add(writer)
+                    logger.info("Bot terhubung (%s pesan tertunda dikirim)", len(self._buffer))
+                    while self._buffer:
+                        writer.write(encode_message(self._buffer.popleft()))
+                elif op == "event":
+                    self.apply_event(message)
+                elif op == "status":
+                    writer.write(encode_message({
+                        "op": "reply", "id": message["id"], "status": self.status(message.get("user_id"))
+                    }))
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("Koneksi bot error: %s", e)
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+            logger.info("Bot terputus")
+
+    async def _report_stats(self) -> None:
+        while True:
+            self._broadcast({
+                "op": "stats",
+                "scheduled": int(SCHEDULED_SETUPS.value()),
+                "running": int(RUNNING_SETUPS.value()),
+            }, buffer=False)
+            await asyncio.sleep(ENGINE_STATS_INTERVAL)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop)
+
+        control_bus.subscribe(self.on_control_event)
+        add_send_listener(self.on_send_result)
+        await http_sessions.start()
+        await metrics_server.start()
+        if shard_coordinator.enabled:
+            shard_coordinator.start()
+        else:
+            setup_scheduler.start()
+            schedule_running_setups()
+
+        if os.path.exists(self.path):
+            os.remove(self.path)  # Socket sisa proses sebelumnya
+        server = await asyncio.start_unix_server(self._handle_client, path=self.path, limit=IPC_LINE_LIMIT)
+        os.chmod(self.path, 0o600)
+        stats_task = asyncio.create_task(self._report_stats())
+        logger.info("Engine posting aktif di %s", self.path)
+
+        try:
+            await self._stop.wait()
+        finally:
+            logger.info("Engine posting berhenti...")
+            stats_task.cancel()
+            server.close()
+            for writer in list(self._clients):
+                writer.close()
+            await shard_coordinator.stop()
+            await startup_ramp.stop()
+            await setup_scheduler.stop()
+            checkpoint_schedule()
+            await http_sessions.close()
+            await metrics_server.stop()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def main() -> None:
+    setup_logger()
+    # Penulis config & history adalah bot; engine hanya menyimpan checkpoint jadwal
+    config_store.persist = False
+    post_history.store.persist = False
+    path = ENGINE_SOCKET or DEFAULT_ENGINE_SOCKET
+    try:
+        asyncio.run(EngineServer(path).run())
+    except OSError as e:
+        logger.error("Engine gagal start di %s: %s", path, e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
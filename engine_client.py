@@ -0,0 +1,170 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+from config import load_config
+from metrics import SCHEDULED_SETUPS, RUNNING_SETUPS
+from runner import on_control_event as runner_on_control_event
+from checkpoint import schedule_checkpoint
+from sharding import (
+    IPC_LINE_LIMIT, encode_message, decode_message, record_remote_result, apply_remote_stop
+)
+from control import control_bus, ControlEvent
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Unix socket engine posting (engine.py); kosong = posting dijalankan di proses bot
+ENGINE_SOCKET = os.getenv("ENGINE_SOCKET", "")
+# Jeda reconnect ke engine (detik); dobel tiap gagal berturut-turut
+ENGINE_RECONNECT_DELAY = float(os.getenv("ENGINE_RECONNECT_DELAY", "2"))
+ENGINE_RECONNECT_MAX_DELAY = float(os.getenv("ENGINE_RECONNECT_MAX_DELAY", "30"))
+ENGINE_REQUEST_TIMEOUT = float(os.getenv("ENGINE_REQUEST_TIMEOUT", "5"))
+
+
+class EngineClient:
+    """
+    Sisi bot dari IPC ke engine posting terpisah.
+
+    Bot tetap penulis config & history. Saat (re)connect seluruh akun
+    dikirim (op "sync") supaya engine menyusul perubahan selama terputus;
+    setelah itu setiap event control bus diteruskan beserta data akun
+    terbaru. Hasil kirim dan setup yang dinonaktifkan engine dicatat di sini.
+    """
+
+    def __init__(self, path: str = ENGINE_SOCKET):
+        self.path = path
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._requests: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self.scheduled = 0
+        self.running = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    def start(self) -> None:
+        """Mulai koneksi ke engine; scheduler lokal tidak dipakai lagi"""
+        if not self.enabled or self._task is not None:
+            return
+        # Jadwal & checkpoint-nya milik engine; checkpoint bot tidak disentuh
+        control_bus.unsubscribe(runner_on_control_event)
+        control_bus.unsubscribe(schedule_checkpoint.on_control_event)
+        control_bus.subscribe(self.on_control_event)
+        SCHEDULED_SETUPS.set_function(lambda: self.scheduled)
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        delay = ENGINE_RECONNECT_DELAY
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=IPC_LINE_LIMIT)
+            except OSError as e:
+                logger.warning("Tidak bisa terhubung ke engine di %s: %s (coba lagi dalam %.0f detik)",
+                               self.path, e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, ENGINE_RECONNECT_MAX_DELAY)
+                continue
+
+            delay = ENGINE_RECONNECT_DELAY
+            self._writer = writer
+            self._send({"op": "sync", "accounts": load_config()["accounts"]})
+            logger.info("Terhubung ke engine posting di %s", self.path)
+            try:
+                await self._read(reader)
+            except (OSError, ValueError) as e:
+                logger.error("Koneksi ke engine error: %s", e)
+            finally:
+                self._disconnect()
+            logger.warning("Koneksi ke engine terputus, reconnect dalam %.0f detik", delay)
+            await asyncio.sleep(delay)
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                self._handle(decode_message(line))
+            except Exception as e:
+                logger.error("Pesan tidak valid dari engine: %s", e)
+
+    def _handle(self, message: Dict[str, Any]) -> None:
+        op = message["op"]
+        if op == "result":
+            record_remote_result(message)
+        elif op == "stopped":
+            apply_remote_stop(message)
+        elif op == "stats":
+            self.scheduled = message["scheduled"]
+            self.running = message["running"]
+            RUNNING_SETUPS.set(self.running)
+        elif op == "reply":
+            future = self._requests.pop(message["id"], None)
+            if future is not None and not future.done():
+                future.set_result(message["status"])
+
+    def _disconnect(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for future in self._requests.values():
+            if not future.done():
+                future.set_exception(ConnectionError("koneksi ke engine terputus"))
+        self._requests.clear()
+        self.scheduled = self.running = 0
+        RUNNING_SETUPS.set(0)
+
+    def _send(self, message: Dict[str, Any]) -> bool:
+        if not self.connected:
+            return False
+        self._writer.write(encode_message(message))
+        return True
+
+    def on_control_event(self, event: ControlEvent) -> None:
+        """Teruskan event ke engine (saat terputus, sync berikutnya yang menyusulkan)"""
+        self._send({
+            "op": "event",
+            "kind": event.kind,
+            "user_id": event.user_id,
+            "setup_name": event.setup_name,
+            "account": load_config()["accounts"].get(event.user_id),
+        })
+
+    async def status(self, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Status engine (dan jadwal setup user jika user_id diisi); None jika tidak terhubung"""
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._requests[request_id] = future
+        if not self._send({"op": "status", "id": request_id, "user_id": user_id}):
+            self._requests.pop(request_id, None)
+            return None
+        try:
+            return await asyncio.wait_for(future, timeout=ENGINE_REQUEST_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError):
+            self._requests.pop(request_id, None)
+            return None
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._disconnect()
+        control_bus.unsubscribe(self.on_control_event)
+        control_bus.subscribe(runner_on_control_event)
+        control_bus.subscribe(schedule_checkpoint.on_control_event)
+
+
+engine_client = EngineClient()
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Optional, Dict, Any
+from config import load_config, save_config
+from subscription import subscription_repo, _end_timestamp
+from control import control_bus, SETUP_STOPPED
+
+logger = logging.getLogger(__name__)
+
+# Batas tidur maksimal supaya perubahan jam sistem tetap terdeteksi
+MAX_SLEEP = 3600
+
+
+class ExpiryScheduler:
+    """
+    Meng-expire subscription secara proaktif.
+
+    Jadwal diambil dari index expiry ``subscription_repo`` (satu entry per
+    subscription aktif), jadi loop hanya bangun saat expiry berikutnya dan
+    subscription yang diperpanjang/dihapus tidak meninggalkan entry basi.
+    """
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # end_timestamp yang sedang ditunggu loop (None = tidak ada)
+        self._deadline: Optional[float] = None
+        subscription_repo.add_listener(self._on_subscription_changed)
+
+    def start(self) -> None:
+        """Mulai loop expiry (aman dipanggil berkali-kali)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _on_subscription_changed(self, sub_id: str, sub: Optional[Dict[str, Any]]) -> None:
+        # Bangunkan loop hanya jika ada expiry yang lebih cepat dari yang ditunggu
+        if sub is None or not sub.get("active", False):
+            return
+        end_ts = _end_timestamp(sub)
+        if end_ts is not None and (self._deadline is None or end_ts < self._deadline):
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                due = subscription_repo.expired_before(datetime.now())
+                if due:
+                    self.expire(due)
+
+                upcoming = subscription_repo.next_expiry()
+                self._deadline = upcoming[0] if upcoming else None
+                delay = MAX_SLEEP
+                if self._deadline is not None:
+                    delay = min(MAX_SLEEP, max(0.0, self._deadline - datetime.now().timestamp()))
+
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error dalam expiry scheduler: %s", e)
+                await asyncio.sleep(60)
+
+    def expire(self, sub_ids: List[str]) -> None:
+        """Nonaktifkan subscription dalam satu write lalu hentikan setup user-nya"""
+        expired = []
+        for sub_id in sub_ids:
+            if subscription_repo.update(sub_id, save=False, active=False):
+                expired.append(sub_id)
+        if not expired:
+            return
+        subscription_repo.save()
+
+        config = load_config()
+        stopped = []
+        for sub_id in expired:
+            user_id = subscription_repo.get(sub_id).get("discord_user_id")
+            user_data = config["accounts"].get(user_id or "")
+            if not user_data or user_data.get("subscription_id") != sub_id:
+                continue
+            for setup_name, setup_data in user_data.get("setups", {}).items():
+                if setup_data.get("running", False):
+                    setup_data["running"] = False
+                    stopped.append((user_id, setup_name))
+        if stopped:
+            for user_id in {user_id for user_id, _ in stopped}:
+                save_config(config, user_id)
+            for user_id, setup_name in stopped:
+                control_bus.publish(SETUP_STOPPED, user_id, setup_name)
+
+        logger.info("%s subscription expired, %s setup dihentikan", len(expired), len(stopped))
+
+
+expiry_scheduler = ExpiryScheduler()
@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from store import DocumentStore
+from persistence import atomic_write_text
+from scheduler import setup_key
+from control import control_bus, ControlEvent, SETUP_DELETED, ACCOUNT_REMOVED
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FILE = os.getenv("HISTORY_FILE", "history.json")
+# Jumlah hasil kirim terakhir yang disimpan per setup
+HISTORY_RECENT_SIZE = int(os.getenv("HISTORY_RECENT_SIZE", "50"))
+# Rollup per jam disimpan 48 jam; rollup per menit (60 menit) hanya untuk ALL_SETUPS,
+# per setup cukup rollup per 5 menit (12 bucket) untuk statistik 1 jam
+HISTORY_MINUTES = 60
+HISTORY_HOURS = 48
+HISTORY_SLOT_SECONDS = 300
+HISTORY_SLOTS = 12
+# File history dipadatkan (ditulis ulang penuh) jika baris log > faktor ini x jumlah key
+HISTORY_COMPACT_FACTOR = 4
+# History cukup di-flush jarang; kehilangan beberapa detik saat crash tidak masalah
+HISTORY_FLUSH_DELAY = float(os.getenv("HISTORY_FLUSH_DELAY", "30"))
+HISTORY_FLUSH_MAX_DELAY = float(os.getenv("HISTORY_FLUSH_MAX_DELAY", "120"))
+HISTORY_GENERATIONS = 1
+
+# Key rollup gabungan semua setup (untuk dashboard admin)
+ALL_SETUPS = "__all__"
+
+# Index field entry recent: [timestamp, ok, status, latency_ms]
+# Index field rollup: [awal bucket, terkirim, gagal, total latency_ms, jumlah latency]
+_SENT, _FAILED, _LATENCY_SUM, _LATENCY_COUNT = 1, 2, 3, 4
+
+
+def _encode_line(key: str, item: Optional[Dict[str, Any]]) -> str:
+    """Satu baris log history: [key, item] (item None = key dihapus)"""
+    return json.dumps([key, item], ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _read_history(path: str) -> Tuple[Dict[str, Any], int, bool]:
+    """Replay log history; return (data, jumlah baris, perlu dipadatkan)"""
+    data: Dict[str, Any] = {}
+    lines = 0
+    compact = False
+    if not os.path.exists(path):
+        return data, lines, compact
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            lines += 1
+            if not line.endswith("\n"):
+                compact = True  # Append berikutnya akan menyambung baris ini
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Baris terakhir terpotong saat crash: lewati
+                logger.warning("Baris history %s rusak dilewati", lines)
+                compact = True
+                continue
+            if isinstance(entry, dict):
+                data.update(entry)  # Format lama: satu dokumen JSON utuh
+                compact = True
+            elif entry[1] is None:
+                data.pop(entry[0], None)
+            else:
+                data[entry[0]] = entry[1]
+    return data, lines, compact
+
+
+def _add_rollup(buckets: List[List[float]], bucket_start: float, ok: bool,
+                latency_ms: Optional[float], keep: int) -> None:
+    if not buckets or buckets[-1][0] != bucket_start:
+        buckets.append([bucket_start, 0, 0, 0.0, 0])
+        if len(buckets) > keep:
+            del buckets[:len(buckets) - keep]
+    bucket = buckets[-1]
+    bucket[_SENT if ok else _FAILED] += 1
+    if latency_ms is not None:
+        bucket[_LATENCY_SUM] += latency_ms
+        bucket[_LATENCY_COUNT] += 1
+
+
+def _sum_rollups(buckets: List[List[float]], since: float) -> Dict[str, Any]:
+    sent = failed = latency_sum = latency_count = 0
+    for bucket in buckets:
+        if bucket[0] >= since:
+            sent += bucket[_SENT]
+            failed += bucket[_FAILED]
+            latency_sum += bucket[_LATENCY_SUM]
+            latency_count += bucket[_LATENCY_COUNT]
+    total = sent + failed
+    return {
+        "sent": int(sent),
+        "failed": int(failed),
+        "success_rate": sent / total if total else None,
+        "avg_latency_ms": latency_sum / latency_count if latency_count else None,
+    }
+
+
+class PostHistory:
+    """
+    Riwayat kirim per setup: ring buffer hasil terakhir + rollup per 5 menit dan per jam.
+
+    ``record`` hanya mengubah struktur kecil di memori (O(1)); penulisan ke
+    ``HISTORY_FILE`` dilakukan DocumentStore secara debounced di thread writer.
+    File berupa log append-only (satu baris JSON per key): flush hanya
+    menserialisasi dan menambahkan key yang berubah, dan file dipadatkan
+    sesekali dari serialisasi per key yang disimpan di memori.
+    """
+
+    def __init__(self, recent_size: int = HISTORY_RECENT_SIZE, path: str = HISTORY_FILE):
+        self.recent_size = recent_size
+        self.path = path
+        # Key yang berubah sejak snapshot terakhir
+        self._dirty: Set[str] = set()
+        # Baris log terakhir per key (dipakai saat pemadatan)
+        self._lines: Dict[str, str] = {}
+        # Jumlah baris di file sejak pemadatan terakhir
+        self._log_lines = 0
+        self._compact_next = False
+        self.store = DocumentStore(
+            "history",
+            load_func=self._load,
+            snapshot_func=self._snapshot,
+            write_func=self._write,
+            flush_delay=HISTORY_FLUSH_DELAY,
+            max_delay=HISTORY_FLUSH_MAX_DELAY,
+        )
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            data, lines, compact = _read_history(self.path)
+        except (OSError, UnicodeDecodeError, IndexError, TypeError) as e:
+            # History tidak kritis: mulai dari kosong daripada gagal start
+            logger.error("History rusak, dimulai dari kosong: %s", e)
+            data, lines, compact = {}, 0, True
+        for key, item in data.items():
+            if key != ALL_SETUPS:
+                item.pop("minutes", None)
+        self._dirty.clear()
+        self._lines = {key: _encode_line(key, item) for key, item in data.items()}
+        self._log_lines = lines
+        # Format lama / baris rusak: padatkan pada flush pertama
+        self._compact_next = compact
+        return data
+
+    def _snapshot(self, data: Dict[str, Any]) -> Tuple[str, str]:
+        """Serialisasi key yang berubah saja (dipanggil di event loop)"""
+        appended = []
+        for key in self._dirty:
+            item = data.get(key)
+            line = _encode_line(key, item)
+            appended.append(line)
+            if item is None:
+                self._lines.pop(key, None)
+            else:
+                self._lines[key] = line
+        self._dirty.clear()
+
+        self._log_lines += len(appended)
+        if self._compact_next or self._log_lines > HISTORY_COMPACT_FACTOR * max(len(self._lines), 100):
+            self._compact_next = False
+            self._log_lines = len(self._lines)
+            return "compact", "".join(self._lines.values())
+        return "append", "".join(appended)
+
+    def _write(self, snapshot: Tuple[str, str]) -> None:
+        mode, payload = snapshot
+        try:
+            if mode == "compact":
+                atomic_write_text(self.path, payload, HISTORY_GENERATIONS)
+            elif payload:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+        except BaseException:
+            # Baris yang gagal ditulis tidak bisa diulang satu per satu: tulis ulang penuh
+            self._compact_next = True
+            raise
+
+    def _item(self, key: str) -> Dict[str, Any]:
+        data = self.store.data
+        item = data.get(key)
+        if item is None:
+            item = data[key] = {"recent": [], "hours": [], "last_success": None}
+            if key == ALL_SETUPS:
+                item["minutes"] = []
+        self._dirty.add(key)
+        return item
+
+    def record(self, user_id: str, setup_name: str, ok: bool, status: Optional[str],
+               latency: Optional[float], timestamp: Optional[float] = None) -> None:
+        """Catat satu hasil kirim"""
+        now = timestamp if timestamp is not None else time.time()
+        latency_ms = round(latency * 1000, 1) if latency is not None else None
+        minute = now - now % 60
+        hour = now - now % 3600
+
+        item = self._item(setup_key(user_id, setup_name))
+        recent = item["recent"]
+        recent.append([now, ok, status, latency_ms])
+        if len(recent) > self.recent_size:
+            del recent[0]
+        if ok:
+            item["last_success"] = now
+
+        _add_rollup(item.setdefault("slots", []), now - now % HISTORY_SLOT_SECONDS, ok, latency_ms, HISTORY_SLOTS)
+        _add_rollup(item["hours"], hour, ok, latency_ms, HISTORY_HOURS)
+        all_item = self._item(ALL_SETUPS)
+        _add_rollup(all_item.setdefault("minutes", []), minute, ok, latency_ms, HISTORY_MINUTES)
+        _add_rollup(all_item["hours"], hour, ok, latency_ms, HISTORY_HOURS)
+        self.store.mark_dirty()
+
+    def recent(self, user_id: str, setup_name: str) -> List[List[Any]]:
+        """Hasil kirim terakhir (paling lama dulu)"""
+        item = self.store.data.get(setup_key(user_id, setup_name))
+        return list(item["recent"]) if item else []
+
+    def _summary(self, item: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        now = time.time()
+        if not item:
+            return {"last_hour": _sum_rollups([], now), "last_day": _sum_rollups([], now)}
+        since = now - 3600
+        recent = item["recent"]
+        if "minutes" in item:
+            minutes = item["minutes"]
+        elif len(recent) < self.recent_size or recent[0][0] < since:
+            # Ring recent mencakup 1 jam penuh: hitung persis per hasil
+            # ([ts, terkirim, gagal, latency, jumlah latency])
+            minutes = [
+                [ts, 1 if ok else 0, 0 if ok else 1, latency_ms or 0.0, 0 if latency_ms is None else 1]
+                for ts, ok, _, latency_ms in recent
+            ]
+        else:
+            # Lebih dari recent_size kirim per jam: pakai rollup 5 menit
+            minutes = item.get("slots", [])
+            since -= since % HISTORY_SLOT_SECONDS
+        return {
+            "last_hour": _sum_rollups(minutes, since),
+            "last_day": _sum_rollups(item["hours"], now - 86400),
+        }
+
+    def setup_summary(self, user_id: str, setup_name: str) -> Dict[str, Any]:
+        """Ringkasan untuk status embed / list_setups"""
+        item = self.store.data.get(setup_key(user_id, setup_name))
+        summary = self._summary(item)
+        last = item["recent"][-1] if item and item["recent"] else None
+        summary["last_attempt"] = last[0] if last else None
+        summary["last_status"] = last[2] if last else None
+        summary["last_success"] = item.get("last_success") if item else None
+        return summary
+
+    def global_summary(self) -> Dict[str, Any]:
+        """Ringkasan semua setup untuk dashboard admin"""
+        return self._summary(self.store.data.get(ALL_SETUPS))
+
+    def forget(self, user_id: str, setup_name: Optional[str] = None) -> None:
+        """Hapus history setup (atau semua setup user jika setup_name None)"""
+        data = self.store.data
+        if setup_name is not None:
+            key = setup_key(user_id, setup_name)
+            keys = [key] if key in data else []
+        else:
+            prefix = f"{user_id}_"
+            keys = [key for key in data if key.startswith(prefix)]
+        for key in keys:
+            del data[key]
+            self._dirty.add(key)
+        if keys:
+            self.store.mark_dirty()
+
+    def on_control_event(self, event: ControlEvent) -> None:
+        if event.kind == SETUP_DELETED:
+            self.forget(event.user_id, event.setup_name)
+        elif event.kind == ACCOUNT_REMOVED:
+            self.forget(event.user_id)
+
+    def flush(self) -> None:
+        self.store.flush()
+
+
+def format_rate(summary: Dict[str, Any]) -> str:
+    """'12/13 (92%)' dari hasil _sum_rollups"""
+    total = summary["sent"] + summary["failed"]
+    if not total:
+        return "-"
+    return f"{summary['sent']}/{total} ({summary['success_rate']:.0%})"
+
+
+def format_latency(summary: Dict[str, Any]) -> str:
+    latency = summary["avg_latency_ms"]
+    return f"{latency:.0f}ms" if latency is not None else "-"
+
+
+post_history = PostHistory()
+control_bus.subscribe(post_history.on_control_event)
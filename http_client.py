@@ -0,0 +1,80 @@
+import os
+import asyncio
+import logging
+import aiohttp
+from typing import Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Batas koneksi pool (total dan per host)
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "50"))
+# Detik koneksi idle dipertahankan (keep-alive)
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+# Detik hasil DNS di-cache
+HTTP_DNS_TTL = int(os.getenv("HTTP_DNS_TTL", "300"))
+# Base URL Discord API (bisa diarahkan ke server lokal, mis. untuk benchmark.py)
+DISCORD_API_BASE = os.getenv("DISCORD_API_BASE", "https://discord.com/api/v9").rstrip("/")
+
+
+class HttpSessionManager:
+    """
+    Satu aiohttp.ClientSession long-lived untuk semua request ke Discord API.
+
+    Koneksi TCP+TLS dipakai ulang antar request sehingga tidak ada handshake
+    baru per pesan atau per validasi token.
+    """
+
+    def __init__(
+        self,
+        limit: int = HTTP_POOL_LIMIT,
+        limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+        dns_ttl: int = HTTP_DNS_TTL,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_ttl = dns_ttl
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_ttl,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=10),
+        )
+
+    async def start(self) -> aiohttp.ClientSession:
+        """Buat session jika belum ada (dipanggil dari on_ready)"""
+        return self.get()
+
+    def get(self) -> aiohttp.ClientSession:
+        """Session aktif; dibuat otomatis jika belum ada atau sudah ditutup"""
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+            logger.info(
+                "HTTP session dibuat (limit=%s, per_host=%s)",
+                self.limit, self.limit_per_host
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Tutup session dan semua koneksi di pool"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            # Beri waktu transport SSL untuk menutup koneksi
+            await asyncio.sleep(0.25)
+        self._session = None
+
+
+http_sessions = HttpSessionManager()
@@ -1,10 +1,8 @@
 import os
 import asyncio
 import discord
-import random
 from dotenv import load_dotenv
 from discord.ext import commands, tasks
-from autopost import send_message
 from datetime import datetime
 from discord.ui import View, Button, Select
 from subscription import create_subscription, PACKAGES, get_subscription_info, load_subscriptions
@@ -15,24 +13,47 @@ import logging
 load_dotenv()
 
 # Import modul-modul kita
-from config import load_config, save_config, is_admin, add_admin
+from config import load_config, save_config, is_admin, add_admin, flush_config
 from utils import setup_logger, validate_token
-from models import MenuView, TokenModal
+from models import TokenModal, build_menu_embed, get_menu_view
 from auth import login_with_subscription, logout_user, is_logged_in, get_subscription_info
 from admin_auth import admin_login, admin_logout
 from admin_models import AdminPanelView
+from expiry import expiry_scheduler
+from http_client import http_sessions
+from metrics import metrics_server
+from broadcast import broadcast_engine
+from user_cache import user_resolver
+from history import post_history, format_rate
+from runner import setup_scheduler, startup_ramp, schedule_running_setups, checkpoint_schedule
+from sharding import shard_coordinator
+from engine_client import engine_client
+from control import control_bus, SETUP_STARTED, SETUP_STOPPED, SETUP_DELETED
 # Setup logging
 logger = setup_logger()
 logger = logging.getLogger(__name__)
 
+class AutoPostBot(commands.Bot):
+    async def close(self):
+        # Hentikan scheduler & tutup pool HTTP autopost sebelum koneksi gateway ditutup
+        # Jadwal milik engine/worker shard disimpan di checkpoint masing-masing
+        local_schedule = not (engine_client.enabled or shard_coordinator.enabled)
+        await engine_client.stop()
+        await shard_coordinator.stop()
+        await startup_ramp.stop()
+        await setup_scheduler.stop()
+        if local_schedule:
+            checkpoint_schedule()
+        await broadcast_engine.stop()
+        await http_sessions.close()
+        await metrics_server.stop()
+        await super().close()
+
 # Bot initialization
 intents = discord.Intents.default()
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot = AutoPostBot(command_prefix="!", intents=intents)
 config = load_config()
 
-# Dictionary untuk menyimpan task yang sedang berjalan
-running_tasks = {}
-
 # Fungsi untuk mengirim pesan ephemeral (hanya visible untuk user)
 async def send_ephemeral(ctx, message, delete_after=None):
     """Send ephemeral message using followup for commands"""
@@ -50,64 +71,6 @@ async def send_ephemeral(ctx, message, delete_after=None):
         logger.error("Error sending ephemeral message: %s", e)
         await ctx.send(message)
 
-# Fungsi baru untuk menjalankan satu setup secara kontinu
-async def run_setup_continuously(user_id, setup_name, setup_data, token):
-    """Jalankan satu setup secara terus menerus"""
-    task_id = f"{user_id}_{setup_name}"
-    
-    try:
-        while True:
-            # Periksa status running dari config terbaru
-            current_config = load_config()
-            current_user = current_config["accounts"].get(user_id, {})
-            current_setup = current_user.get("setups", {}).get(setup_name, {})
-            
-            if not current_setup.get("running", False):
-                logger.info("Setup %s user %s dihentikan", setup_name, user_id)
-                break
-
-            message = setup_data["message"]
-            base_interval = int(setup_data["interval"] * 60)  # menit -> detik
-            channel_id = setup_data.get("channel")
-            random_interval = int(setup_data.get("random_interval", 0) * 60)  # menit -> detik
-
-            if not channel_id:
-                logger.error("Setup %s user %s tidak punya channel", setup_name, user_id)
-                break
-
-            # Validate token before proceeding
-            if not await validate_token(token):
-                logger.error("Token tidak valid untuk user %s. Menonaktifkan setup %s.", user_id, setup_name)
-                # Update config untuk nonaktifkan setup ini
-                config = load_config()
-                if user_id in config["accounts"] and setup_name in config["accounts"][user_id]["setups"]:
-                    config["accounts"][user_id]["setups"][setup_name]["running"] = False
-                    save_config(config)
-                break
-
-            # Kirim pesan ke channel
-            logger.info("User %s - Setup %s: Mengirim pesan ke channel %s", user_id, setup_name, channel_id)
-            success = await send_message(token, channel_id.strip(), message)
-            if not success:
-                logger.error("Gagal mengirim pesan ke channel %s", channel_id)
-
-            # Delay sebelum cycle berikutnya
-            random_extra = random.randint(0, random_interval)
-            total_wait = base_interval + random_extra
-            logger.info("User %s - Setup %s: Menunggu %s detik sebelum cycle berikutnya",
-                        user_id, setup_name, total_wait)
-            await asyncio.sleep(total_wait)
-
-    except KeyError as e:
-        logger.error("Config tidak valid untuk setup %s user %s: %s", setup_name, user_id, e)
-    except Exception as e:
-        logger.error("Error tidak terduga pada setup %s user %s: %s", setup_name, user_id, e)
-        await asyncio.sleep(60)  # Tunggu 1 menit sebelum mencoba lagi
-    finally:
-        # Hapus task dari dictionary ketika selesai
-        if task_id in running_tasks:
-            del running_tasks[task_id]
-
 # Task untuk memulai semua setup yang running saat bot start
 @tasks.loop(seconds=2)
 async def startup_manager():
@@ -115,28 +78,16 @@ async def startup_manager():
     startup_manager.stop()  # Hanya jalankan sekali
     
     try:
-        cfg = load_config()
-        for user_id, user_data in cfg["accounts"].items():
-            if "setups" not in user_data:
-                continue
-
-            token = user_data.get("token")
-            if not token:
-                logger.error("User %s tidak memiliki token", user_id)
-                continue
-
-            for setup_name, setup_data in user_data["setups"].items():
-                if not setup_data.get("running", False):
-                    continue
-                
-                # Jalankan setup yang running
-                task_id = f"{user_id}_{setup_name}"
-                if task_id not in running_tasks:
-                    task = asyncio.create_task(
-                        run_setup_continuously(user_id, setup_name, setup_data, token)
-                    )
-                    running_tasks[task_id] = task
-                    logger.info("Memulai setup %s untuk user %s", setup_name, user_id)
+        if engine_client.enabled:
+            # Posting dijalankan engine terpisah (engine.py); bot hanya client
+            engine_client.start()
+            return
+        if shard_coordinator.enabled:
+            # Posting dijalankan di proses worker terpisah (SHARD_WORKERS)
+            shard_coordinator.start()
+            return
+        setup_scheduler.start()
+        schedule_running_setups()
                     
     except Exception as e:
         logger.error("Error dalam startup_manager: %s", e)
@@ -224,8 +175,7 @@ async def generate_sub(ctx: commands.Context, package_type: str, user_id: str =
         # Kirim ke user target (jika user_id berbeda dengan admin)
         if user_id and user_id != str(ctx.author.id):
             try:
-                user = await bot.fetch_user(int(user_id))
-                await user.send(embed=embed_user)
+                await user_resolver.send_dm(bot, user_id, embed=embed_user)
                 await send_ephemeral(ctx, f"✅ Subscription ID telah dikirim ke admin dan user <@{user_id}>")
             except (discord.NotFound, discord.Forbidden):
                 await send_ephemeral(ctx, f"✅ Subscription ID dibuat untuk user {user_id}, tetapi tidak bisa mengirim DM ke user tersebut.")
@@ -469,15 +419,9 @@ async def menu(ctx: commands.Context):
             await send_ephemeral(ctx, "❌ Anda harus login terlebih dahulu dengan `!login`")
             return
             
-        config = load_config()
-        embed = discord.Embed(
-            title="AutoPoster Control Panel",
-            description="Gunakan tombol di bawah buat setup & kontrol autopost.",
-            color=discord.Color.blurple()
-        )
-        view = MenuView(config)
-        message = await ctx.send(embed=embed, view=view)
-        view.set_menu_message(message)
+        embed = build_menu_embed()
+        view = get_menu_view()
+        await ctx.send(embed=embed, view=view)
     except Exception as e:
         logger.error("Error in menu command: %s", e, exc_info=True)
         await send_ephemeral(ctx, f"Terjadi error saat menampilkan menu: {str(e)}")
@@ -500,9 +444,14 @@ async def list_setups(ctx: commands.Context):
         for name, data in setups.items():
             status = "🟢 AKTIF" if data.get("running", False) else "🔴 NON-AKTIF"
             channel = data.get("channel", "Belum diatur")
+            history = post_history.setup_summary(user_id, name)
+            last_success = f"<t:{int(history['last_success'])}:R>" if history["last_success"] else "-"
             embed.add_field(
                 name=name,
-                value=f"{status}\nChannel: {channel}\nInterval: {data.get('interval', 1)} menit",
+                value=(
+                    f"{status}\nChannel: {channel}\nInterval: {data.get('interval', 1)} menit\n"
+                    f"Terakhir terkirim: {last_success} | Sukses 24 jam: {format_rate(history['last_day'])}"
+                ),
                 inline=False
             )
 
@@ -525,7 +474,8 @@ async def delete_setup(ctx: commands.Context, setup_name: str):
             return
 
         del config["accounts"][user_id]["setups"][setup_name]
-        save_config(config)
+        save_config(config, user_id)
+        control_bus.publish(SETUP_DELETED, user_id, setup_name)
 
         await send_ephemeral(ctx, f"Setup '{setup_name}' telah dihapus.")
 
@@ -553,7 +503,9 @@ async def start_all(ctx: commands.Context):
         for setup_name, setup_data in config["accounts"][user_id]["setups"].items():
             setup_data["running"] = True
 
-        save_config(config)
+        save_config(config, user_id)
+        for setup_name in config["accounts"][user_id]["setups"]:
+            control_bus.publish(SETUP_STARTED, user_id, setup_name)
         await send_ephemeral(ctx, "Semua setup telah diaktifkan.")
 
     except Exception as e:
@@ -575,7 +527,9 @@ async def stop_all(ctx: commands.Context):
         for setup_name, setup_data in config["accounts"][user_id]["setups"].items():
             setup_data["running"] = False
 
-        save_config(config)
+        save_config(config, user_id)
+        for setup_name in config["accounts"][user_id]["setups"]:
+            control_bus.publish(SETUP_STOPPED, user_id, setup_name)
         await send_ephemeral(ctx, "Semua setup telah dihentikan.")
 
     except Exception as e:
@@ -587,9 +541,19 @@ async def stop_all(ctx: commands.Context):
 async def on_ready():
     try:
         logger.info("%s sudah online!", bot.user)
+        # Session HTTP bersama untuk autopost & validasi token
+        await http_sessions.start()
+        # Control panel persistent: tombol menu lama tetap berfungsi setelah restart
+        bot.add_view(get_menu_view())
         # Mulai manager startup
         if not startup_manager.is_running():
             startup_manager.start()
+        # Expire subscription secara proaktif
+        expiry_scheduler.start()
+        # Endpoint /metrics di localhost
+        await metrics_server.start()
+        # Lanjutkan broadcast yang terputus oleh restart
+        broadcast_engine.resume(bot)
     except Exception as e:
         logger.error("Error in on_ready: %s", e)
 
@@ -612,4 +576,7 @@ if __name__ == "__main__":
     except discord.LoginError:
         logger.error("Token bot tidak valid")
     except Exception as e:
-        logger.error("Error starting bot: %s", e)
\ No newline at end of file
+        logger.error("Error starting bot: %s", e)
+    finally:
+        # Pastikan perubahan config yang belum di-flush tersimpan
+        flush_config()
\ No newline at end of file
@@ -0,0 +1,404 @@
+import os
+import time
+import bisect
+import logging
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from aiohttp import web
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Endpoint scrape Prometheus (hanya localhost); port 0 = nonaktif
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# Bucket default histogram latency (detik)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        '%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"Metric {self.name} butuh label {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Counter yang hanya naik"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def total(self) -> float:
+        return sum(self._values.values())
+
+    def items(self) -> List[Tuple[LabelValues, float]]:
+        return list(self._values.items())
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    """Nilai yang bisa naik/turun, atau dibaca dari callback saat scrape"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, func: Callable[[], float]) -> None:
+        """Baca nilai dari ``func`` saat dibutuhkan (hanya untuk gauge tanpa label)"""
+        self._function = func
+
+    def value(self, **labels: str) -> float:
+        if self._function is not None and not self.labelnames:
+            try:
+                return float(self._function())
+            except Exception as e:
+                logger.error("Gagal membaca gauge %s: %s", self.name, e)
+                return 0.0
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        if self._function is not None and not self.labelnames:
+            return [f"{self.name} {_format_value(self.value())}"]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class _HistogramData:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """Histogram dengan bucket tetap (observe O(log buckets))"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._data: Dict[LabelValues, _HistogramData] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        data = self._data.get(key)
+        if data is None:
+            # Bucket terakhir = +Inf
+            data = self._data[key] = _HistogramData(len(self.buckets) + 1)
+        data.counts[bisect.bisect_left(self.buckets, value)] += 1
+        data.sum += value
+        data.count += 1
+
+    def time(self, **labels: str) -> "_Timer":
+        """Context manager yang mengukur durasi blok dengan time.perf_counter"""
+        return _Timer(self, labels)
+
+    def count(self, **labels: str) -> int:
+        """Jumlah observasi untuk label tertentu, atau semua label jika kosong"""
+        if labels:
+            data = self._data.get(self._key(labels))
+            return data.count if data else 0
+        return sum(data.count for data in self._data.values())
+
+    def _merged(self) -> Optional[_HistogramData]:
+        if not self._data:
+            return None
+        merged = _HistogramData(len(self.buckets) + 1)
+        for data in self._data.values():
+            merged.counts = [a + b for a, b in zip(merged.counts, data.counts)]
+            merged.sum += data.sum
+            merged.count += data.count
+        return merged
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimasi quantile (interpolasi linear dalam bucket) dari semua label"""
+        data = self._merged()
+        if data is None or not data.count:
+            return None
+        rank = q * data.count
+        cumulative = 0
+        lower = 0.0
+        for i, bucket_count in enumerate(data.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]  # Di atas bucket terbesar
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            if i < len(self.buckets):
+                lower = self.buckets[i]
+        return self.buckets[-1]
+
+    def count_above(self, threshold: float) -> int:
+        """Jumlah observasi di atas bucket ``threshold`` (harus salah satu bucket)"""
+        data = self._merged()
+        if data is None:
+            return 0
+        index = bisect.bisect_right(self.buckets, threshold)
+        return sum(data.counts[index:])
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, data in self._data.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), data.counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(data.sum)}")
+            lines.append(f"{self.name}_count{labels} {data.count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class MetricsRegistry:
+    """Registry metric in-process; metric dengan nama sama dipakai bersama"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self.started_at = time.time()
+
+    def _get_or_create(self, cls, name: str, help_text: str, labelnames: Sequence[str], **kwargs) -> _Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} sudah terdaftar sebagai {metric.type_name}")
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Semua metric dalam format text Prometheus"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Metric yang dipakai lintas modul
+SEND_REQUESTS = registry.counter(
+    "autopost_send_requests_total", "Request kirim pesan ke Discord per status", ("status",))
+SEND_RESULTS = registry.counter(
+    "autopost_send_results_total", "Hasil akhir send_message", ("result",))
+SEND_RETRIES = registry.counter(
+    "autopost_send_retries_total", "Retry send_message (termasuk karena 429)", ("reason",))
+SEND_LATENCY = registry.histogram(
+    "autopost_send_latency_seconds", "Latency satu request kirim pesan")
+TOKEN_VALIDATIONS = registry.counter(
+    "token_validations_total", "Panggilan validate_token (termasuk yang dilayani cache)")
+TOKEN_CHECKS = registry.counter(
+    "token_checks_total", "Request /users/@me per hasil", ("result",))
+TOKEN_CHECK_LATENCY = registry.histogram(
+    "token_check_latency_seconds", "Latency request /users/@me")
+STORE_LOAD_SECONDS = registry.histogram(
+    "store_load_seconds", "Durasi load document store dari storage", ("store",))
+STORE_FLUSH_SECONDS = registry.histogram(
+    "store_flush_seconds", "Durasi flush document store ke storage", ("store",))
+STORE_FLUSH_ERRORS = registry.counter(
+    "store_flush_errors_total", "Flush document store yang gagal", ("store",))
+STORE_SAVES = registry.counter(
+    "store_saves_total", "Perubahan yang ditandai ke document store (save_config dll.)", ("store",))
+SCHEDULER_LATENESS = registry.histogram(
+    "scheduler_dispatch_lateness_seconds", "Keterlambatan eksekusi setup dari jadwalnya",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0))
+SCHEDULED_SETUPS = registry.gauge(
+    "scheduler_scheduled_setups", "Jumlah setup yang terjadwal di scheduler")
+RUNNING_SETUPS = registry.gauge(
+    "scheduler_running_setups", "Jumlah setup yang sedang dieksekusi worker")
+SETUP_CRASHES = registry.counter(
+    "scheduler_setup_crashes_total", "Cycle setup yang gagal karena exception (dijadwalkan ulang dengan backoff)")
+ACCOUNT_DISABLES = registry.counter(
+    "account_token_disables_total", "Akun yang semua setupnya dinonaktifkan karena token gagal")
+STARTUP_PENDING = registry.gauge(
+    "startup_pending_setups", "Setup yang menunggu giliran dijalankan saat bot start")
+STARTUP_INFLIGHT = registry.gauge(
+    "startup_inflight_setups", "Setup yang cycle pertamanya sedang berjalan saat bot start")
+STARTUP_ADMITTED = registry.counter(
+    "startup_admitted_setups_total", "Setup yang sudah dijalankan oleh startup ramp")
+STARTUP_DURATION = registry.gauge(
+    "startup_ramp_seconds", "Durasi startup ramp terakhir")
+IPC_DROPPED = registry.counter(
+    "ipc_dropped_messages_total", "Pesan IPC (laporan) yang dibuang karena penerima tidak membaca", ("op",))
+
+# Setup yang terlambat lebih dari ini dihitung "late" di ringkasan admin
+LATE_THRESHOLD = 5.0
+
+
+def _fmt_ms(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.0f}ms"
+
+
+def summary() -> Dict[str, str]:
+    """Ringkasan metric untuk embed statistik admin"""
+    sent = SEND_RESULTS.value(result="success")
+    failed = SEND_RESULTS.value(result="failure")
+    total = sent + failed
+    uptime = int(time.time() - registry.started_at)
+    hours, remainder = divmod(uptime, 3600)
+
+    return {
+        "Uptime": f"{hours}j {remainder // 60}m",
+        "Pesan Terkirim": f"{int(sent)}/{int(total)}" + (f" ({sent / total:.1%})" if total else ""),
+        "Send p50/p99": f"{_fmt_ms(SEND_LATENCY.quantile(0.5))} / {_fmt_ms(SEND_LATENCY.quantile(0.99))}",
+        "401 / 429": f"{int(SEND_REQUESTS.value(status='401'))} / {int(SEND_REQUESTS.value(status='429'))}",
+        "Validasi Token": f"{int(TOKEN_VALIDATIONS.total())} ({int(TOKEN_CHECKS.total())} request)",
+        "Setup Terjadwal": f"{int(SCHEDULED_SETUPS.value())} ({int(RUNNING_SETUPS.value())} berjalan)",
+        "Setup Telat >5s": str(SCHEDULER_LATENESS.count_above(LATE_THRESHOLD)),
+    }
+
+
+class MetricsServer:
+    """Endpoint HTTP /metrics (format Prometheus) di localhost"""
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT, metrics: MetricsRegistry = registry):
+        self.host = host
+        self.port = port
+        self.metrics = metrics
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=self.metrics.render(),
+            content_type="text/plain",
+            charset="utf-8",
+            headers={"X-Content-Type-Options": "nosniff"},
+        )
+
+    async def start(self) -> None:
+        """Mulai endpoint (aman dipanggil berkali-kali)"""
+        if self._runner is not None or not self.port:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+        except OSError as e:
+            logger.error("Gagal membuka endpoint metrics %s:%s: %s", self.host, self.port, e)
+            await runner.cleanup()
+            return
+        self._runner = runner
+        logger.info("Endpoint metrics aktif di http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics_server = MetricsServer()
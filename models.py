@@ -4,39 +4,30 @@ import logging
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 from config import load_config, save_config
-from utils import validate_token
+from utils import validate_token, invalidate_token
 from exceptions import ValidationError
+from history import post_history, format_rate, format_latency
+from control import (
+    control_bus, SETUP_CREATED, SETUP_STARTED, SETUP_STOPPED, SETUP_UPDATED, SETUP_DELETED, TOKEN_CHANGED
+)
 
 # Setup logger
 logger = logging.getLogger(__name__)
 
 
-async def refresh_menu_message(message: discord.Message):
-    """Refresh menu message dengan config terbaru"""
-    try:
-        if message is None:
-            logger.error("Cannot refresh menu: message is None")
-            return
-            
-        new_config = load_config()
-        embed = discord.Embed(
-            title="AutoPoster Control Panel",
-            description="Gunakan tombol di bawah buat setup & kontrol autopost.",
-            color=discord.Color.blurple()
-        )
-        
-        # Buat view baru dengan config terbaru dan referensi message
-        new_view = MenuView(new_config, message)
-        await message.edit(embed=embed, view=new_view)
-    except Exception as e:
-        logger.error("Error refreshing menu message: %s", e)
+def build_menu_embed() -> discord.Embed:
+    """Embed control panel"""
+    return discord.Embed(
+        title="AutoPoster Control Panel",
+        description="Gunakan tombol di bawah buat setup & kontrol autopost.",
+        color=discord.Color.blurple()
+    )
 
 
 class TokenModal(discord.ui.Modal):
-    def __init__(self, user_id: str, menu_message: discord.Message):
+    def __init__(self, user_id: str):
         super().__init__(title="Set Token User")
         self.user_id = user_id
-        self.menu_message = menu_message
         
         config = load_config()
         current_token = config["accounts"].get(user_id, {}).get("token", "")
@@ -63,17 +54,18 @@ class TokenModal(discord.ui.Modal):
             if self.user_id not in config["accounts"]:
                 config["accounts"][self.user_id] = {"setups": {}}
                 
+            old_token = config["accounts"][self.user_id].get("token")
+            if old_token != token:
+                invalidate_token(old_token)
             config["accounts"][self.user_id]["token"] = token
-            save_config(config)
+            save_config(config, self.user_id)
+            control_bus.publish(TOKEN_CHANGED, self.user_id)
             
             await interaction.response.send_message(
                 "Token berhasil disimpan! Sekarang Anda bisa membuat setup.",
                 ephemeral=True
             )
             
-            # Refresh menu utama
-            await refresh_menu_message(self.menu_message)
-            
         except ValidationError as e:
             await interaction.response.send_message(
                 f"Error validasi: {str(e)}", 
@@ -88,10 +80,9 @@ class TokenModal(discord.ui.Modal):
 
 
 class CreateSetupModal(discord.ui.Modal):
-    def __init__(self, user_id: str, menu_message: discord.Message):
+    def __init__(self, user_id: str):
         super().__init__(title="Buat Setup Baru")
         self.user_id = user_id
-        self.menu_message = menu_message
         
         self.add_item(discord.ui.InputText(
             label="Nama Setup",
@@ -129,16 +120,14 @@ class CreateSetupModal(discord.ui.Modal):
             }
 
             
-            save_config(config)
+            save_config(config, self.user_id)
+            control_bus.publish(SETUP_CREATED, self.user_id, setup_name)
             
             await interaction.response.send_message(
                 f"Setup '{setup_name}' berhasil dibuat! Silakan edit untuk mengatur konfigurasi.",
                 ephemeral=True
             )
             
-            # Refresh menu utama
-            await refresh_menu_message(self.menu_message)
-            
         except ValidationError as e:
             await interaction.response.send_message(
                 f"Error validasi: {str(e)}", 
@@ -153,11 +142,10 @@ class CreateSetupModal(discord.ui.Modal):
 
 
 class ConfirmDeleteView(discord.ui.View):
-    def __init__(self, user_id: str, setup_name: str, menu_message: discord.Message):
+    def __init__(self, user_id: str, setup_name: str):
         super().__init__(timeout=30)
         self.user_id = user_id
         self.setup_name = setup_name
-        self.menu_message = menu_message
     
     @discord.ui.button(label="Ya, Hapus", style=discord.ButtonStyle.danger)
     async def confirm_delete(self, button: discord.ui.Button, interaction: discord.Interaction):
@@ -175,16 +163,14 @@ class ConfirmDeleteView(discord.ui.View):
                 
             # Hapus setup
             del config["accounts"][self.user_id]["setups"][self.setup_name]
-            save_config(config)
+            save_config(config, self.user_id)
+            control_bus.publish(SETUP_DELETED, self.user_id, self.setup_name)
             
             await interaction.response.send_message(
                 f"Setup '{self.setup_name}' telah dihapus.",
                 ephemeral=True
             )
             
-            # Refresh menu utama
-            await refresh_menu_message(self.menu_message)
-            
             # Update message untuk menghapus view
             await interaction.edit_original_response(content=f"Setup '{self.setup_name}' telah dihapus.", view=None)
             
@@ -206,12 +192,11 @@ class ConfirmDeleteView(discord.ui.View):
 
 
 class SetupModal(discord.ui.Modal):
-    def __init__(self, user_id: str, setup_name: str, setup_data: Dict[str, Any], menu_message: discord.Message):
+    def __init__(self, user_id: str, setup_name: str, setup_data: Dict[str, Any]):
         super().__init__(title=f"Edit Setup: {setup_name}")
         self.user_id = user_id
         self.setup_name = setup_name
         self.setup_data = setup_data
-        self.menu_message = menu_message
 
         # Field channel tunggal
         channel_value = setup_data.get("channel", "")
@@ -281,15 +266,25 @@ class SetupModal(discord.ui.Modal):
                 except ValueError:
                     raise ValidationError("Random interval harus berupa angka")
 
+            # Baca ulang dari config: setup bisa di-start/stop/hapus selama modal terbuka
+            current = config["accounts"].get(self.user_id, {}).get("setups", {}).get(self.setup_name)
+            if current is None:
+                await interaction.response.send_message(
+                    f"Setup '{self.setup_name}' tidak ditemukan.",
+                    ephemeral=True
+                )
+                return
+
             config["accounts"][self.user_id]["setups"][self.setup_name] = {
                 "channel": channel,
                 "message": message,
                 "interval": interval,
                 "random_interval": random_interval,
-                "running": self.setup_data.get("running", False),
+                "running": current.get("running", False),
                 "last_updated": datetime.now().isoformat()
             }
-            save_config(config)
+            save_config(config, self.user_id)
+            control_bus.publish(SETUP_UPDATED, self.user_id, self.setup_name)
 
             embed = discord.Embed(
                 title="Setup Berhasil Diperbarui",
@@ -302,7 +297,6 @@ class SetupModal(discord.ui.Modal):
             embed.add_field(name="Random Interval", value=f"{random_interval} menit", inline=True)
 
             await interaction.response.send_message(embed=embed, ephemeral=True)
-            await refresh_menu_message(self.menu_message)
 
         except ValidationError as e:
             await interaction.response.send_message(f"Error validasi: {str(e)}", ephemeral=True)
@@ -312,11 +306,10 @@ class SetupModal(discord.ui.Modal):
 
 
 class SetupSelectView(discord.ui.View):
-    def __init__(self, user_id: str, action: str, menu_message: discord.Message):
+    def __init__(self, user_id: str, action: str):
         super().__init__(timeout=30)
         self.user_id = user_id
         self.action = action
-        self.menu_message = menu_message
         
         config = load_config()
         setups = config["accounts"].get(user_id, {}).get("setups", {})
@@ -351,28 +344,25 @@ class SetupSelectView(discord.ui.View):
                 SetupModal(
                     user_id=self.user_id, 
                     setup_name=selected_setup, 
-                    setup_data=setup_data,
-                    menu_message=self.menu_message
+                    setup_data=setup_data
                 )
             )
         elif self.action == "start":
             config["accounts"][self.user_id]["setups"][selected_setup]["running"] = True
-            save_config(config)
+            save_config(config, self.user_id)
+            control_bus.publish(SETUP_STARTED, self.user_id, selected_setup)
             await interaction.response.send_message(
                 f"Setup '{selected_setup}' telah diaktifkan.",
                 ephemeral=True
             )
-            # Refresh menu utama
-            await refresh_menu_message(self.menu_message)
         elif self.action == "stop":
             config["accounts"][self.user_id]["setups"][selected_setup]["running"] = False
-            save_config(config)
+            save_config(config, self.user_id)
+            control_bus.publish(SETUP_STOPPED, self.user_id, selected_setup)
             await interaction.response.send_message(
                 f"Setup '{selected_setup}' telah dihentikan.",
                 ephemeral=True
             )
-            # Refresh menu utama
-            await refresh_menu_message(self.menu_message)
         elif self.action == "status":
             status = "🟢 AKTIF" if setup_data.get("running", False) else "🔴 NON-AKTIF"
             token_valid = await validate_token(config["accounts"][self.user_id]["token"])
@@ -387,6 +377,14 @@ class SetupSelectView(discord.ui.View):
             embed.add_field(name="Interval", value=f"{setup_data.get('interval', 1)} menit", inline=True)
             embed.add_field(name="Random Interval", value=f"{setup_data.get('random_interval', 0)} menit", inline=True)
             
+            history = post_history.setup_summary(self.user_id, selected_setup)
+            last_success = f"<t:{int(history['last_success'])}:R>" if history["last_success"] else "Belum pernah"
+            embed.add_field(name="Terakhir Terkirim", value=last_success, inline=True)
+            embed.add_field(name="Status Terakhir", value=history["last_status"] or "-", inline=True)
+            embed.add_field(name="Sukses 1 Jam", value=format_rate(history["last_hour"]), inline=True)
+            embed.add_field(name="Sukses 24 Jam", value=format_rate(history["last_day"]), inline=True)
+            embed.add_field(name="Rata-rata Latency", value=format_latency(history["last_day"]), inline=True)
+            
             if "last_updated" in setup_data:
                 last_updated = datetime.fromisoformat(setup_data["last_updated"]).strftime("%Y-%m-%d %H:%M:%S")
                 embed.add_field(name="Terakhir Diupdate", value=last_updated, inline=False)
@@ -394,7 +392,7 @@ class SetupSelectView(discord.ui.View):
             await interaction.response.send_message(embed=embed, ephemeral=True)
         elif self.action == "delete":
             # Konfirmasi penghapusan
-            confirm_view = ConfirmDeleteView(self.user_id, selected_setup, self.menu_message)
+            confirm_view = ConfirmDeleteView(self.user_id, selected_setup)
             await interaction.response.send_message(
                 f"Apakah Anda yakin ingin menghapus setup '{selected_setup}'?",
                 view=confirm_view,
@@ -403,19 +401,29 @@ class SetupSelectView(discord.ui.View):
 
 
 class MenuView(discord.ui.View):
-    def __init__(self, config, menu_message: discord.Message = None):
+    """
+    Control panel persistent dan stateless.
+
+    Satu instance (lihat ``get_menu_view``) didaftarkan dengan ``bot.add_view``
+    dan dipakai untuk semua message menu. Semua tombol punya ``custom_id`` tetap
+    sehingga tetap berfungsi setelah restart; state user dan message menu
+    diambil dari config live dan ``interaction.message`` saat tombol diklik.
+    """
+
+    def __init__(self):
         super().__init__(timeout=None)
-        self.config = config
-        self.menu_message = menu_message
-    def set_menu_message(self, message: discord.Message):
-        """Set the menu message after it's been sent"""
-        self.menu_message = message
-    @discord.ui.button(label="Set Token", style=discord.ButtonStyle.secondary)
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        # Selalu baca config live (tidak ada snapshot per view)
+        return load_config()
+
+    @discord.ui.button(label="Set Token", style=discord.ButtonStyle.secondary, custom_id="menu_set_token")
     async def set_token(self, button: discord.ui.Button, interaction: discord.Interaction):
         """Tombol untuk mengatur token"""
         try:
             user_id = str(interaction.user.id)
-            await interaction.response.send_modal(TokenModal(user_id=user_id, menu_message=self.menu_message))
+            await interaction.response.send_modal(TokenModal(user_id=user_id))
         except Exception as e:
             logger.error("Error in set_token button: %s", e)
             if not interaction.response.is_done():
@@ -424,7 +432,7 @@ class MenuView(discord.ui.View):
                     ephemeral=True
                 )
 
-    @discord.ui.button(label="Buat Setup", style=discord.ButtonStyle.primary)
+    @discord.ui.button(label="Buat Setup", style=discord.ButtonStyle.primary, custom_id="menu_create_setup")
     async def create_setup(self, button: discord.ui.Button, interaction: discord.Interaction):
         try:
             user_id = str(interaction.user.id)
@@ -437,7 +445,7 @@ class MenuView(discord.ui.View):
                 )
                 return
                 
-            await interaction.response.send_modal(CreateSetupModal(user_id=user_id, menu_message=self.menu_message))
+            await interaction.response.send_modal(CreateSetupModal(user_id=user_id))
                 
         except Exception as e:
             logger.error("Error in create_setup button: %s", e)
@@ -447,7 +455,7 @@ class MenuView(discord.ui.View):
                     ephemeral=True
                 )
 
-    @discord.ui.button(label="Edit Setup", style=discord.ButtonStyle.primary)
+    @discord.ui.button(label="Edit Setup", style=discord.ButtonStyle.primary, custom_id="menu_edit_setup")
     async def edit_setup(self, button: discord.ui.Button, interaction: discord.Interaction):
         try:
             user_id = str(interaction.user.id)
@@ -462,7 +470,7 @@ class MenuView(discord.ui.View):
                 )
                 return
                 
-            view = SetupSelectView(user_id=user_id, action="edit", menu_message=self.menu_message)
+            view = SetupSelectView(user_id=user_id, action="edit")
             await interaction.response.send_message("Pilih setup untuk diedit:", view=view, ephemeral=True)
                 
         except Exception as e:
@@ -473,7 +481,7 @@ class MenuView(discord.ui.View):
                     ephemeral=True
                 )
 
-    @discord.ui.button(label="Start", style=discord.ButtonStyle.success)
+    @discord.ui.button(label="Start", style=discord.ButtonStyle.success, custom_id="menu_start")
     async def start(self, button: discord.ui.Button, interaction: discord.Interaction):
         try:
             user_id = str(interaction.user.id)
@@ -488,7 +496,7 @@ class MenuView(discord.ui.View):
                 )
                 return
                 
-            view = SetupSelectView(user_id=user_id, action="start", menu_message=self.menu_message)
+            view = SetupSelectView(user_id=user_id, action="start")
             await interaction.response.send_message("Pilih setup untuk di-start:", view=view, ephemeral=True)
                 
         except Exception as e:
@@ -499,7 +507,7 @@ class MenuView(discord.ui.View):
                     ephemeral=True
                 )
 
-    @discord.ui.button(label="Stop", style=discord.ButtonStyle.danger)
+    @discord.ui.button(label="Stop", style=discord.ButtonStyle.danger, custom_id="menu_stop")
     async def stop(self, button: discord.ui.Button, interaction: discord.Interaction):
         try:
             user_id = str(interaction.user.id)
@@ -514,7 +522,7 @@ class MenuView(discord.ui.View):
                 )
                 return
                 
-            view = SetupSelectView(user_id=user_id, action="stop", menu_message=self.menu_message)
+            view = SetupSelectView(user_id=user_id, action="stop")
             await interaction.response.send_message("Pilih setup untuk di-stop:", view=view, ephemeral=True)
                 
         except Exception as e:
@@ -525,7 +533,7 @@ class MenuView(discord.ui.View):
                     ephemeral=True
                 )
 
-    @discord.ui.button(label="Status", style=discord.ButtonStyle.secondary)
+    @discord.ui.button(label="Status", style=discord.ButtonStyle.secondary, custom_id="menu_status")
     async def status(self, button: discord.ui.Button, interaction: discord.Interaction):
         try:
             user_id = str(interaction.user.id)
@@ -540,7 +548,7 @@ class MenuView(discord.ui.View):
                 )
                 return
                 
-            view = SetupSelectView(user_id=user_id, action="status", menu_message=self.menu_message)
+            view = SetupSelectView(user_id=user_id, action="status")
             await interaction.response.send_message("Pilih setup untuk dilihat status:", view=view, ephemeral=True)
                 
         except Exception as e:
@@ -549,4 +557,15 @@ class MenuView(discord.ui.View):
                 await interaction.response.send_message(
                     "Terjadi error saat memeriksa status", 
                     ephemeral=True
-                )
\ No newline at end of file
+                )
+
+
+_menu_view: Optional[MenuView] = None
+
+
+def get_menu_view() -> MenuView:
+    """Instance MenuView tunggal (dibuat saat pertama dipakai, di dalam event loop)"""
+    global _menu_view
+    if _menu_view is None:
+        _menu_view = MenuView()
+    return _menu_view
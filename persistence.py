@@ -0,0 +1,118 @@
+import os
+import json
+import shutil
+import logging
+import tempfile
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Jumlah generasi backup yang disimpan (file.json.1 ... file.json.N)
+DEFAULT_GENERATIONS = int(os.getenv("PERSIST_GENERATIONS", "3"))
+
+
+def generation_path(path: str, generation: int) -> str:
+    """Path backup untuk generasi tertentu (1 = paling baru)"""
+    return f"{path}.{generation}"
+
+
+def _fsync_dir(directory: str) -> None:
+    # Windows tidak mendukung fsync pada direktori
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _rotate_generations(path: str, generations: int) -> None:
+    """Geser backup lama lalu jadikan file sekarang generasi 1"""
+    if generations <= 0 or not os.path.exists(path):
+        return
+
+    for i in range(generations - 1, 0, -1):
+        src = generation_path(path, i)
+        if os.path.exists(src):
+            os.replace(src, generation_path(path, i + 1))
+
+    # Hard link supaya file utama tidak pernah hilang selama rotasi
+    first = generation_path(path, 1)
+    if os.path.exists(first):
+        os.unlink(first)
+    try:
+        os.link(path, first)
+    except OSError:
+        shutil.copy2(path, first)
+
+
+def atomic_write_text(path: str, payload: str, generations: int = DEFAULT_GENERATIONS) -> None:
+    """
+    Tulis file secara atomic: temp file -> fsync -> rename.
+
+    Reader selalu melihat file lama atau file baru secara utuh, tidak pernah
+    file yang setengah tertulis.
+
+    Args:
+        path: Path file tujuan
+        payload: Isi file
+        generations: Jumlah backup generasi sebelumnya yang disimpan
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+        _rotate_generations(path, generations)
+        os.replace(tmp_path, path)
+        _fsync_dir(directory)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: str, data: Any, generations: int = DEFAULT_GENERATIONS, indent: Optional[int] = 4) -> None:
+    """Serialize data ke JSON lalu tulis secara atomic"""
+    atomic_write_text(path, json.dumps(data, indent=indent, ensure_ascii=False), generations)
+
+
+def read_json(path: str, default_factory: Callable[[], Any], generations: int = DEFAULT_GENERATIONS) -> Any:
+    """
+    Baca file JSON, fallback ke generasi backup terbaru yang valid.
+
+    Args:
+        path: Path file
+        default_factory: Dipanggil jika file maupun backup belum ada
+        generations: Jumlah generasi backup yang dicek
+
+    Returns:
+        Data JSON hasil parse
+
+    Raises:
+        ValueError: Jika file ada tapi file utama dan semua backup rusak
+    """
+    candidates = [path] + [generation_path(path, i) for i in range(1, generations + 1)]
+    errors = []
+
+    for candidate in candidates:
+        if not os.path.exists(candidate):
+            continue
+        try:
+            with open(candidate, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if candidate != path:
+                logger.warning("File %s rusak, memakai backup %s", path, candidate)
+            return data
+        except (json.JSONDecodeError, IOError, UnicodeDecodeError) as e:
+            errors.append(f"{candidate}: {e}")
+
+    if errors:
+        raise ValueError("; ".join(errors))
+    return default_factory()
@@ -0,0 +1,176 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Mapping, Optional, Tuple
+from dotenv import load_dotenv
+from token_cache import token_key
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Batas request per detik dari host ini ke Discord, untuk semua akun
+RATE_LIMIT_HOST_PER_SEC = float(os.getenv("RATE_LIMIT_HOST_PER_SEC", "45"))
+# Batas 429 berturut-turut per request sebelum menyerah
+RATE_LIMIT_MAX_429 = int(os.getenv("RATE_LIMIT_MAX_429", "5"))
+
+
+class _Bucket:
+    """State satu bucket rate limit Discord"""
+
+    __slots__ = ("remaining", "reset_at", "limit")
+
+    def __init__(self):
+        self.remaining: Optional[int] = None  # None = belum tahu, biarkan lewat
+        self.reset_at = 0.0
+        self.limit: Optional[int] = None
+
+
+class RateLimitManager:
+    """
+    Rate limiter berbasis header X-RateLimit-* Discord.
+
+    - Bucket dilacak per (token, bucket hash, major parameter). Sebelum hash
+      bucket diketahui, route dipakai sebagai key sementara.
+    - Request ditahan sampai bucket reset bila ``remaining`` sudah 0,
+      sehingga tidak ada request yang sengaja ditembakkan untuk ditolak 429.
+    - Global limit per token (429 dengan X-RateLimit-Global) menahan semua
+      request token tersebut; limiter host membatasi total request/detik.
+    """
+
+    def __init__(self, host_rate: float = RATE_LIMIT_HOST_PER_SEC):
+        self.host_rate = host_rate
+        self._host_tokens = host_rate
+        self._host_updated = time.monotonic()
+        # (token_hash, route) -> bucket hash dari Discord
+        self._route_buckets: Dict[Tuple[str, str], str] = {}
+        self._buckets: Dict[Tuple[str, str, str], _Bucket] = {}
+        # token_hash -> monotonic waktu global limit selesai
+        self._global_reset: Dict[str, float] = {}
+        self._updates = 0
+
+    def _bucket(self, token_hash: str, route: str, major: str) -> _Bucket:
+        bucket_hash = self._route_buckets.get((token_hash, route), route)
+        key = (token_hash, bucket_hash, major)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket()
+        return bucket
+
+    async def _acquire_host(self) -> None:
+        if self.host_rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self._host_tokens = min(self.host_rate, self._host_tokens + (now - self._host_updated) * self.host_rate)
+            self._host_updated = now
+            if self._host_tokens >= 1:
+                self._host_tokens -= 1
+                return
+            await asyncio.sleep((1 - self._host_tokens) / self.host_rate)
+
+    async def acquire(self, token: str, route: str, major: str = "") -> None:
+        """
+        Tunggu sampai request boleh dikirim lalu reservasi satu slot.
+
+        Args:
+            token: Token akun
+            route: Template route, mis. "POST /channels/{channel_id}/messages"
+            major: Major parameter (mis. channel ID)
+        """
+        token_hash = token_key(token)
+        while True:
+            now = time.monotonic()
+            global_reset = self._global_reset.get(token_hash, 0.0)
+            if global_reset > now:
+                await asyncio.sleep(global_reset - now)
+                continue
+
+            bucket = self._bucket(token_hash, route, major)
+            if bucket.remaining is not None and bucket.remaining <= 0:
+                if bucket.reset_at > now:
+                    await asyncio.sleep(bucket.reset_at - now)
+                    continue
+                # Sudah lewat reset: anggap penuh lagi sampai header berikutnya. Limit
+                # belum diketahui (mis. hanya pernah kena 429): loloskan satu request
+                # dulu untuk membaca header, jangan burst tanpa batas
+                bucket.remaining = bucket.limit if bucket.limit is not None else 1
+
+            if bucket.remaining is not None:
+                bucket.remaining -= 1
+            break
+
+        await self._acquire_host()
+
+    def update(self, token: str, route: str, major: str, status: int, headers: Mapping[str, str]) -> float:
+        """
+        Perbarui state dari header response.
+
+        Returns:
+            Detik yang harus ditunggu sebelum retry (hanya > 0 untuk 429)
+        """
+        token_hash = token_key(token)
+        now = time.monotonic()
+        self._maybe_prune(now)
+
+        bucket_hash = headers.get("X-RateLimit-Bucket")
+        if bucket_hash and self._route_buckets.get((token_hash, route)) != bucket_hash:
+            old = self._bucket(token_hash, route, major)
+            self._route_buckets[(token_hash, route)] = bucket_hash
+            new = self._bucket(token_hash, route, major)
+            if new is not old and new.remaining is None:
+                new.remaining, new.reset_at, new.limit = old.remaining, old.reset_at, old.limit
+
+        bucket = self._bucket(token_hash, route, major)
+        try:
+            if "X-RateLimit-Limit" in headers:
+                bucket.limit = int(headers["X-RateLimit-Limit"])
+            if "X-RateLimit-Remaining" in headers:
+                bucket.remaining = int(headers["X-RateLimit-Remaining"])
+            if "X-RateLimit-Reset-After" in headers:
+                bucket.reset_at = now + float(headers["X-RateLimit-Reset-After"])
+        except ValueError:
+            pass
+
+        if status != 429:
+            return 0.0
+
+        try:
+            retry_after = float(headers.get("Retry-After", 5))
+        except ValueError:
+            retry_after = 5.0
+
+        is_global = headers.get("X-RateLimit-Global", "").lower() == "true" or headers.get("X-RateLimit-Scope") == "global"
+        if is_global:
+            self._global_reset[token_hash] = now + retry_after
+            logger.warning("Global rate limit untuk token, tahan %.2f detik", retry_after)
+        else:
+            bucket.remaining = 0
+            bucket.reset_at = max(bucket.reset_at, now + retry_after)
+        return retry_after
+
+    def _maybe_prune(self, now: float) -> None:
+        # Buang bucket yang sudah lama reset supaya memori tidak tumbuh terus
+        self._updates += 1
+        if self._updates % 1000:
+            return
+        stale = [key for key, bucket in self._buckets.items() if bucket.reset_at < now - 300]
+        for key in stale:
+            del self._buckets[key]
+        # Mapping route -> bucket hash yang bucket-nya sudah tidak ada lagi
+        live = {(token_hash, bucket_hash) for token_hash, bucket_hash, _ in self._buckets}
+        for route_key in [k for k, bucket_hash in self._route_buckets.items() if (k[0], bucket_hash) not in live]:
+            del self._route_buckets[route_key]
+        for token_hash in [t for t, reset in self._global_reset.items() if reset < now]:
+            del self._global_reset[token_hash]
+
+    def release(self, token: str, route: str, major: str = "") -> None:
+        """Kembalikan slot yang direservasi jika request gagal sebelum ada response"""
+        bucket = self._bucket(token_key(token), route, major)
+        if bucket.remaining is not None and bucket.limit is not None:
+            bucket.remaining = min(bucket.limit, bucket.remaining + 1)
+
+
+rate_limiter = RateLimitManager()
@@ -0,0 +1,233 @@
+import time
+import random
+import logging
+from typing import Any, Callable, Dict, List, Optional
+from config import load_config
+from autopost import SendResult
+from accounts import account_supervisors, TOKEN_INVALID, TOKEN_CHANGED_STATUS
+from scheduler import SetupScheduler, SetupJob, setup_key
+from metrics import SCHEDULED_SETUPS
+from user_directory import user_directory
+from history import post_history
+from checkpoint import schedule_checkpoint
+from startup import StartupRamp
+from control import (
+    control_bus, ControlEvent, SETUP_STARTED, SETUP_STOPPED, SETUP_UPDATED,
+    SETUP_DELETED, ACCOUNT_REMOVED, TOKEN_CHANGED
+)
+
+logger = logging.getLogger(__name__)
+
+# Callback(user_id, setup_name, result) setelah setiap kirim (dipakai shard worker)
+_send_listeners: List[Callable[[str, str, SendResult], None]] = []
+
+
+def add_send_listener(callback: Callable[[str, str, SendResult], None]) -> None:
+    _send_listeners.append(callback)
+
+
+def notify_send_result(user_id: str, setup_name: str, result: SendResult) -> None:
+    for callback in _send_listeners:
+        callback(user_id, setup_name, result)
+
+
+def cycle_delay(setup_data: Dict[str, Any]) -> int:
+    """Delay (detik) antar cycle: interval + random extra"""
+    base_interval = int(setup_data["interval"] * 60)  # menit -> detik
+    random_interval = int(setup_data.get("random_interval", 0) * 60)  # menit -> detik
+    return base_interval + random.randint(0, random_interval)
+
+
+def bind_setup(job: SetupJob) -> Optional[Dict[str, Any]]:
+    """Ikat job ke dict setup live di config store"""
+    user_data = load_config()["accounts"].get(job.user_id, {})
+    job.setup = user_data.get("setups", {}).get(job.setup_name)
+    return job.setup
+
+
+# Fungsi untuk menjalankan satu cycle setup (dipanggil worker scheduler)
+async def run_setup_cycle(job: SetupJob) -> Optional[float]:
+    """Kirim satu pesan untuk setup; return delay ke cycle berikutnya atau None untuk berhenti"""
+    user_id = job.user_id
+    setup_name = job.setup_name
+
+    try:
+        setup_data = job.setup if job.setup is not None else bind_setup(job)
+
+        # Guard: stop/start normalnya sudah diterapkan lewat control bus
+        if not setup_data or not setup_data.get("running", False):
+            logger.info("Setup %s user %s dihentikan", setup_name, user_id)
+            return None
+
+        current_config = load_config()
+        token = current_config["accounts"].get(user_id, {}).get("token")
+        if not token:
+            logger.error("User %s tidak memiliki token", user_id)
+            return None
+
+        message = setup_data["message"]
+        channel_id = setup_data.get("channel")
+
+        if not channel_id:
+            logger.error("Setup %s user %s tidak punya channel", setup_name, user_id)
+            return None
+
+        # Scheduler menjalankan satu job per akun; validasi token dilakukan di dalam send
+        account = account_supervisors.get(user_id)
+        job.last_fired = time.monotonic()
+        logger.info("User %s - Setup %s: Mengirim pesan ke channel %s", user_id, setup_name, channel_id)
+        result = await account.send(token, channel_id.strip(), message)
+        if result is None:
+            # Token akun sudah gagal di setup lain; setup ini ikut dinonaktifkan
+            account.disable_all()
+            return None
+        if result.status == TOKEN_CHANGED_STATUS:
+            # Token diganti selama cek token: ulangi segera dengan token baru
+            logger.info("Token user %s diganti selama kirim, setup %s diulang", user_id, setup_name)
+            return 0.0
+        post_history.record(user_id, setup_name, result.ok, result.status, result.latency)
+        notify_send_result(user_id, setup_name, result)
+        if account.token_state == TOKEN_INVALID:
+            account.disable_all()
+            return None
+        if result.ok:
+            user_directory.record_activity(user_id)
+        else:
+            logger.error("Gagal mengirim pesan ke channel %s", channel_id)
+
+        # Delay sebelum cycle berikutnya (pakai versi setup terbaru jika diedit selama kirim)
+        total_wait = cycle_delay(job.setup or setup_data)
+        now = time.time()
+        schedule_checkpoint.record(user_id, setup_name, now + total_wait, last_sent=now)
+        logger.info("User %s - Setup %s: Menunggu %s detik sebelum cycle berikutnya",
+                    user_id, setup_name, total_wait)
+        return total_wait
+
+    except KeyError as e:
+        logger.error("Config tidak valid untuk setup %s user %s: %s", setup_name, user_id, e)
+        return None
+
+
+# Scheduler tunggal untuk semua setup yang berjalan
+setup_scheduler = SetupScheduler(run_setup_cycle)
+SCHEDULED_SETUPS.set_function(lambda: len(setup_scheduler))
+
+
+def should_start(user_id: str, setup_name: str) -> bool:
+    """Setup masih ditandai running dan akunnya punya token"""
+    user_data = load_config()["accounts"].get(user_id, {})
+    setup_data = user_data.get("setups", {}).get(setup_name)
+    return bool(user_data.get("token") and setup_data and setup_data.get("running", False))
+
+
+# Setup yang harus langsung jalan saat start dimasukkan bertahap
+startup_ramp = StartupRamp(setup_scheduler, should_start)
+setup_scheduler.handler = startup_ramp.wrap(setup_scheduler.handler)
+
+
+def apply_setup_update(user_id: str, setup_name: str) -> None:
+    """Terapkan edit setup ke job yang sedang berjalan"""
+    job = setup_scheduler.get(user_id, setup_name)
+    if job is None:
+        return
+
+    old_setup = job.setup
+    setup_data = bind_setup(job)
+    if not setup_data:
+        setup_scheduler.remove(user_id, setup_name)
+        return
+
+    interval_changed = (
+        old_setup is None
+        or old_setup.get("interval") != setup_data.get("interval")
+        or old_setup.get("random_interval") != setup_data.get("random_interval")
+    )
+    # Job yang sedang kirim memakai interval baru saat selesai (lihat run_setup_cycle)
+    if interval_changed and not job.running:
+        # Hitung ulang fire berikutnya dari waktu kirim terakhir
+        delay = 0.0
+        if job.last_fired is not None:
+            delay = max(0.0, job.last_fired + cycle_delay(setup_data) - time.monotonic())
+        setup_scheduler.reschedule(user_id, setup_name, delay)
+        schedule_checkpoint.record(user_id, setup_name, time.time() + delay)
+        logger.info("Setup %s user %s dijadwalkan ulang (%.0f detik)", setup_name, user_id, delay)
+
+
+def on_control_event(event: ControlEvent) -> None:
+    """Terapkan perubahan setup ke scheduler saat itu juga"""
+    if event.kind == SETUP_STARTED:
+        if setup_key(event.user_id, event.setup_name) not in setup_scheduler:
+            setup_scheduler.add(event.user_id, event.setup_name)
+            logger.info("Memulai setup %s untuk user %s", event.setup_name, event.user_id)
+    elif event.kind in (SETUP_STOPPED, SETUP_DELETED):
+        if setup_scheduler.remove(event.user_id, event.setup_name):
+            logger.info("Setup %s user %s dihentikan", event.setup_name, event.user_id)
+    elif event.kind == SETUP_UPDATED:
+        apply_setup_update(event.user_id, event.setup_name)
+    elif event.kind == ACCOUNT_REMOVED:
+        setup_scheduler.remove_user(event.user_id)
+    elif event.kind == TOKEN_CHANGED:
+        user_data = load_config()["accounts"].get(event.user_id, {})
+        if not user_data.get("token"):
+            setup_scheduler.remove_user(event.user_id)
+            return
+        # Token baru: jalankan lagi setup yang masih ditandai running
+        for setup_name, setup_data in user_data.get("setups", {}).items():
+            if setup_data.get("running", False) and setup_key(event.user_id, setup_name) not in setup_scheduler:
+                setup_scheduler.add(event.user_id, setup_name)
+
+control_bus.subscribe(on_control_event)
+
+
+def checkpoint_schedule() -> None:
+    """Simpan jadwal semua job ke checkpoint (dipanggil saat shutdown)"""
+    schedule_checkpoint.record_jobs(setup_scheduler.jobs())
+    schedule_checkpoint.flush()
+
+
+def schedule_running_setups() -> int:
+    """
+    Jadwalkan semua setup yang ditandai running (dipanggil saat bot start).
+
+    Timer dilanjutkan dari checkpoint. Setup yang jadwalnya terlewat selama
+    bot mati (atau belum punya checkpoint) dikirim sekali lewat startup ramp,
+    paling terlambat dulu.
+    """
+    scheduled = 0
+    running = []
+    overdue = []
+    now = time.time()
+    cfg = load_config()
+    for user_id, user_data in cfg["accounts"].items():
+        if "setups" not in user_data:
+            continue
+
+        token = user_data.get("token")
+        if not token:
+            logger.error("User %s tidak memiliki token", user_id)
+            continue
+
+        for setup_name, setup_data in user_data["setups"].items():
+            if not setup_data.get("running", False):
+                continue
+
+            # Jadwalkan setup yang running
+            running.append(setup_key(user_id, setup_name))
+            if running[-1] in setup_scheduler:
+                continue
+
+            next_due = schedule_checkpoint.next_due(user_id, setup_name)
+            if next_due is None or next_due <= now:
+                overdue.append((now - next_due if next_due is not None else 0.0, user_id, setup_name))
+                continue
+
+            job = setup_scheduler.add(user_id, setup_name, next_due - now)
+            last_sent = schedule_checkpoint.get(user_id, setup_name).get("last_sent")
+            if last_sent is not None:
+                job.last_fired = time.monotonic() - max(0.0, now - last_sent)
+            scheduled += 1
+            logger.info("Melanjutkan setup %s untuk user %s (kirim dalam %.0f detik)", setup_name, user_id, next_due - now)
+
+    schedule_checkpoint.prune(running)
+    startup_ramp.start(overdue)
+    return scheduled + len(overdue)
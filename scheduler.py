@@ -0,0 +1,278 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from metrics import SCHEDULER_LATENESS, RUNNING_SETUPS, SETUP_CRASHES
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Jumlah worker yang mengeksekusi post secara bersamaan
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "50"))
+# Backoff (detik) sebelum setup yang crash dijalankan lagi; dobel tiap crash berturut-turut
+SCHEDULER_CRASH_BACKOFF = float(os.getenv("SCHEDULER_CRASH_BACKOFF", "30"))
+SCHEDULER_CRASH_BACKOFF_MAX = float(os.getenv("SCHEDULER_CRASH_BACKOFF_MAX", "1800"))
+
+
+def setup_key(user_id: str, setup_name: str) -> str:
+    """Key unik setup (sama dengan task_id lama)"""
+    return f"{user_id}_{setup_name}"
+
+
+class SetupJob:
+    """Satu setup yang terjadwal di scheduler"""
+
+    __slots__ = (
+        "key", "user_id", "setup_name", "due", "generation", "running", "deferred",
+        "setup", "last_fired", "crashes"
+    )
+
+    def __init__(self, user_id: str, setup_name: str, due: float):
+        self.key = setup_key(user_id, setup_name)
+        self.user_id = user_id
+        self.setup_name = setup_name
+        self.due = due
+        # Naik setiap kali job dijadwalkan ulang / dihapus; entry heap lama jadi basi
+        self.generation = 0
+        # True selama handler sedang dieksekusi worker
+        self.running = False
+        # Jatuh tempo lagi selama masih dieksekusi; di-push ulang saat selesai
+        self.deferred = False
+        # Referensi ke dict setup live di config store (diikat ulang saat setup diedit)
+        self.setup: Optional[dict] = None
+        # time.monotonic() saat terakhir mengirim
+        self.last_fired: Optional[float] = None
+        # Jumlah crash berturut-turut (untuk backoff restart)
+        self.crashes = 0
+
+
+# handler(job) -> delay (detik) sampai fire berikutnya, atau None untuk berhenti
+JobHandler = Callable[[SetupJob], Awaitable[Optional[float]]]
+
+
+class SetupScheduler:
+    """
+    Scheduler tunggal untuk semua setup.
+
+    Menggantikan satu asyncio task per setup dengan min-heap waktu fire
+    berikutnya, satu dispatcher dan worker pool berukuran tetap.
+    add/remove/reschedule O(log n); entry heap yang basi dibuang saat di-pop.
+
+    Job milik satu akun dieksekusi satu per satu: job yang jatuh tempo
+    selagi job lain dari akun yang sama berjalan diparkir (FIFO per akun)
+    dan diserahkan ke worker saat job tersebut selesai, sehingga worker
+    tidak pernah menunggu akun yang sibuk.
+    """
+
+    def __init__(self, handler: JobHandler, workers: int = SCHEDULER_WORKERS):
+        self.handler = handler
+        self.workers = workers
+        self._jobs: Dict[str, SetupJob] = {}
+        # user_id -> key job milik user
+        self._by_user: Dict[str, Dict[str, None]] = {}
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._seq = 0
+        self._queue: "asyncio.Queue[Tuple[SetupJob, int]]" = asyncio.Queue()
+        # user_id yang job-nya sedang antre/berjalan di worker
+        self._busy_users: Set[str] = set()
+        # user_id -> job jatuh tempo yang menunggu akunnya selesai
+        self._parked: Dict[str, Deque[Tuple[SetupJob, int]]] = {}
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._jobs
+
+    def get(self, user_id: str, setup_name: str) -> Optional[SetupJob]:
+        return self._jobs.get(setup_key(user_id, setup_name))
+
+    def jobs(self) -> List[SetupJob]:
+        return list(self._jobs.values())
+
+    def user_jobs(self, user_id: str) -> List[SetupJob]:
+        return [self._jobs[key] for key in self._by_user.get(user_id, {})]
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """Mulai dispatcher dan worker (aman dipanggil berkali-kali)"""
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._dispatch_loop()))
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(i)))
+        logger.info("Scheduler dimulai dengan %s worker", self.workers)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._busy_users.clear()
+        self._parked.clear()
+
+    def parked(self, user_id: Optional[str] = None) -> int:
+        """Jumlah job yang menunggu akunnya selesai (semua akun jika user_id None)"""
+        if user_id is not None:
+            return len(self._parked.get(user_id, ()))
+        return sum(len(parked) for parked in self._parked.values())
+
+    def add(self, user_id: str, setup_name: str, delay: float = 0.0) -> SetupJob:
+        """Jadwalkan setup; jika sudah ada, tidak diubah"""
+        key = setup_key(user_id, setup_name)
+        job = self._jobs.get(key)
+        if job is not None:
+            return job
+        job = SetupJob(user_id, setup_name, time.monotonic() + delay)
+        self._jobs[key] = job
+        self._by_user.setdefault(user_id, {})[key] = None
+        self._push(job)
+        return job
+
+    def remove(self, user_id: str, setup_name: str) -> bool:
+        """Hapus setup dari jadwal; post yang sedang berjalan tetap selesai"""
+        job = self._jobs.get(setup_key(user_id, setup_name))
+        if job is None:
+            return False
+        self._discard(job)
+        self._maybe_compact()
+        return True
+
+    def remove_user(self, user_id: str) -> int:
+        """Hapus semua setup milik user dari jadwal"""
+        jobs = self.user_jobs(user_id)
+        for job in jobs:
+            self._discard(job)
+        self._maybe_compact()
+        return len(jobs)
+
+    def _discard(self, job: SetupJob) -> None:
+        del self._jobs[job.key]
+        user_keys = self._by_user.get(job.user_id)
+        if user_keys is not None:
+            user_keys.pop(job.key, None)
+            if not user_keys:
+                del self._by_user[job.user_id]
+        job.generation += 1
+
+    def reschedule(self, user_id: str, setup_name: str, delay: float) -> bool:
+        """Ganti waktu fire berikutnya menjadi sekarang + delay"""
+        job = self._jobs.get(setup_key(user_id, setup_name))
+        if job is None:
+            return False
+        job.generation += 1
+        job.due = time.monotonic() + delay
+        self._push(job)
+        self._maybe_compact()
+        return True
+
+    def _push(self, job: SetupJob) -> None:
+        self._seq += 1
+        was_next = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (job.due, self._seq, job.key, job.generation))
+        if was_next is None or job.due < was_next:
+            self._wakeup.set()
+
+    def _maybe_compact(self) -> None:
+        # Bangun ulang heap jika entry basi jauh lebih banyak dari job aktif
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._jobs):
+            self._heap = [
+                entry for entry in self._heap
+                if (job := self._jobs.get(entry[2])) is not None and job.generation == entry[3]
+            ]
+            heapq.heapify(self._heap)
+
+    async def _dispatch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, key, generation = heapq.heappop(self._heap)
+                job = self._jobs.get(key)
+                if job is None or job.generation != generation:
+                    continue
+                if job.running:
+                    job.deferred = True
+                    continue
+                if job.user_id in self._busy_users:
+                    self._parked.setdefault(job.user_id, deque()).append((job, generation))
+                    continue
+                self._busy_users.add(job.user_id)
+                job.running = True
+                self._queue.put_nowait((job, generation))
+
+            self._wakeup.clear()
+            # Timer biasa, bukan wait_for: wait_for di 3.11 bisa menelan cancel dari stop()
+            # jika event di-set bersamaan
+            timer = loop.call_at(self._heap[0][0], self._wakeup.set) if self._heap else None
+            try:
+                await self._wakeup.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job, generation = await self._queue.get()
+            delay: Optional[float] = None
+            SCHEDULER_LATENESS.observe(max(0.0, time.monotonic() - job.due))
+            RUNNING_SETUPS.inc()
+            try:
+                delay = await self.handler(job)
+                job.crashes = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Jangan buang job: jalankan lagi setelah backoff
+                job.crashes += 1
+                delay = min(SCHEDULER_CRASH_BACKOFF * 2 ** (job.crashes - 1), SCHEDULER_CRASH_BACKOFF_MAX)
+                SETUP_CRASHES.inc()
+                logger.error("Error tidak terduga pada setup %s user %s: %s (restart dalam %.0f detik)",
+                             job.setup_name, job.user_id, e, delay)
+            finally:
+                job.running = False
+                RUNNING_SETUPS.dec()
+                self._queue.task_done()
+                self._next_for_user(job.user_id)
+
+            current = self._jobs.get(job.key)
+            if current is not job:
+                continue  # Dihapus selama dieksekusi
+            if job.generation != generation:
+                # Dijadwalkan ulang selama dieksekusi
+                if job.deferred:
+                    job.deferred = False
+                    self._push(job)
+                continue
+            if delay is None:
+                self._discard(job)
+                continue
+            job.due = time.monotonic() + delay
+            self._push(job)
+
+    def _next_for_user(self, user_id: str) -> None:
+        """Serahkan job berikutnya yang diparkir untuk akun ini ke worker"""
+        parked = self._parked.get(user_id)
+        while parked:
+            job, generation = parked.popleft()
+            # Lewati job yang dihapus / dijadwalkan ulang selama diparkir
+            if self._jobs.get(job.key) is not job or job.generation != generation or job.running:
+                continue
+            if not parked:
+                del self._parked[user_id]
+            job.running = True
+            self._queue.put_nowait((job, generation))
+            return
+        self._parked.pop(user_id, None)
+        self._busy_users.discard(user_id)
@@ -0,0 +1,132 @@
+"""
+Proses worker posting untuk mode multi-proses (SHARD_WORKERS > 0).
+
+Dijalankan oleh ShardCoordinator (sharding.py), bukan manual:
+
+    python shard_worker.py <index> <jumlah shard>
+
+Worker menerima akun shard-nya dan event control bus lewat stdin, lalu
+mengirim hasil kirim & setup yang dinonaktifkan lewat stdout (JSON per
+baris). Config dan history hanya disimpan di memori; proses bot adalah
+satu-satunya penulis.
+"""
+import sys
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+from utils import setup_logger
+from config import config_store
+from history import post_history
+from http_client import http_sessions
+from metrics import metrics_server, RUNNING_SETUPS
+from autopost import SendResult
+from runner import (
+    setup_scheduler, startup_ramp, schedule_running_setups, checkpoint_schedule, add_send_listener
+)
+from sharding import IPC_LINE_LIMIT, SHARD_STATS_INTERVAL, write_message, decode_message, apply_account
+from control import control_bus, ControlEvent, SETUP_STOPPED
+
+logger = logging.getLogger(__name__)
+
+
+class ShardWorker:
+    """Sisi worker dari protokol IPC sharding"""
+
+    def __init__(self, index: int, shards: int):
+        self.index = index
+        self.shards = shards
+        self._writer: Optional[asyncio.StreamWriter] = None
+        # True selama event dari bot dipublish ulang (supaya tidak dikirim balik)
+        self._applying = False
+
+    def send(self, message: Dict[str, Any]) -> None:
+        if self._writer is not None and not self._writer.is_closing():
+            write_message(self._writer, message)
+
+    def on_control_event(self, event: ControlEvent) -> None:
+        # Hanya event yang berasal dari worker ini (mis. AccountSupervisor.disable_all)
+        if self._applying or event.kind != SETUP_STOPPED:
+            return
+        self.send({"op": "stopped", "user_id": event.user_id, "setup_name": event.setup_name})
+
+    def on_send_result(self, user_id: str, setup_name: str, result: SendResult) -> None:
+        self.send({
+            "op": "result",
+            "user_id": user_id,
+            "setup_name": setup_name,
+            "ok": result.ok,
+            "status": result.status,
+            "latency": result.latency,
+            "ts": time.time(),
+        })
+
+    def apply_event(self, message: Dict[str, Any]) -> None:
+        apply_account(message["user_id"], message["account"])
+        self._applying = True
+        try:
+            control_bus.publish(message["kind"], message["user_id"], message["setup_name"])
+        finally:
+            self._applying = False
+
+    async def _report_stats(self) -> None:
+        while True:
+            self.send({"op": "stats", "scheduled": len(setup_scheduler), "running": int(RUNNING_SETUPS.value())})
+            await asyncio.sleep(SHARD_STATS_INTERVAL)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=IPC_LINE_LIMIT)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+        self._writer = asyncio.StreamWriter(transport, protocol, None, loop)
+
+        line = await reader.readline()
+        if not line:
+            return
+        init = decode_message(line)
+        config_store.replace({"accounts": init["accounts"], "admins": {}})
+
+        control_bus.subscribe(self.on_control_event)
+        add_send_listener(self.on_send_result)
+        await http_sessions.start()
+        await metrics_server.start()
+        setup_scheduler.start()
+        scheduled = schedule_running_setups()
+        logger.info("Worker shard %s/%s menjalankan %s setup", self.index, self.shards, scheduled)
+        stats_task = asyncio.create_task(self._report_stats())
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break  # Bot mati: stdin ditutup
+                message = decode_message(line)
+                if message["op"] == "stop":
+                    break
+                if message["op"] == "event":
+                    self.apply_event(message)
+        finally:
+            stats_task.cancel()
+            await startup_ramp.stop()
+            await setup_scheduler.stop()
+            checkpoint_schedule()
+            await http_sessions.close()
+            await metrics_server.stop()
+            logger.info("Worker shard %s berhenti", self.index)
+
+
+def main() -> None:
+    index, shards = int(sys.argv[1]), int(sys.argv[2])
+    setup_logger()
+    # Penulis tunggal config & history adalah proses bot
+    config_store.persist = False
+    post_history.store.persist = False
+    try:
+        asyncio.run(ShardWorker(index, shards).run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
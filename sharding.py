@@ -0,0 +1,309 @@
+import os
+import sys
+import json
+import time
+import zlib
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from config import load_config, save_config
+from history import post_history
+from user_directory import user_directory
+from metrics import SCHEDULED_SETUPS, RUNNING_SETUPS, IPC_DROPPED, METRICS_PORT
+from utils import LOG_FILE
+from checkpoint import SCHEDULE_CHECKPOINT_FILE, schedule_checkpoint
+from autopost import SendResult
+from runner import on_control_event as runner_on_control_event, notify_send_result
+from control import control_bus, ControlEvent, SETUP_STOPPED
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Jumlah proses worker posting (0 = semua setup dijalankan di proses bot)
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "0"))
+# Backoff (detik) sebelum worker yang mati dijalankan lagi; dobel tiap restart berturut-turut
+SHARD_RESTART_BACKOFF = float(os.getenv("SHARD_RESTART_BACKOFF", "5"))
+SHARD_RESTART_BACKOFF_MAX = float(os.getenv("SHARD_RESTART_BACKOFF_MAX", "300"))
+# Worker yang hidup selama ini dianggap sehat; backoff di-reset
+SHARD_HEALTHY_AFTER = 60.0
+SHARD_STOP_TIMEOUT = float(os.getenv("SHARD_STOP_TIMEOUT", "15"))
+# Detik antar laporan statistik dari worker
+SHARD_STATS_INTERVAL = float(os.getenv("SHARD_STATS_INTERVAL", "5"))
+# Batas panjang satu pesan IPC (pesan init berisi semua akun shard)
+IPC_LINE_LIMIT = 64 * 1024 * 1024
+# Batas buffer tulis IPC (byte) selama penerima tidak membaca
+IPC_WRITE_BUFFER_LIMIT = int(os.getenv("IPC_WRITE_BUFFER_LIMIT", str(16 * 1024 * 1024)))
+# Pesan laporan yang boleh dibuang saat buffer penuh (tidak membawa state)
+IPC_DROPPABLE = ("result", "stats")
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shard_worker.py")
+
+
+def shard_for(user_id: str, shards: int) -> int:
+    """Index shard akun (stabil antar proses & restart, tidak seperti hash())"""
+    return zlib.crc32(str(user_id).encode("utf-8")) % shards
+
+
+def shard_path(path: str, index: int) -> str:
+    """'bot.log' -> 'bot.shard0.log'"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{index}{ext}"
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    """Satu pesan IPC = satu baris JSON"""
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def decode_message(line: bytes) -> Dict[str, Any]:
+    return json.loads(line)
+
+
+def write_message(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> bool:
+    """
+    Tulis pesan IPC tanpa menunggu drain.
+
+    Pesan laporan (IPC_DROPPABLE) dibuang dan dihitung jika buffer tulis
+    sudah melewati IPC_WRITE_BUFFER_LIMIT, supaya penerima yang macet tidak
+    membuat memori pengirim tumbuh terus. Return False jika dibuang.
+    """
+    if message["op"] in IPC_DROPPABLE and writer.transport.get_write_buffer_size() > IPC_WRITE_BUFFER_LIMIT:
+        IPC_DROPPED.inc(op=message["op"])
+        return False
+    writer.write(encode_message(message))
+    return True
+
+
+def apply_account(user_id: str, account: Optional[Dict[str, Any]]) -> None:
+    """
+    Terapkan data akun dari bot ke config lokal.
+
+    Dict setup yang isinya tidak berubah dipertahankan, karena job scheduler
+    memegang referensi ke dict tersebut (lihat runner.bind_setup); setup
+    yang berubah diganti dict baru seperti yang dilakukan modal edit.
+    """
+    accounts = load_config()["accounts"]
+    current = accounts.get(user_id)
+    if account is None:
+        accounts.pop(user_id, None)
+        return
+    if current is None:
+        accounts[user_id] = account
+        return
+
+    setups = current.setdefault("setups", {})
+    new_setups = account.get("setups", {})
+    for setup_name in list(setups):
+        if setup_name not in new_setups:
+            del setups[setup_name]
+    for setup_name, setup_data in new_setups.items():
+        if setups.get(setup_name) != setup_data:
+            setups[setup_name] = setup_data
+
+    for key in list(current):
+        if key != "setups" and key not in account:
+            del current[key]
+    for key, value in account.items():
+        if key != "setups":
+            current[key] = value
+
+
+def record_remote_result(message: Dict[str, Any]) -> None:
+    """Catat hasil kirim yang dilaporkan proses lain (op "result")"""
+    ts = message["ts"]
+    post_history.record(message["user_id"], message["setup_name"], message["ok"],
+                        message["status"], message["latency"], timestamp=ts)
+    if message["ok"]:
+        user_directory.record_activity(message["user_id"], ts)
+    result = SendResult()
+    result.ok = message["ok"]
+    result.status = message["status"]
+    result.latency = message["latency"]
+    notify_send_result(message["user_id"], message["setup_name"], result)
+
+
+def apply_remote_stop(message: Dict[str, Any]) -> None:
+    """Setup dinonaktifkan proses lain (op "stopped", mis. token gagal): simpan di config"""
+    user_data = load_config()["accounts"].get(message["user_id"], {})
+    setup_data = user_data.get("setups", {}).get(message["setup_name"])
+    if setup_data and setup_data.get("running", False):
+        setup_data["running"] = False
+        save_config(load_config(), message["user_id"])
+    control_bus.publish(SETUP_STOPPED, message["user_id"], message["setup_name"])
+
+
+class _Shard:
+    __slots__ = ("index", "process", "restarts", "scheduled", "running")
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+        self.scheduled = 0
+        self.running = 0
+
+
+class ShardCoordinator:
+    """
+    Koordinator posting multi-proses.
+
+    Akun dibagi ke ``shards`` proses worker berdasarkan crc32(user_id);
+    tiap worker punya event loop, scheduler dan pool HTTP sendiri (lihat
+    shard_worker.py). Proses bot tetap satu-satunya penulis config &
+    history: event control bus diteruskan ke worker pemilik akun beserta
+    data akun terbaru, sedangkan hasil kirim dan setup yang dinonaktifkan
+    worker dikirim balik lewat stdout worker (JSON per baris).
+    """
+
+    def __init__(self, shards: int = SHARD_WORKERS):
+        self.shards = max(0, shards)
+        self._shards: List[_Shard] = [_Shard(i) for i in range(self.shards)]
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.shards > 0
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def scheduled(self) -> int:
+        return sum(shard.scheduled for shard in self._shards)
+
+    def start(self) -> None:
+        """Jalankan semua worker; scheduler lokal tidak dipakai lagi"""
+        if not self.enabled or self._tasks:
+            return
+        self._stopping = False
+        # Jadwal & checkpoint-nya milik worker; checkpoint bot tidak disentuh
+        control_bus.unsubscribe(runner_on_control_event)
+        control_bus.unsubscribe(schedule_checkpoint.on_control_event)
+        control_bus.subscribe(self.on_control_event)
+        SCHEDULED_SETUPS.set_function(lambda: self.scheduled)
+        for shard in self._shards:
+            self._tasks.append(asyncio.create_task(self._supervise(shard)))
+        logger.info("Posting dijalankan di %s proses worker", self.shards)
+
+    async def _spawn(self, shard: _Shard) -> asyncio.subprocess.Process:
+        env = dict(os.environ)
+        env["SHARD_WORKERS"] = "0"
+        env["LOG_FILE"] = shard_path(LOG_FILE, shard.index)
+        env["SCHEDULE_CHECKPOINT_FILE"] = shard_path(SCHEDULE_CHECKPOINT_FILE, shard.index)
+        env["METRICS_PORT"] = str(METRICS_PORT + 1 + shard.index) if METRICS_PORT else "0"
+        return await asyncio.create_subprocess_exec(
+            sys.executable, WORKER_SCRIPT, str(shard.index), str(self.shards),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env=env,
+            limit=IPC_LINE_LIMIT,
+        )
+
+    async def _supervise(self, shard: _Shard) -> None:
+        while not self._stopping:
+            started = time.monotonic()
+            try:
+                shard.process = await self._spawn(shard)
+                accounts = {
+                    user_id: user_data for user_id, user_data in load_config()["accounts"].items()
+                    if shard_for(user_id, self.shards) == shard.index
+                }
+                self._send(shard, {"op": "init", "accounts": accounts})
+                logger.info("Worker shard %s dimulai (pid %s, %s akun)", shard.index, shard.process.pid, len(accounts))
+                await self._read(shard)
+                returncode = await shard.process.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error pada worker shard %s: %s", shard.index, e)
+                returncode = None
+                if shard.process is not None and shard.process.returncode is None:
+                    shard.process.kill()
+            shard.process = None
+            shard.scheduled = shard.running = 0
+            if self._stopping:
+                return
+
+            if time.monotonic() - started >= SHARD_HEALTHY_AFTER:
+                shard.restarts = 0
+            shard.restarts += 1
+            delay = min(SHARD_RESTART_BACKOFF * 2 ** (shard.restarts - 1), SHARD_RESTART_BACKOFF_MAX)
+            logger.error("Worker shard %s berhenti (kode %s), restart dalam %.0f detik", shard.index, returncode, delay)
+            await asyncio.sleep(delay)
+
+    async def _read(self, shard: _Shard) -> None:
+        while True:
+            line = await shard.process.stdout.readline()
+            if not line:
+                return
+            try:
+                self._handle(shard, decode_message(line))
+            except Exception as e:
+                logger.error("Pesan tidak valid dari worker shard %s: %s", shard.index, e)
+
+    def _handle(self, shard: _Shard, message: Dict[str, Any]) -> None:
+        op = message["op"]
+        if op == "result":
+            record_remote_result(message)
+        elif op == "stopped":
+            apply_remote_stop(message)
+        elif op == "stats":
+            shard.scheduled = message["scheduled"]
+            shard.running = message["running"]
+            RUNNING_SETUPS.set(sum(s.running for s in self._shards))
+
+    def _send(self, shard: _Shard, message: Dict[str, Any]) -> None:
+        process = shard.process
+        if process is None or process.returncode is not None or process.stdin.is_closing():
+            # Worker sedang restart; pesan init berikutnya membawa state terbaru
+            return
+        buffered = process.stdin.transport.get_write_buffer_size()
+        if buffered > IPC_WRITE_BUFFER_LIMIT:
+            # Worker tidak membaca stdin: restart, pesan init membawa state terbaru
+            logger.error("Worker shard %s tidak membaca stdin (%s byte tertahan), di-restart", shard.index, buffered)
+            process.kill()
+            return
+        process.stdin.write(encode_message(message))
+
+    def on_control_event(self, event: ControlEvent) -> None:
+        """Teruskan event ke worker pemilik akun beserta data akun terbaru"""
+        shard = self._shards[shard_for(event.user_id, self.shards)]
+        self._send(shard, {
+            "op": "event",
+            "kind": event.kind,
+            "user_id": event.user_id,
+            "setup_name": event.setup_name,
+            "account": load_config()["accounts"].get(event.user_id),
+        })
+
+    async def stop(self) -> None:
+        if not self._tasks:
+            return
+        self._stopping = True
+        for shard in self._shards:
+            self._send(shard, {"op": "stop"})
+        for shard in self._shards:
+            process = shard.process
+            if process is None:
+                continue
+            try:
+                await asyncio.wait_for(process.wait(), timeout=SHARD_STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("Worker shard %s tidak berhenti, dihentikan paksa", shard.index)
+                process.kill()
+                await process.wait()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        control_bus.unsubscribe(self.on_control_event)
+        control_bus.subscribe(runner_on_control_event)
+        control_bus.subscribe(schedule_checkpoint.on_control_event)
+
+
+shard_coordinator = ShardCoordinator()
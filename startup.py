@@ -0,0 +1,145 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from scheduler import SetupScheduler, SetupJob, JobHandler, setup_key
+from metrics import STARTUP_PENDING, STARTUP_ADMITTED, STARTUP_INFLIGHT, STARTUP_DURATION
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Jumlah setup yang dimasukkan ke scheduler per detik saat bot start (0 = tanpa batas)
+STARTUP_ADMIT_RATE = float(os.getenv("STARTUP_ADMIT_RATE", "10"))
+# Maksimal setup yang cycle pertamanya (validasi token + kirim) berjalan bersamaan (0 = tanpa batas)
+STARTUP_CONCURRENCY = int(os.getenv("STARTUP_CONCURRENCY", "10"))
+# Slot dilepas paksa jika cycle pertama tidak selesai dalam waktu ini (detik)
+STARTUP_SLOT_TIMEOUT = float(os.getenv("STARTUP_SLOT_TIMEOUT", "60"))
+# Detik antar log progress startup
+STARTUP_PROGRESS_INTERVAL = float(os.getenv("STARTUP_PROGRESS_INTERVAL", "5"))
+
+# (detik terlambat, user_id, setup_name)
+StartupEntry = Tuple[float, str, str]
+
+
+class StartupRamp:
+    """
+    Admission control untuk setup yang harus langsung jalan saat bot start.
+
+    Setup dimasukkan ke scheduler satu per satu dengan laju ``rate`` per detik,
+    paling terlambat dulu, dan maksimal ``concurrency`` cycle pertama berjalan
+    bersamaan. Dengan begitu boot tidak menjadi ledakan validasi token + kirim
+    yang memenuhi connector dan memperlambat gateway & command.
+    """
+
+    def __init__(
+        self,
+        scheduler: SetupScheduler,
+        should_admit: Callable[[str, str], bool],
+        rate: float = STARTUP_ADMIT_RATE,
+        concurrency: int = STARTUP_CONCURRENCY,
+        slot_timeout: float = STARTUP_SLOT_TIMEOUT,
+    ):
+        self.scheduler = scheduler
+        self.should_admit = should_admit
+        self.rate = rate
+        self.concurrency = concurrency
+        self.slot_timeout = slot_timeout
+        self._slots: Optional[asyncio.Semaphore] = None
+        # key setup yang cycle pertamanya belum selesai -> timer pelepasan paksa
+        self._inflight: Dict[str, asyncio.TimerHandle] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.total = 0
+        self.admitted = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def wrap(self, handler: JobHandler) -> JobHandler:
+        """Bungkus handler scheduler supaya slot dilepas setelah cycle pertama"""
+        async def handle(job: SetupJob) -> Optional[float]:
+            try:
+                return await handler(job)
+            finally:
+                if job.key in self._inflight:
+                    self._release(job.key)
+        return handle
+
+    def start(self, entries: List[StartupEntry]) -> None:
+        """Mulai memasukkan setup ke scheduler di background"""
+        if self.running or not entries:
+            return
+        # Paling terlambat dulu; sort stabil menjaga urutan config untuk yang setara
+        pending = sorted(entries, key=lambda entry: -entry[0])
+        self.total = len(pending)
+        self.admitted = 0
+        STARTUP_PENDING.set(len(pending))
+        if self.concurrency > 0:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        logger.info(
+            "Startup ramp: %s setup dijadwalkan bertahap (%s/detik, maks %s bersamaan)",
+            len(pending), self.rate or "tanpa batas", self.concurrency or "tanpa batas"
+        )
+        self._task = asyncio.create_task(self._run(pending))
+
+    async def _run(self, pending: List[StartupEntry]) -> None:
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.rate if self.rate > 0 else 0.0
+        started = time.monotonic()
+        next_admit = started
+        last_report = started
+
+        for remaining, (overdue, user_id, setup_name) in enumerate(pending, 1):
+            if self._slots is not None:
+                await self._slots.acquire()
+            wait = next_admit - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            STARTUP_PENDING.set(len(pending) - remaining)
+
+            key = setup_key(user_id, setup_name)
+            # Bisa sudah distart manual / dihentikan selama menunggu giliran
+            if key in self.scheduler or not self.should_admit(user_id, setup_name):
+                if self._slots is not None:
+                    self._slots.release()
+                continue
+
+            self.scheduler.add(user_id, setup_name)
+            if self._slots is not None:
+                self._inflight[key] = loop.call_later(self.slot_timeout, self._release, key)
+                STARTUP_INFLIGHT.set(len(self._inflight))
+            self.admitted += 1
+            STARTUP_ADMITTED.inc()
+            next_admit = max(next_admit, time.monotonic()) + interval
+            logger.info("Memulai setup %s untuk user %s (terlambat %.0f detik)", setup_name, user_id, overdue)
+
+            if time.monotonic() - last_report >= STARTUP_PROGRESS_INTERVAL:
+                last_report = time.monotonic()
+                logger.info("Startup ramp: %s/%s setup dijalankan", remaining, len(pending))
+
+        duration = time.monotonic() - started
+        STARTUP_DURATION.set(duration)
+        logger.info("Startup ramp selesai: %s setup dijalankan dalam %.1f detik", self.admitted, duration)
+
+    def _release(self, key: str) -> None:
+        handle = self._inflight.pop(key, None)
+        if handle is None:
+            return
+        handle.cancel()
+        STARTUP_INFLIGHT.set(len(self._inflight))
+        if self._slots is not None:
+            self._slots.release()
+
+    async def stop(self) -> None:
+        if self.running:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        for handle in self._inflight.values():
+            handle.cancel()
+        self._inflight.clear()
+        STARTUP_INFLIGHT.set(0)
+        STARTUP_PENDING.set(0)
@@ -0,0 +1,445 @@
+import os
+import sys
+import json
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from exceptions import ConfigError
+from persistence import atomic_write_json, atomic_write_text, read_json
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = "config.json"
+SUBSCRIPTION_FILE = "subscriptions.json"
+
+# "json" (default) atau "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "autopost.db")
+
+
+def _default_config() -> Dict[str, Any]:
+    return {"accounts": {}, "admins": {}}
+
+
+def _normalize_config(data: Dict[str, Any]) -> Dict[str, Any]:
+    if not isinstance(data.get("accounts", {}), dict):
+        data["accounts"] = {}
+    if not isinstance(data.get("admins", {}), dict):
+        data["admins"] = {}
+    data.setdefault("accounts", {})
+    data.setdefault("admins", {})
+    return data
+
+
+class StorageBackend(ABC):
+    """
+    Interface storage untuk config dan subscription.
+
+    Penulisan config dipecah menjadi dua tahap: ``snapshot_config`` dipanggil
+    di event loop (harus konsisten dengan state di memori), lalu
+    ``write_config`` dipanggil di thread writer milik config store.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def load_config(self) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def snapshot_config(self, cfg: Dict[str, Any]) -> Any:
+        ...
+
+    @abstractmethod
+    def write_config(self, snapshot: Any) -> None:
+        ...
+
+    @abstractmethod
+    def load_subscriptions(self) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def save_subscriptions(self, data: Dict[str, Any], changed: Optional[Iterable[str]] = None) -> None:
+        """``changed``: subscription ID yang berubah sejak save terakhir (None = semua)"""
+
+    def mark_changed(self, user_id: Optional[str] = None) -> None:
+        """Hint akun yang berubah sejak snapshot terakhir (None = bisa bagian mana saja)"""
+
+
+class JsonBackend(StorageBackend):
+    """Storage berbasis file JSON dengan atomic write"""
+
+    name = "json"
+
+    def __init__(self, config_path: str = CONFIG_PATH, subscriptions_path: str = SUBSCRIPTION_FILE):
+        self.config_path = config_path
+        self.subscriptions_path = subscriptions_path
+
+    def load_config(self) -> Dict[str, Any]:
+        try:
+            return _normalize_config(read_json(self.config_path, _default_config))
+        except ValueError as e:
+            raise ConfigError(f"Failed to load configuration: {str(e)}")
+
+    def snapshot_config(self, cfg: Dict[str, Any]) -> str:
+        try:
+            return json.dumps(cfg, indent=4, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            raise ConfigError(f"Failed to save configuration: {str(e)}")
+
+    def write_config(self, snapshot: str) -> None:
+        try:
+            atomic_write_text(self.config_path, snapshot)
+        except OSError as e:
+            raise ConfigError(f"Failed to save configuration: {str(e)}")
+
+    def load_subscriptions(self) -> Dict[str, Any]:
+        try:
+            return read_json(self.subscriptions_path, dict)
+        except ValueError as e:
+            # Jangan return {} di sini: save berikutnya akan menghapus semua subscription
+            raise Exception(f"Failed to load subscriptions: {str(e)}")
+
+    def save_subscriptions(self, data: Dict[str, Any], changed: Optional[Iterable[str]] = None) -> None:
+        try:
+            atomic_write_json(self.subscriptions_path, data)
+        except (OSError, TypeError, ValueError) as e:
+            raise Exception(f"Failed to save subscriptions: {str(e)}")
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS setups (
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    running INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, name)
+);
+CREATE INDEX IF NOT EXISTS idx_setups_running ON setups (running);
+CREATE TABLE IF NOT EXISTS admins (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS subscriptions (
+    subscription_id TEXT PRIMARY KEY,
+    discord_user_id TEXT,
+    end_date TEXT,
+    active INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_user ON subscriptions (discord_user_id);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_end ON subscriptions (end_date);
+"""
+
+# Row key -> (tabel, kolom primary key)
+_TABLE_KEYS = {
+    "accounts": ("user_id",),
+    "setups": ("user_id", "name"),
+    "admins": ("user_id",),
+    "subscriptions": ("subscription_id",),
+}
+
+
+def _dump(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+
+class SqliteBackend(StorageBackend):
+    """
+    Storage SQLite (WAL) dengan tabel terindeks per entitas.
+
+    Setiap save hanya menulis baris yang berubah: backend menyimpan
+    serialisasi terakhir tiap baris dan membandingkannya saat snapshot,
+    sehingga mengubah satu setup hanya menghasilkan satu UPSERT. Jika
+    semua perubahan sejak snapshot terakhir di-hint lewat ``mark_changed``,
+    hanya akun yang di-hint yang diserialisasi ulang.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        # Serialisasi terakhir yang sudah ditulis, per (tabel, key)
+        self._written: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+        # Key baris accounts/setups yang sudah ditulis, per user_id
+        self._user_rows: Dict[str, Set[Tuple[str, Tuple[str, ...]]]] = {}
+        # Tabel yang harus ditulis ulang penuh pada save berikutnya
+        self._resync = set(_TABLE_KEYS)
+        # Akun yang berubah sejak snapshot terakhir; None = diff semua baris
+        self._changed: Optional[Set[str]] = None
+        # Dict config yang terakhir di-snapshot (dict lain = diff semua baris)
+        self._config_id: Optional[int] = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            for table in _TABLE_KEYS:
+                if self._conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                    return False
+        return True
+
+    # ----- config -----
+
+    def load_config(self) -> Dict[str, Any]:
+        try:
+            with self._lock:
+                accounts_rows = self._conn.execute("SELECT user_id, data FROM accounts").fetchall()
+                setup_rows = self._conn.execute("SELECT user_id, name, data FROM setups").fetchall()
+                admin_rows = self._conn.execute("SELECT user_id, data FROM admins").fetchall()
+        except sqlite3.Error as e:
+            raise ConfigError(f"Failed to load configuration: {str(e)}")
+
+        self._forget(("accounts", "setups", "admins"))
+        accounts: Dict[str, Any] = {}
+        for user_id, data in accounts_rows:
+            account = json.loads(data)
+            account["setups"] = {}
+            accounts[user_id] = account
+            self._remember(("accounts", (user_id,)), data)
+        for user_id, name, data in setup_rows:
+            accounts.setdefault(user_id, {"setups": {}})["setups"][name] = json.loads(data)
+            self._remember(("setups", (user_id, name)), data)
+
+        admins = {}
+        for user_id, data in admin_rows:
+            admins[user_id] = json.loads(data)
+            self._remember(("admins", (user_id,)), data)
+
+        self._resync -= {"accounts", "setups", "admins"}
+        self._changed = None
+        return _normalize_config({"accounts": accounts, "admins": admins})
+
+    def mark_changed(self, user_id: Optional[str] = None) -> None:
+        if user_id is None:
+            self._changed = None
+        elif self._changed is not None:
+            self._changed.add(str(user_id))
+
+    def _forget(self, tables) -> None:
+        for key in [key for key in self._written if key[0] in tables]:
+            self._drop(key)
+
+    def _remember(self, key: Tuple[str, Tuple[str, ...]], data: str) -> None:
+        self._written[key] = data
+        if key[0] in ("accounts", "setups"):
+            self._user_rows.setdefault(key[1][0], set()).add(key)
+
+    def _drop(self, key: Tuple[str, Tuple[str, ...]]) -> None:
+        del self._written[key]
+        rows = self._user_rows.get(key[1][0])
+        if rows is not None and key[0] in ("accounts", "setups"):
+            rows.discard(key)
+            if not rows:
+                del self._user_rows[key[1][0]]
+
+    def _config_rows(self, cfg: Dict[str, Any], users: Optional[Set[str]] = None
+                     ) -> Dict[Tuple[str, Tuple[str, ...]], Tuple[str, Dict[str, Any]]]:
+        rows = {}
+        accounts = cfg.get("accounts", {})
+        if users is not None:
+            # Hanya akun yang di-hint; admin tidak ikut
+            accounts = {user_id: accounts[user_id] for user_id in users if user_id in accounts}
+        for user_id, account in accounts.items():
+            account_data = {k: v for k, v in account.items() if k != "setups"}
+            rows[("accounts", (user_id,))] = (_dump(account_data), {})
+            for name, setup in account.get("setups", {}).items():
+                rows[("setups", (user_id, name))] = (_dump(setup), {"running": int(bool(setup.get("running", False)))})
+        if users is None:
+            for user_id, admin in cfg.get("admins", {}).items():
+                rows[("admins", (user_id,))] = (_dump(admin), {})
+        return rows
+
+    def _diff(self, rows, tables, candidates: Optional[List] = None) -> Dict[str, Any]:
+        """
+        Bandingkan baris baru dengan yang terakhir ditulis.
+
+        ``candidates``: key yang mungkin dihapus jika ``rows`` hanya berisi
+        sebagian baris (None = semua baris di ``tables``).
+        """
+        full = any(table in self._resync for table in tables)
+        upserts = []
+        for key, (data, extra) in rows.items():
+            if full or self._written.get(key) != data:
+                upserts.append((key, data, extra))
+                self._remember(key, data)
+
+        if candidates is None:
+            candidates = [key for key in self._written if key[0] in tables]
+        deletes = [key for key in candidates if key not in rows]
+        for key in deletes:
+            self._drop(key)
+
+        self._resync -= set(tables)
+        return {"upserts": upserts, "deletes": deletes, "full": full, "tables": tables}
+
+    def snapshot_config(self, cfg: Dict[str, Any]) -> Dict[str, Any]:
+        users, self._changed = self._changed, set()
+        tables = ("accounts", "setups", "admins")
+        if id(cfg) != self._config_id or any(table in self._resync for table in tables):
+            users = None
+        self._config_id = id(cfg)
+        try:
+            if users is not None:
+                candidates = [key for user_id in users for key in self._user_rows.get(user_id, ())]
+                return self._diff(self._config_rows(cfg, users), ("accounts", "setups"), candidates)
+            return self._diff(self._config_rows(cfg), tables)
+        except (TypeError, ValueError) as e:
+            self._changed = None
+            raise ConfigError(f"Failed to save configuration: {str(e)}")
+
+    def write_config(self, snapshot: Dict[str, Any]) -> None:
+        try:
+            self._apply(snapshot)
+        except sqlite3.Error as e:
+            raise ConfigError(f"Failed to save configuration: {str(e)}")
+
+    def _apply(self, snapshot: Dict[str, Any]) -> None:
+        upserts: List = snapshot["upserts"]
+        deletes: List = snapshot["deletes"]
+        if not upserts and not deletes and not snapshot["full"]:
+            return
+
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                if snapshot["full"]:
+                    for table in snapshot["tables"]:
+                        self._conn.execute(f"DELETE FROM {table}")
+                for (table, key), data, extra in upserts:
+                    columns = list(_TABLE_KEYS[table]) + list(extra.keys()) + ["data"]
+                    values = list(key) + list(extra.values()) + [data]
+                    placeholders = ", ".join("?" for _ in columns)
+                    self._conn.execute(
+                        f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                        values
+                    )
+                for table, key in deletes:
+                    where = " AND ".join(f"{col} = ?" for col in _TABLE_KEYS[table])
+                    self._conn.execute(f"DELETE FROM {table} WHERE {where}", key)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                # Cache baris sudah tidak bisa dipercaya, tulis ulang penuh berikutnya
+                self._resync |= set(snapshot["tables"])
+                raise
+
+    # ----- subscriptions -----
+
+    def load_subscriptions(self) -> Dict[str, Any]:
+        try:
+            with self._lock:
+                rows = self._conn.execute("SELECT subscription_id, data FROM subscriptions").fetchall()
+        except sqlite3.Error as e:
+            raise Exception(f"Failed to load subscriptions: {str(e)}")
+
+        self._forget(("subscriptions",))
+        subscriptions = {}
+        for subscription_id, data in rows:
+            subscriptions[subscription_id] = json.loads(data)
+            self._remember(("subscriptions", (subscription_id,)), data)
+        self._resync.discard("subscriptions")
+        return subscriptions
+
+    def save_subscriptions(self, data: Dict[str, Any], changed: Optional[Iterable[str]] = None) -> None:
+        candidates = None
+        if changed is not None and "subscriptions" not in self._resync:
+            changed = list(changed)
+            candidates = [("subscriptions", (subscription_id,)) for subscription_id in changed]
+        try:
+            rows = {}
+            for subscription_id in (data if candidates is None else changed):
+                sub = data.get(subscription_id)
+                if sub is None:
+                    continue
+                rows[("subscriptions", (subscription_id,))] = (_dump(sub), {
+                    "discord_user_id": sub.get("discord_user_id"),
+                    "end_date": sub.get("end_date"),
+                    "active": int(bool(sub.get("active", False))),
+                })
+            if candidates is not None:
+                candidates = [key for key in candidates if key in self._written]
+            self._apply(self._diff(rows, ("subscriptions",), candidates))
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            raise Exception(f"Failed to save subscriptions: {str(e)}")
+
+
+_backend: Optional[StorageBackend] = None
+
+
+def get_backend() -> StorageBackend:
+    """Backend storage process-wide sesuai STORAGE_BACKEND"""
+    global _backend
+    if _backend is None:
+        if STORAGE_BACKEND == "sqlite":
+            _backend = SqliteBackend(SQLITE_PATH)
+        else:
+            _backend = JsonBackend(CONFIG_PATH, SUBSCRIPTION_FILE)
+        logger.info("Storage backend: %s", _backend.name)
+    return _backend
+
+
+def migrate_json_to_sqlite(
+    config_path: str = CONFIG_PATH,
+    subscriptions_path: str = SUBSCRIPTION_FILE,
+    sqlite_path: str = SQLITE_PATH,
+    force: bool = False,
+) -> Dict[str, int]:
+    """
+    Migrasi satu kali dari config.json + subscriptions.json ke SQLite.
+
+    Args:
+        config_path: Path config.json sumber
+        subscriptions_path: Path subscriptions.json sumber
+        sqlite_path: Path database tujuan
+        force: Timpa database yang sudah berisi data
+
+    Returns:
+        Dict jumlah baris yang dimigrasi per entitas
+    """
+    source = JsonBackend(config_path, subscriptions_path)
+    target = SqliteBackend(sqlite_path)
+    try:
+        if not target.is_empty() and not force:
+            raise ConfigError(f"Database {sqlite_path} sudah berisi data (gunakan force untuk menimpa)")
+
+        cfg = source.load_config()
+        subscriptions = source.load_subscriptions()
+
+        target.write_config(target.snapshot_config(cfg))
+        target.save_subscriptions(subscriptions)
+
+        return {
+            "accounts": len(cfg["accounts"]),
+            "setups": sum(len(a.get("setups", {})) for a in cfg["accounts"].values()),
+            "admins": len(cfg["admins"]),
+            "subscriptions": len(subscriptions),
+        }
+    finally:
+        target.close()
+
+
+if __name__ == "__main__":
+    # python storage.py migrate [--force]
+    if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
+        counts = migrate_json_to_sqlite(force="--force" in sys.argv)
+        print("Migrasi selesai: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+    else:
+        print("Usage: python storage.py migrate [--force]")
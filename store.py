@@ -0,0 +1,171 @@
+import time
+import atexit
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from metrics import STORE_LOAD_SECONDS, STORE_FLUSH_SECONDS, STORE_FLUSH_ERRORS, STORE_SAVES
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentStore:
+    """
+    In-memory document store dengan write-behind persistence.
+
+    Data di-load sekali lalu semua read dilayani dari memori. Setiap mutasi
+    cukup memanggil ``mark_dirty()``; penulisan ke disk dikumpulkan menjadi
+    satu flush yang di-debounce (``flush_delay``) dengan batas maksimal
+    ``max_delay`` sejak perubahan pertama yang belum tersimpan.
+
+    Args:
+        name: Nama store (untuk logging)
+        load_func: Fungsi untuk membaca data dari storage
+        snapshot_func: Fungsi untuk membuat snapshot data (dipanggil di event loop)
+        write_func: Fungsi untuk menulis snapshot (dipanggil di thread writer)
+        flush_delay: Jeda debounce dalam detik
+        max_delay: Batas maksimal data boleh dirty dalam detik
+    """
+
+    def __init__(
+        self,
+        name: str,
+        load_func: Callable[[], Any],
+        snapshot_func: Callable[[Any], Any],
+        write_func: Callable[[Any], None],
+        flush_delay: float = 1.0,
+        max_delay: float = 5.0,
+    ):
+        self.name = name
+        self.flush_delay = flush_delay
+        self.max_delay = max_delay
+        self._load_func = load_func
+        self._snapshot_func = snapshot_func
+        self._write_func = write_func
+        self._data: Any = None
+        self._dirty = False
+        self._first_dirty_at: Optional[float] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._flushing = False
+        # False: perubahan hanya di memori (dipakai proses shard worker; penulis tunggal ada di bot)
+        self.persist = True
+        self._write_lock = threading.Lock()
+        # Satu thread writer supaya urutan penulisan selalu terjaga
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{name}-writer")
+        atexit.register(self.flush)
+
+    @property
+    def data(self) -> Any:
+        """Data yang sedang aktif di memori (di-load saat pertama diakses)"""
+        if self._data is None:
+            self._data = self._load()
+        return self._data
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def replace(self, data: Any) -> None:
+        """Ganti seluruh data di memori lalu jadwalkan flush"""
+        self._data = data
+        self.mark_dirty()
+
+    def reload(self) -> Any:
+        """Tulis perubahan yang belum di-flush lalu baca ulang dari storage"""
+        self.flush()
+        # Tunggu flush background yang sedang menulis supaya tidak membaca file setengah jadi
+        with self._write_lock:
+            self._data = self._load()
+        return self._data
+
+    def mark_dirty(self) -> None:
+        """Tandai data berubah dan jadwalkan flush yang di-debounce"""
+        if not self.persist:
+            return
+        STORE_SAVES.inc(store=self.name)
+        now = time.monotonic()
+        if not self._dirty:
+            self._dirty = True
+            self._first_dirty_at = now
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Tidak ada event loop (script/CLI): tulis langsung
+            self.flush()
+            return
+
+        if self._flushing:
+            # Flush yang sedang berjalan akan menjadwalkan ulang saat selesai
+            return
+
+        deadline = self._first_dirty_at + self.max_delay
+        delay = max(0.0, min(self.flush_delay, deadline - now))
+        if self._handle is not None:
+            self._handle.cancel()
+        self._handle = loop.call_later(delay, self._start_background_flush, loop)
+
+    def flush(self) -> None:
+        """Tulis data dirty secara sinkron (dipakai saat shutdown / tanpa event loop)"""
+        self._cancel_pending()
+        if not self._dirty or self._data is None or not self.persist:
+            return
+        snapshot = self._snapshot_func(self._data)
+        self._dirty = False
+        self._first_dirty_at = None
+        try:
+            self._write(snapshot)
+        except Exception:
+            self._dirty = True
+            raise
+
+    async def flush_async(self) -> None:
+        """Flush data dirty tanpa memblokir event loop"""
+        self._cancel_pending()
+        if not self._dirty or self._data is None:
+            return
+        await self._flush_once(asyncio.get_running_loop())
+
+    def _cancel_pending(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _start_background_flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._handle = None
+        loop.create_task(self._flush_once(loop))
+
+    async def _flush_once(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._flushing or not self._dirty:
+            return
+        self._flushing = True
+        # Snapshot diambil di event loop supaya konsisten dengan mutasi lain
+        snapshot = self._snapshot_func(self._data)
+        self._dirty = False
+        self._first_dirty_at = None
+        try:
+            await loop.run_in_executor(self._executor, self._write, snapshot)
+        except Exception as e:
+            logger.error("Gagal flush store %s: %s", self.name, e)
+            self._dirty = True
+            self._first_dirty_at = self._first_dirty_at or time.monotonic()
+        finally:
+            self._flushing = False
+
+        if self._dirty:
+            self.mark_dirty()
+
+    def _load(self) -> Any:
+        with STORE_LOAD_SECONDS.time(store=self.name):
+            return self._load_func()
+
+    def _write(self, snapshot: Any) -> None:
+        with self._write_lock:
+            started = time.perf_counter()
+            try:
+                self._write_func(snapshot)
+            except Exception:
+                STORE_FLUSH_ERRORS.inc(store=self.name)
+                raise
+            STORE_FLUSH_SECONDS.observe(time.perf_counter() - started, store=self.name)
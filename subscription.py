@@ -1,116 +1,256 @@
-import json
-import os
+import bisect
+from itertools import islice
 from datetime import datetime, timedelta
-from typing import Dict, Optional
-from config import load_config, save_config
+from typing import Dict, Optional, List, Set, Tuple, Any, Callable
+from storage import get_backend
 
-SUBSCRIPTION_FILE = "subscriptions.json"
+def _end_timestamp(sub: Dict[str, Any]) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(sub["end_date"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+class SubscriptionRepository:
+    """
+    Subscription in-memory dengan secondary index.
+
+    Index yang dijaga setiap perubahan:
+    - discord_user_id -> subscription IDs (urutan insert)
+    - sorted index (end_timestamp, subscription_id) untuk subscription aktif
+    - counter subscription aktif
+    """
+
+    def __init__(self):
+        self._subs: Optional[Dict[str, Dict[str, Any]]] = None
+        self._by_user: Dict[str, Dict[str, None]] = {}
+        self._expiry: List[Tuple[float, str]] = []
+        self._active_count = 0
+        # Subscription yang berubah sejak save terakhir (None = semua)
+        self._dirty: Optional[Set[str]] = None
+        self._listeners: List[Callable[[str, Optional[Dict[str, Any]]], None]] = []
+
+    def add_listener(self, callback: Callable[[str, Optional[Dict[str, Any]]], None]) -> None:
+        """Daftarkan callback(sub_id, sub) yang dipanggil setiap subscription berubah (None = dihapus)"""
+        self._listeners.append(callback)
+
+    def _notify(self, sub_id: str, sub: Optional[Dict[str, Any]]) -> None:
+        for callback in self._listeners:
+            callback(sub_id, sub)
+
+    def _ensure_loaded(self) -> Dict[str, Dict[str, Any]]:
+        if self._subs is None:
+            self._load(get_backend().load_subscriptions())
+            self._dirty = set()
+        return self._subs
+
+    @property
+    def data(self) -> Dict[str, Dict[str, Any]]:
+        return self._ensure_loaded()
+
+    def _load(self, subscriptions: Dict[str, Dict[str, Any]]) -> None:
+        self._subs = subscriptions
+        self._dirty = None
+        self._by_user = {}
+        self._expiry = []
+        self._active_count = 0
+        for sub_id, sub in subscriptions.items():
+            self._index(sub_id, sub)
+        self._expiry.sort()
+
+    def _index(self, sub_id: str, sub: Dict[str, Any]) -> None:
+        user_id = sub.get("discord_user_id")
+        if user_id:
+            self._by_user.setdefault(user_id, {})[sub_id] = None
+        if sub.get("active", False):
+            self._active_count += 1
+            end_ts = _end_timestamp(sub)
+            if end_ts is not None:
+                bisect.insort(self._expiry, (end_ts, sub_id))
+
+    def _unindex(self, sub_id: str, sub: Dict[str, Any]) -> None:
+        user_id = sub.get("discord_user_id")
+        if user_id and user_id in self._by_user:
+            self._by_user[user_id].pop(sub_id, None)
+            if not self._by_user[user_id]:
+                del self._by_user[user_id]
+        if sub.get("active", False):
+            self._active_count -= 1
+            end_ts = _end_timestamp(sub)
+            if end_ts is not None:
+                i = bisect.bisect_left(self._expiry, (end_ts, sub_id))
+                if i < len(self._expiry) and self._expiry[i] == (end_ts, sub_id):
+                    del self._expiry[i]
+
+    def _mark_dirty(self, sub_id: str) -> None:
+        if self._dirty is not None:
+            self._dirty.add(sub_id)
+
+    def reload(self) -> None:
+        self._load(get_backend().load_subscriptions())
+        self._dirty = set()
+
+    def save(self) -> None:
+        data = self.data
+        get_backend().save_subscriptions(data, self._dirty)
+        self._dirty = set()
+
+    def replace(self, subscriptions: Dict[str, Dict[str, Any]]) -> None:
+        """Ganti semua data (rebuild index) lalu simpan"""
+        self._load(subscriptions)
+        self.save()
+        for sub_id, sub in subscriptions.items():
+            self._notify(sub_id, sub)
+
+    def get(self, sub_id: str) -> Optional[Dict[str, Any]]:
+        return self.data.get(sub_id)
+
+    def __contains__(self, sub_id: str) -> bool:
+        return sub_id in self.data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def upsert(self, sub_id: str, sub: Dict[str, Any], save: bool = True) -> None:
+        """Tambah atau ganti subscription dengan index yang ikut diperbarui"""
+        old = self.data.get(sub_id)
+        if old is not None:
+            self._unindex(sub_id, old)
+        self.data[sub_id] = sub
+        self._index(sub_id, sub)
+        self._mark_dirty(sub_id)
+        if save:
+            self.save()
+        self._notify(sub_id, sub)
+
+    def update(self, sub_id: str, save: bool = True, **fields) -> bool:
+        """Ubah sebagian field subscription"""
+        old = self.data.get(sub_id)
+        if old is None:
+            return False
+        self.upsert(sub_id, {**old, **fields}, save=save)
+        return True
+
+    def delete(self, sub_id: str, save: bool = True) -> bool:
+        old = self.data.pop(sub_id, None)
+        if old is None:
+            return False
+        self._unindex(sub_id, old)
+        self._mark_dirty(sub_id)
+        if save:
+            self.save()
+        self._notify(sub_id, None)
+        return True
+
+    def by_user(self, discord_user_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Semua subscription milik user, O(jumlah subscription user)"""
+        self._ensure_loaded()
+        sub_ids = self._by_user.get(discord_user_id, {})
+        return [(sub_id, self._subs[sub_id]) for sub_id in sub_ids]
+
+    def active_count(self) -> int:
+        self._ensure_loaded()
+        return self._active_count
+
+    def next_expiry(self) -> Optional[Tuple[float, str]]:
+        """Subscription aktif yang paling cepat expired"""
+        self._ensure_loaded()
+        return self._expiry[0] if self._expiry else None
+
+    def expired_before(self, when: datetime) -> List[str]:
+        """ID subscription aktif dengan end_date <= when, O(log n + k)"""
+        self._ensure_loaded()
+        i = bisect.bisect_right(self._expiry, (when.timestamp(), "\uffff"))
+        return [sub_id for _, sub_id in self._expiry[:i]]
+
+    def recent(self, limit: int) -> List[Dict[str, Any]]:
+        """Subscription terakhir dibuat (urutan insert), terbaru lebih dulu"""
+        return list(islice(reversed(self.data.values()), limit))
+
+subscription_repo = SubscriptionRepository()
 
 def load_subscriptions() -> Dict:
-    """Load data subscription dari file"""
-    try:
-        if os.path.exists(SUBSCRIPTION_FILE):
-            with open(SUBSCRIPTION_FILE, "r", encoding='utf-8') as f:
-                return json.load(f)
-        return {}
-    except (json.JSONDecodeError, IOError):
-        return {}
+    """
+    Return data subscription dari memori.
+
+    Setelah mengubah dict yang dikembalikan, panggil ``save_subscriptions``
+    supaya index dibangun ulang. Lebih baik pakai ``subscription_repo``.
+    """
+    return subscription_repo.data
 
 def save_subscriptions(data: Dict) -> None:
-    """Save data subscription ke file"""
-    try:
-        with open(SUBSCRIPTION_FILE, "w", encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-    except (IOError, TypeError) as e:
-        raise Exception(f"Failed to save subscriptions: {str(e)}")
+    """Save data subscription ke storage"""
+    subscription_repo.replace(data)
 
 def create_subscription(user_id: str, package_type: str, duration_days: int) -> str:
     """Buat subscription baru dan return subscription ID"""
-    subscriptions = load_subscriptions()
-    
     # Generate unique subscription ID
     import uuid
     subscription_id = str(uuid.uuid4())[:8].upper()
-    
+
     start_date = datetime.now()
     end_date = start_date + timedelta(days=duration_days)
-    
-    subscriptions[subscription_id] = {
+
+    subscription_repo.upsert(subscription_id, {
         "user_id": user_id,
         "package_type": package_type,
         "start_date": start_date.isoformat(),
         "end_date": end_date.isoformat(),
         "active": True,
         "discord_user_id": None  # Akan diisi saat login
-    }
-    
-    save_subscriptions(subscriptions)
+    })
     return subscription_id
 
 def validate_subscription(subscription_id: str, discord_user_id: str) -> bool:
     """Validasi subscription ID"""
-    subscriptions = load_subscriptions()
-    
-    if subscription_id not in subscriptions:
+    sub = subscription_repo.get(subscription_id)
+
+    if sub is None:
         return False
-        
-    sub = subscriptions[subscription_id]
-    
-    # Cek apakah sudah expired
+
+    # Cek apakah sudah expired (flag active diurus oleh expiry scheduler)
     end_date = datetime.fromisoformat(sub["end_date"])
     if datetime.now() > end_date:
-        sub["active"] = False
-        save_subscriptions(subscriptions)
         return False
-    
+
     # Cek apakah sudah dipakai oleh user lain
     if sub["discord_user_id"] and sub["discord_user_id"] != discord_user_id:
         return False
-        
+
     # Jika belum dipakai, assign ke user ini
     if not sub["discord_user_id"]:
-        sub["discord_user_id"] = discord_user_id
-        save_subscriptions(subscriptions)
-    
+        subscription_repo.update(subscription_id, discord_user_id=discord_user_id)
+        sub = subscription_repo.get(subscription_id)
+
     return sub["active"]
 
 def get_user_subscription(discord_user_id: str) -> Optional[Dict]:
     """Dapatkan subscription info user"""
-    subscriptions = load_subscriptions()
-    
-    for sub_id, sub_data in subscriptions.items():
-        if sub_data.get("discord_user_id") == discord_user_id:
-            return {
-                "subscription_id": sub_id,
-                **sub_data
-            }
+    for sub_id, sub_data in subscription_repo.by_user(discord_user_id):
+        return {
+            "subscription_id": sub_id,
+            **sub_data
+        }
     return None
 
 def get_subscription_info(subscription_id: str) -> Optional[Dict]:
     """Dapatkan info subscription"""
-    subscriptions = load_subscriptions()
-    return subscriptions.get(subscription_id)
+    return subscription_repo.get(subscription_id)
 
 def extend_subscription(subscription_id: str, additional_days: int) -> bool:
     """Perpanjang subscription"""
-    subscriptions = load_subscriptions()
-    
-    if subscription_id not in subscriptions:
+    sub = subscription_repo.get(subscription_id)
+
+    if sub is None:
         return False
-        
-    sub = subscriptions[subscription_id]
+
     end_date = datetime.fromisoformat(sub["end_date"])
     new_end_date = end_date + timedelta(days=additional_days)
-    
-    sub["end_date"] = new_end_date.isoformat()
-    sub["active"] = True
-    
-    save_subscriptions(subscriptions)
-    return True
+
+    return subscription_repo.update(subscription_id, end_date=new_end_date.isoformat(), active=True)
 
 # Predefined packages
 PACKAGES = {
     "1minggu": {"days": 7, "price": 2500, "name": "1 Minggu"},
     "1bulan": {"days": 30, "price": 10000, "name": "1 Bulan"},
     "3bulan": {"days": 90, "price": 25000, "name": "3 Bulan"}
-}
\ No newline at end of file
+}
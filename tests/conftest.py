@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config_store  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _isolated(tmp_path, monkeypatch):
+    """Jalankan test di direktori sementara dengan config hanya di memori"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config_store, "persist", False)
+    monkeypatch.setattr(config_store, "_data", {"accounts": {}, "admins": {}})
+
+
+@pytest.fixture
+def config():
+    return config_store.data
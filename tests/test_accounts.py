@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+
+import accounts
+import runner
+from accounts import (
+    AccountSupervisor, account_supervisors, TOKEN_UNKNOWN, TOKEN_VALID, TOKEN_INVALID, TOKEN_CHANGED_STATUS
+)
+from autopost import SendResult
+from control import control_bus, SETUP_STARTED, SETUP_STOPPED, ACCOUNT_REMOVED
+from scheduler import SetupJob
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def ok_result(status="200"):
+    result = SendResult()
+    result.ok = status == "200"
+    result.status = status
+    return result
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    """check_token / send_message_result palsu; atur hasil lewat dict yang dikembalikan"""
+    state = {"valid": True, "status": "200", "sent": 0, "on_check": None}
+
+    async def check_token(token):
+        if state["on_check"] is not None:
+            state["on_check"]()
+        return state["valid"]
+
+    async def send_message_result(token, channel_id, message):
+        state["sent"] += 1
+        return ok_result(state["status"])
+
+    monkeypatch.setattr(accounts, "check_token", check_token)
+    monkeypatch.setattr(accounts, "send_message_result", send_message_result)
+    return state
+
+
+def test_valid_token_sends(fake_api):
+    supervisor = AccountSupervisor("u1")
+    result = run(supervisor.send("tok", "c1", "hi"))
+    assert result.ok
+    assert supervisor.token_state == TOKEN_VALID
+    assert fake_api["sent"] == 1
+
+
+def test_token_check_error_is_not_a_failure(fake_api):
+    fake_api["valid"] = None
+    supervisor = AccountSupervisor("u1")
+    result = run(supervisor.send("tok", "c1", "hi"))
+    assert result.status == "token_check_error"
+    assert supervisor.token_state == TOKEN_UNKNOWN
+    assert fake_api["sent"] == 0
+
+    # Cek berikutnya berhasil: kirim jalan lagi
+    fake_api["valid"] = True
+    assert run(supervisor.send("tok", "c1", "hi")).ok
+
+
+def test_invalid_token_stops_other_setups(fake_api, config, monkeypatch):
+    config["accounts"]["u1"] = {
+        "token": "tok",
+        "setups": {"b": {"running": True, "message": "hi", "channel": "c1", "interval": 1}},
+    }
+    monkeypatch.setattr(accounts, "invalidate_token", lambda token: None)
+    supervisor = account_supervisors.get("u1")
+    supervisor.token = "tok"
+    supervisor.token_state = TOKEN_INVALID
+    try:
+        # Setup lain milik akun yang token-nya gagal: tidak dikirim dan ikut dihentikan
+        assert run(runner.run_setup_cycle(SetupJob("u1", "b", 0.0))) is None
+        assert config["accounts"]["u1"]["setups"]["b"]["running"] is False
+        assert fake_api["sent"] == 0
+    finally:
+        control_bus.publish(ACCOUNT_REMOVED, "u1")
+
+
+def test_manual_start_rechecks_token(fake_api):
+    fake_api["valid"] = False
+    supervisor = account_supervisors.get("u1")
+    try:
+        assert run(supervisor.send("tok", "c1", "hi")).status == "invalid_token"
+        assert run(supervisor.send("tok", "c1", "hi")) is None
+
+        # Start lagi dengan token yang sama: token dicek ulang
+        control_bus.publish(SETUP_STARTED, "u1", "a")
+        assert supervisor.token_state == TOKEN_UNKNOWN
+        fake_api["valid"] = True
+        assert run(supervisor.send("tok", "c1", "hi")).ok
+    finally:
+        control_bus.publish(ACCOUNT_REMOVED, "u1")
+
+
+def test_401_marks_token_invalid(fake_api):
+    fake_api["status"] = "401"
+    supervisor = AccountSupervisor("u1")
+    run(supervisor.send("tok", "c1", "hi"))
+    assert supervisor.token_state == TOKEN_INVALID
+
+
+def test_new_token_resets_state(fake_api):
+    fake_api["valid"] = False
+    supervisor = AccountSupervisor("u1")
+    run(supervisor.send("old", "c1", "hi"))
+    fake_api["valid"] = True
+    result = run(supervisor.send("new", "c1", "hi"))
+    assert result.ok
+    assert supervisor.token_state == TOKEN_VALID
+
+
+def test_token_changed_during_check_is_ignored(fake_api):
+    supervisor = AccountSupervisor("u1")
+    fake_api["valid"] = False
+    fake_api["on_check"] = supervisor.reset  # TOKEN_CHANGED selagi cek token lama
+    result = run(supervisor.send("old", "c1", "hi"))
+    assert result.status == TOKEN_CHANGED_STATUS
+    assert supervisor.token_state == TOKEN_UNKNOWN
+    assert fake_api["sent"] == 0
+
+
+def test_disable_all_stops_running_setups(config, monkeypatch):
+    config["accounts"]["u1"] = {
+        "token": "tok",
+        "setups": {
+            "a": {"running": True},
+            "b": {"running": False},
+            "c": {"running": True},
+        },
+    }
+    invalidated = []
+    monkeypatch.setattr(accounts, "invalidate_token", invalidated.append)
+    events = []
+
+    def listener(event):
+        events.append((event.kind, event.user_id, event.setup_name))
+
+    control_bus.subscribe(listener)
+    try:
+        stopped = AccountSupervisor("u1").disable_all()
+    finally:
+        control_bus.unsubscribe(listener)
+
+    assert stopped == ["a", "c"]
+    assert not any(s["running"] for s in config["accounts"]["u1"]["setups"].values())
+    assert invalidated == ["tok"]
+    assert events == [(SETUP_STOPPED, "u1", "a"), (SETUP_STOPPED, "u1", "c")]
+
+
+def test_disable_all_without_running_setups(config):
+    config["accounts"]["u1"] = {"token": "tok", "setups": {"a": {"running": False}}}
+    assert AccountSupervisor("u1").disable_all() == []
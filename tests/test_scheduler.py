@@ -0,0 +1,123 @@
+import time
+import asyncio
+
+import scheduler
+from scheduler import SetupScheduler
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_crash_backoff_doubles_and_resets(monkeypatch):
+    monkeypatch.setattr(scheduler, "SCHEDULER_CRASH_BACKOFF", 10)
+    monkeypatch.setattr(scheduler, "SCHEDULER_CRASH_BACKOFF_MAX", 25)
+
+    async def main():
+        calls = []
+
+        async def handler(job):
+            calls.append(job.key)
+            if len(calls) <= 3:
+                raise RuntimeError("boom")
+            return 60.0
+
+        sched = SetupScheduler(handler, workers=1)
+        sched.start()
+        job = sched.add("u1", "s1")
+        delays = []
+        for _ in range(4):
+            await asyncio.sleep(0.01)
+            delays.append(round(job.due - time.monotonic()))
+            # Langsung jatuh tempo lagi supaya crash berikutnya terjadi sekarang
+            sched.reschedule("u1", "s1", 0)
+        await sched.stop()
+        return calls, delays, job
+
+    calls, delays, job = run(main())
+    assert len(calls) == 4
+    # 10, 20, lalu dibatasi 25; setelah sukses backoff di-reset
+    assert delays[:3] == [10, 20, 25]
+    assert delays[3] == 60
+    assert job.crashes == 0
+
+
+def test_crashed_job_stays_scheduled():
+    async def main():
+        async def handler(job):
+            raise RuntimeError("boom")
+
+        sched = SetupScheduler(handler, workers=1)
+        sched.start()
+        sched.add("u1", "s1")
+        await asyncio.sleep(0.01)
+        await sched.stop()
+        return sched
+
+    sched = run(main())
+    assert "u1_s1" in sched
+    assert sched.get("u1", "s1").crashes == 1
+
+
+def test_jobs_of_one_account_run_one_at_a_time():
+    async def main():
+        running = {}
+        overlap = []
+        order = []
+        release = asyncio.Event()
+
+        async def handler(job):
+            running[job.user_id] = running.get(job.user_id, 0) + 1
+            if running[job.user_id] > 1:
+                overlap.append(job.user_id)
+            order.append(job.key)
+            if job.user_id == "busy":
+                await release.wait()
+            running[job.user_id] -= 1
+            return None
+
+        sched = SetupScheduler(handler, workers=4)
+        sched.start()
+        for i in range(3):
+            sched.add("busy", f"s{i}")
+        sched.add("other", "s0")
+        await asyncio.sleep(0.01)
+
+        # Akun sibuk tidak menahan worker: akun lain tetap jalan, sisanya diparkir
+        assert "other_s0" in order
+        assert sched.parked("busy") == 2
+        release.set()
+        await asyncio.sleep(0.01)
+        await sched.stop()
+        return overlap, order
+
+    overlap, order = run(main())
+    assert overlap == []
+    assert [key for key in order if key.startswith("busy")] == ["busy_s0", "busy_s1", "busy_s2"]
+
+
+def test_parked_job_removed_is_skipped():
+    async def main():
+        order = []
+        release = asyncio.Event()
+
+        async def handler(job):
+            order.append(job.key)
+            if job.setup_name == "s0":
+                await release.wait()
+            return None
+
+        sched = SetupScheduler(handler, workers=2)
+        sched.start()
+        sched.add("u1", "s0")
+        sched.add("u1", "s1")
+        await asyncio.sleep(0.01)
+        sched.remove("u1", "s1")
+        release.set()
+        await asyncio.sleep(0.01)
+        await sched.stop()
+        return order, sched
+
+    order, sched = run(main())
+    assert order == ["u1_s0"]
+    assert sched.parked() == 0
@@ -0,0 +1,101 @@
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+from dotenv import load_dotenv
+from singleflight import SingleFlight
+
+# Load environment variables
+load_dotenv()
+
+# TTL hasil validasi token (detik)
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+TOKEN_CACHE_NEGATIVE_TTL = float(os.getenv("TOKEN_CACHE_NEGATIVE_TTL", "30"))
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+
+
+def token_key(token: str) -> str:
+    """Key cache dari hash token (token asli tidak disimpan)"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenValidityCache:
+    """
+    Cache TTL untuk hasil validasi token.
+
+    - Hasil valid di-cache selama ``ttl``, hasil invalid selama ``negative_ttl``
+    - Validasi bersamaan untuk token yang sama digabung (single-flight)
+    - Hasil ``None`` (error jaringan / status tak terduga) tidak di-cache
+    """
+
+    def __init__(
+        self,
+        ttl: float = TOKEN_CACHE_TTL,
+        negative_ttl: float = TOKEN_CACHE_NEGATIVE_TTL,
+        max_size: int = TOKEN_CACHE_MAX_SIZE,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()
+        self._inflight = SingleFlight()
+
+    def get(self, token: str) -> Optional[bool]:
+        """Hasil yang masih berlaku, atau None jika tidak ada di cache"""
+        key = token_key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        valid, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return valid
+
+    def set(self, token: str, valid: bool) -> None:
+        key = token_key(token)
+        ttl = self.ttl if valid else self.negative_ttl
+        self._entries[key] = (valid, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, token: Optional[str]) -> None:
+        """Hapus hasil cache untuk token (mis. setelah 401 atau token diganti)"""
+        if token:
+            self._entries.pop(token_key(token), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def get_or_validate(
+        self,
+        token: str,
+        validator: Callable[[str], Awaitable[Optional[bool]]],
+    ) -> Optional[bool]:
+        """
+        Ambil hasil dari cache atau jalankan validator sekali untuk semua pemanggil.
+
+        Args:
+            token: Token yang divalidasi
+            validator: Coroutine function yang return True/False, atau None jika gagal cek
+
+        Returns:
+            Hasil validasi
+        """
+        cached = self.get(token)
+        if cached is not None:
+            return cached
+
+        async def validate() -> Optional[bool]:
+            result = await validator(token)
+            if result is not None:
+                self.set(token, result)
+            return result
+
+        return await self._inflight.do(token_key(token), validate)
+
+
+token_cache = TokenValidityCache()
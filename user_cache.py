@@ -0,0 +1,127 @@
+import os
+import time
+import logging
+import discord
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+from dotenv import load_dotenv
+from singleflight import SingleFlight
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Ukuran dan TTL (detik) cache user hasil fetch_user & DM channel
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "5000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "3600"))
+DM_CHANNEL_CACHE_TTL = float(os.getenv("DM_CHANNEL_CACHE_TTL", "3600"))
+
+
+class _TTLCache:
+    """LRU berbatas dengan TTL per entry"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[Any, float]]" = OrderedDict()
+
+    def get(self, key: int) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: int, value: Any) -> None:
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: int) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class UserResolver:
+    """
+    Resolve user ID ke discord.User / DM channel dengan cache berlapis.
+
+    Urutan: cache client (``get_user``) -> LRU user yang baru di-fetch ->
+    ``fetch_user``. Fetch bersamaan untuk ID yang sama digabung menjadi satu
+    request REST. DM channel juga di-cache supaya ``create_dm`` tidak
+    dipanggil ulang per pesan.
+    """
+
+    def __init__(
+        self,
+        max_size: int = USER_CACHE_MAX_SIZE,
+        ttl: float = USER_CACHE_TTL,
+        dm_ttl: float = DM_CHANNEL_CACHE_TTL,
+    ):
+        self._users = _TTLCache(max_size, ttl)
+        self._dm_channels = _TTLCache(max_size, dm_ttl)
+        self._inflight = SingleFlight()
+
+    async def get_user(self, client: discord.Client, user_id: Any) -> discord.User:
+        """
+        Ambil user dari cache atau REST.
+
+        Raises:
+            ValueError: Jika user_id bukan angka
+            discord.NotFound / discord.HTTPException: Dari fetch_user
+        """
+        key = int(user_id)
+        user = client.get_user(key) or self._users.get(key)
+        if user is not None:
+            return user
+
+        async def fetch() -> discord.User:
+            fetched = await client.fetch_user(key)
+            self._users.set(key, fetched)
+            return fetched
+
+        return await self._inflight.do(("user", key), fetch)
+
+    async def get_dm_channel(self, client: discord.Client, user_id: Any) -> discord.DMChannel:
+        """DM channel user (dibuat sekali lalu di-cache)"""
+        key = int(user_id)
+        channel = self._dm_channels.get(key)
+        if channel is not None:
+            return channel
+
+        async def create() -> discord.DMChannel:
+            user = await self.get_user(client, key)
+            dm_channel = user.dm_channel or await user.create_dm()
+            self._dm_channels.set(key, dm_channel)
+            return dm_channel
+
+        return await self._inflight.do(("dm", key), create)
+
+    async def send_dm(self, client: discord.Client, user_id: Any, *args, **kwargs) -> discord.Message:
+        """Kirim DM ke user lewat DM channel yang di-cache"""
+        channel = await self.get_dm_channel(client, user_id)
+        return await channel.send(*args, **kwargs)
+
+    def invalidate(self, user_id: Any) -> None:
+        """Buang cache user (mis. setelah NotFound)"""
+        key = int(user_id)
+        self._users.pop(key)
+        self._dm_channels.pop(key)
+
+    def clear(self) -> None:
+        self._users.clear()
+        self._dm_channels.clear()
+
+
+user_resolver = UserResolver()
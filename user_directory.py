@@ -0,0 +1,224 @@
+import time
+import bisect
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from config import load_config
+from subscription import subscription_repo, _end_timestamp
+from control import control_bus, ControlEvent
+
+logger = logging.getLogger(__name__)
+
+# Urutan yang didukung user browser
+SORT_ACTIVE = "active"
+SORT_EXPIRY = "expiry"
+SORT_ACTIVITY = "activity"
+SORT_KEYS = (SORT_ACTIVE, SORT_EXPIRY, SORT_ACTIVITY)
+
+# Resolusi last activity (detik); index activity hanya diurutkan ulang jika berubah
+ACTIVITY_RESOLUTION = 60
+
+# Cursor = entry index terakhir/pertama di halaman
+Cursor = Tuple[Any, ...]
+
+
+class UserStats:
+    """Agregat per user untuk user browser"""
+
+    __slots__ = ("user_id", "setups", "active", "has_token", "expiry", "last_activity")
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.setups = 0
+        self.active = 0
+        self.has_token = False
+        # Timestamp berakhirnya subscription aktif terakhir (None = tidak ada)
+        self.expiry: Optional[float] = None
+        self.last_activity: Optional[float] = None
+
+    def sort_entry(self, sort: str) -> Cursor:
+        if sort == SORT_ACTIVE:
+            return (-self.active, -self.setups, self.user_id)
+        if sort == SORT_EXPIRY:
+            # Yang paling cepat habis di depan, tanpa subscription di belakang
+            return (self.expiry if self.expiry is not None else float("inf"), self.user_id)
+        return (-(self.last_activity or 0.0), self.user_id)
+
+
+class UserDirectory:
+    """
+    Agregat per user (jumlah setup, setup aktif, expiry, last activity) yang
+    dijaga secara incremental dari control bus dan listener subscription.
+
+    Setiap urutan punya list terurut sendiri, sehingga halaman diambil dengan
+    bisect dari cursor tanpa scan semua user.
+    """
+
+    def __init__(self):
+        self._stats: Optional[Dict[str, UserStats]] = None
+        self._indexes: Dict[str, List[Cursor]] = {sort: [] for sort in SORT_KEYS}
+        # sub_id -> discord_user_id, untuk subscription yang dihapus
+        self._sub_owner: Dict[str, str] = {}
+        self.total_setups = 0
+        self.total_active = 0
+
+    def _ensure_built(self) -> Dict[str, UserStats]:
+        if self._stats is None:
+            self.rebuild()
+        return self._stats
+
+    def rebuild(self) -> None:
+        """Hitung ulang semua agregat dari config (saat pertama dipakai / config di-reload)"""
+        last_activity = {
+            user_id: stats.last_activity for user_id, stats in (self._stats or {}).items()
+        }
+        self._stats = {}
+        self._indexes = {sort: [] for sort in SORT_KEYS}
+        self._sub_owner = {}
+        self.total_setups = 0
+        self.total_active = 0
+        for sub_id, sub in subscription_repo.data.items():
+            if sub.get("discord_user_id"):
+                self._sub_owner[sub_id] = sub["discord_user_id"]
+        for user_id in load_config().get("accounts", {}):
+            stats = UserStats(user_id)
+            stats.last_activity = last_activity.get(user_id)
+            self._compute(stats)
+            self._stats[user_id] = stats
+        for sort, index in self._indexes.items():
+            index.extend(stats.sort_entry(sort) for stats in self._stats.values())
+            index.sort()
+
+    def invalidate(self) -> None:
+        """Buang agregat; dibangun ulang saat dibutuhkan berikutnya"""
+        self._stats = None
+
+    def _compute(self, stats: UserStats) -> None:
+        user_data = load_config().get("accounts", {}).get(stats.user_id, {})
+        setups = user_data.get("setups", {})
+        self.total_setups -= stats.setups
+        self.total_active -= stats.active
+        stats.setups = len(setups)
+        stats.active = sum(1 for s in setups.values() if s.get("running", False))
+        stats.has_token = "token" in user_data
+        self.total_setups += stats.setups
+        self.total_active += stats.active
+
+        ends = [
+            _end_timestamp(sub) for _, sub in subscription_repo.by_user(stats.user_id)
+            if sub.get("active", False)
+        ]
+        ends = [end for end in ends if end is not None]
+        stats.expiry = max(ends) if ends else None
+
+    def _unindex(self, stats: UserStats) -> None:
+        for sort, index in self._indexes.items():
+            entry = stats.sort_entry(sort)
+            i = bisect.bisect_left(index, entry)
+            if i < len(index) and index[i] == entry:
+                del index[i]
+
+    def _index(self, stats: UserStats) -> None:
+        for sort, index in self._indexes.items():
+            bisect.insort(index, stats.sort_entry(sort))
+
+    def refresh_user(self, user_id: str) -> None:
+        """Hitung ulang agregat satu user (O(setup + subscription user))"""
+        if self._stats is None:
+            return
+        stats = self._stats.get(user_id)
+        exists = user_id in load_config().get("accounts", {})
+        if stats is not None:
+            self._unindex(stats)
+            if not exists:
+                self.total_setups -= stats.setups
+                self.total_active -= stats.active
+                del self._stats[user_id]
+                return
+        elif not exists:
+            return
+        else:
+            stats = self._stats[user_id] = UserStats(user_id)
+        self._compute(stats)
+        self._index(stats)
+
+    def record_activity(self, user_id: str, timestamp: Optional[float] = None) -> None:
+        """Catat aktivitas (pesan terkirim) user"""
+        if self._stats is None:
+            return
+        stats = self._stats.get(user_id)
+        if stats is None:
+            return
+        ts = timestamp if timestamp is not None else time.time()
+        ts -= ts % ACTIVITY_RESOLUTION
+        if stats.last_activity == ts:
+            return
+        index = self._indexes[SORT_ACTIVITY]
+        entry = stats.sort_entry(SORT_ACTIVITY)
+        i = bisect.bisect_left(index, entry)
+        if i < len(index) and index[i] == entry:
+            del index[i]
+        stats.last_activity = ts
+        bisect.insort(index, stats.sort_entry(SORT_ACTIVITY))
+
+    def on_control_event(self, event: ControlEvent) -> None:
+        # Semua event (setup dibuat/start/stop/hapus, token, akun dihapus) cukup refresh user itu
+        self.refresh_user(event.user_id)
+
+    def on_subscription_change(self, sub_id: str, sub: Optional[Dict[str, Any]]) -> None:
+        if self._stats is None:
+            return
+        owners = {self._sub_owner.get(sub_id)}
+        if sub is not None and sub.get("discord_user_id"):
+            self._sub_owner[sub_id] = sub["discord_user_id"]
+            owners.add(sub["discord_user_id"])
+        else:
+            self._sub_owner.pop(sub_id, None)
+        for user_id in owners:
+            if user_id and user_id in self._stats:
+                self.refresh_user(user_id)
+
+    def __len__(self) -> int:
+        return len(self._ensure_built())
+
+    def setup_totals(self) -> Tuple[int, int]:
+        """(total setup, total setup aktif) semua user"""
+        self._ensure_built()
+        return self.total_setups, self.total_active
+
+    def get(self, user_id: str) -> Optional[UserStats]:
+        return self._ensure_built().get(user_id)
+
+    def page(
+        self,
+        sort: str = SORT_ACTIVE,
+        after: Optional[Cursor] = None,
+        before: Optional[Cursor] = None,
+        limit: int = 10,
+    ) -> Tuple[List[UserStats], bool, bool]:
+        """
+        Ambil satu halaman user.
+
+        Args:
+            sort: Salah satu SORT_KEYS
+            after: Cursor entry terakhir halaman sebelumnya (halaman berikutnya)
+            before: Cursor entry pertama halaman sekarang (halaman sebelumnya)
+            limit: Jumlah user per halaman
+
+        Returns:
+            (users, has_prev, has_next)
+        """
+        stats = self._ensure_built()
+        index = self._indexes[sort]
+        if before is not None:
+            end = bisect.bisect_left(index, tuple(before))
+            start = max(0, end - limit)
+        else:
+            start = bisect.bisect_right(index, tuple(after)) if after is not None else 0
+            end = min(len(index), start + limit)
+        users = [stats[entry[-1]] for entry in index[start:end]]
+        return users, start > 0, end < len(index)
+
+
+user_directory = UserDirectory()
+control_bus.subscribe(user_directory.on_control_event)
+subscription_repo.add_listener(user_directory.on_subscription_change)
@@ -1,54 +1,229 @@
+import re
+import queue
+import atexit
 import logging
+import logging.handlers
 import aiohttp
 import asyncio
-from typing import Optional
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from http_client import http_sessions, DISCORD_API_BASE
+from token_cache import token_cache
+from ratelimit import rate_limiter
+from metrics import TOKEN_VALIDATIONS, TOKEN_CHECKS, TOKEN_CHECK_LATENCY
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Konfigurasi logging
+LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Pesan INFO dengan template sama: maksimal LOG_SAMPLE_BURST per LOG_SAMPLE_INTERVAL detik
+LOG_SAMPLE_INTERVAL = float(os.getenv("LOG_SAMPLE_INTERVAL", "60"))
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "20"))
+# Maksimal template yang dilacak sekaligus (LRU)
+LOG_SAMPLE_MAX_KEYS = int(os.getenv("LOG_SAMPLE_MAX_KEYS", "1000"))
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_EMOJI_REPLACEMENTS = {'❌': '[ERROR]', '✅': '[SUCCESS]', '⚠️': '[WARNING]'}
+_EMOJI_RE = re.compile('|'.join(map(re.escape, _EMOJI_REPLACEMENTS)))
+
 class UnicodeFilter(logging.Filter):
     def filter(self, record):
-        if isinstance(record.msg, str):
-            record.msg = record.msg.replace('❌', '[ERROR]')
-            record.msg = record.msg.replace('✅', '[SUCCESS]')
-            record.msg = record.msg.replace('⚠️', '[WARNING]')
+        # Pesan ASCII (mayoritas) tidak perlu diproses
+        if isinstance(record.msg, str) and not record.msg.isascii():
+            record.msg = _EMOJI_RE.sub(lambda m: _EMOJI_REPLACEMENTS[m.group(0)], record.msg)
         return True
 
+class SampledQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler yang meringkas pesan berulang.
+
+    Record INFO/DEBUG dengan template pesan (logger + level + ``record.msg``
+    sebelum diformat) yang sama hanya diteruskan ``burst`` kali per
+    ``interval`` detik; sisanya dihitung dan dilaporkan per template sebagai
+    satu baris ringkasan saat window berikutnya. Template dilacak di LRU
+    berbatas ``max_keys``. WARNING ke atas selalu diteruskan.
+    """
+
+    def __init__(
+        self,
+        log_queue,
+        interval: float = LOG_SAMPLE_INTERVAL,
+        burst: int = LOG_SAMPLE_BURST,
+        max_keys: int = LOG_SAMPLE_MAX_KEYS,
+    ):
+        super().__init__(log_queue)
+        self.interval = interval
+        self.burst = burst
+        self.max_keys = max_keys
+        # (logger, level, template) -> [awal window, jumlah di window, jumlah disembunyikan]
+        self._windows: "OrderedDict[Tuple[str, int, str], List[float]]" = OrderedDict()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.interval > 0 and record.levelno <= logging.INFO and not self._sample(record):
+            return
+        super().emit(record)
+
+    def _sample(self, record: logging.LogRecord) -> bool:
+        now = record.created
+        key = (record.name, record.levelno, str(record.msg))
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            if window is not None and window[2]:
+                self._emit_summary(key, int(window[2]), now - window[0])
+            self._windows[key] = [now, 1, 0]
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.max_keys:
+                # Template yang paling lama tidak muncul dibuang
+                old_key, old_window = self._windows.popitem(last=False)
+                if old_window[2]:
+                    self._emit_summary(old_key, int(old_window[2]), now - old_window[0])
+            return True
+        self._windows.move_to_end(key)
+        window[1] += 1
+        if window[1] <= self.burst:
+            return True
+        window[2] += 1
+        return False
+
+    def _emit_summary(self, key: Tuple[str, int, str], suppressed: int, elapsed: float) -> None:
+        name, level, template = key
+        summary = logging.LogRecord(
+            name, level, __file__, 0,
+            "%s pesan disembunyikan dalam %.0f detik untuk: %s",
+            (suppressed, elapsed, template), None
+        )
+        super().emit(summary)
+
+    def flush_summaries(self) -> None:
+        """Laporkan semua pesan yang masih disembunyikan (dipanggil saat shutdown)"""
+        self.acquire()
+        try:
+            now = time.time()
+            for key, window in list(self._windows.items()):
+                if window[2]:
+                    self._emit_summary(key, int(window[2]), now - window[0])
+            self._windows.clear()
+        finally:
+            self.release()
+
+_log_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[SampledQueueHandler] = None
+
+def _stop_logging() -> None:
+    global _log_listener
+    if _queue_handler is not None:
+        _queue_handler.flush_summaries()
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
 def setup_logger():
-    """Setup logging configuration"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler("bot.log", encoding='utf-8'),
-            logging.StreamHandler()
-        ]
+    """
+    Setup logging configuration
+
+    Record dimasukkan ke queue oleh SampledQueueHandler; penulisan ke file
+    (dirotasi per LOG_MAX_BYTES) dan console dilakukan thread QueueListener,
+    sehingga tidak ada I/O disk di event loop.
+    """
+    global _log_listener, _queue_handler
+    if _log_listener is not None:
+        return logging.getLogger(__name__)
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    unicode_filter = UnicodeFilter()
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
     )
-    logger = logging.getLogger(__name__)
-    logger.addFilter(UnicodeFilter())
-    return logger
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+        handler.addFilter(unicode_filter)
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = SampledQueueHandler(log_queue)
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(_queue_handler)
+
+    _log_listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(_stop_logging)
 
-async def validate_token(token: str) -> bool:
+    return logging.getLogger(__name__)
+
+async def _check_token(token: str, session: Optional[aiohttp.ClientSession]) -> Optional[bool]:
+    """Request /users/@me; None jika hasilnya tidak pasti (error jaringan/status lain)"""
+    headers = {"Authorization": token}
+    session = session or http_sessions.get()
+    route = "GET /users/@me"
+    
+    await rate_limiter.acquire(token, route)
+    started = time.perf_counter()
+    responded = False
+    try:
+        async with session.get(
+            f"{DISCORD_API_BASE}/users/@me",
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=10)
+        ) as resp:
+            responded = True
+            TOKEN_CHECK_LATENCY.observe(time.perf_counter() - started)
+            rate_limiter.update(token, route, "", resp.status, resp.headers)
+            if resp.status == 200:
+                TOKEN_CHECKS.inc(result="valid")
+                return True
+            if resp.status in (401, 403):
+                TOKEN_CHECKS.inc(result="invalid")
+                return False
+            TOKEN_CHECKS.inc(result="error")
+            return None
+    except Exception:
+        TOKEN_CHECKS.inc(result="error")
+        return None
+    finally:
+        # Termasuk CancelledError: slot yang direservasi dikembalikan jika belum ada response
+        if not responded:
+            rate_limiter.release(token, route)
+
+async def validate_token(
+    token: str,
+    session: Optional[aiohttp.ClientSession] = None,
+    use_cache: bool = True
+) -> bool:
     """
     Validate if a token is working
     
     Args:
         token: Discord user token to validate
+        session: HTTP session to use (default: shared session pool)
+        use_cache: Use cached result from token_cache if still fresh
         
     Returns:
         bool: True if token is valid, False otherwise
     """
-    headers = {"Authorization": token}
+    TOKEN_VALIDATIONS.inc()
+    if not use_cache:
+        result = await _check_token(token, session)
+        if result is not None:
+            token_cache.set(token, result)
+        return bool(result)
     
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                "https://discord.com/api/v9/users/@me",
-                headers=headers,
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as resp:
-                return resp.status == 200
-    except Exception:
-        return False
\ No newline at end of file
+    result = await token_cache.get_or_validate(token, lambda t: _check_token(t, session))
+    return bool(result)
+
+async def check_token(token: str, session: Optional[aiohttp.ClientSession] = None) -> Optional[bool]:
+    """Seperti validate_token, tapi None jika hasilnya tidak pasti (error jaringan/status lain)"""
+    TOKEN_VALIDATIONS.inc()
+    return await token_cache.get_or_validate(token, lambda t: _check_token(t, session))
+
+def invalidate_token(token: Optional[str]) -> None:
+    """Buang hasil validasi token dari cache"""
+    token_cache.invalidate(token)
\ No newline at end of file